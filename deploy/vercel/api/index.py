@@ -9,14 +9,23 @@ import os
 import tempfile
 import mimetypes
 from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlencode
 from dotenv import load_dotenv
-from vortai import GeminiAI
+from vortai import GeminiAI, cdn
+from vortai.prompts import collapse_whitespace
 
 # Load environment variables
 load_dotenv()
 
 ai = GeminiAI()
 
+# Methods with signed, CDN-cacheable GET variants: method -> (mode, field)
+CACHEABLE_METHODS = {
+    "generate": ("text", "prompt"),
+    "text_to_speech": ("tts", "text"),
+    "generate_image": ("image", "prompt"),
+}
+
 
 class Handler(BaseHTTPRequestHandler):
     """Vercel-compatible handler class for API endpoints."""
@@ -47,6 +56,69 @@ class Handler(BaseHTTPRequestHandler):
             data = {}
 
         # Route to appropriate handler
+        response = self._dispatch(method, data)
+
+        # Advertise the cacheable GET variant of a successful result
+        key = cdn.signing_key()
+        if method in CACHEABLE_METHODS and key and response["statusCode"] == 200:
+            mode, field = CACHEABLE_METHODS[method]
+            value = data.get(field, "")
+            canonical = (
+                collapse_whitespace(value) if mode == "tts" else ai.canonicalizer(value)
+            )
+            response["headers"]["Content-Location"] = self._cacheable_url(
+                method, canonical, key
+            )
+
+        self._send(response)
+
+    def do_GET(self):
+        """Handle signed GET requests for cacheable methods.
+
+        The query carries the method, the canonical prompt (``q``) and its
+        signature (``sig``); successful results are cacheable by the edge.
+        """
+        from urllib.parse import parse_qs
+
+        query_params = parse_qs(self.path.split("?", 1)[1] if "?" in self.path else "")
+        method = query_params.get("method", ["generate"])[0]
+        prompt = query_params.get("q", [""])[0]
+        signature = query_params.get("sig", [""])[0]
+        key = cdn.signing_key()
+
+        if key is None or method not in CACHEABLE_METHODS:
+            response = {
+                "statusCode": 404,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps({"error": "Not found"}),
+            }
+        elif not prompt or not cdn.verify(
+            CACHEABLE_METHODS[method][0], prompt, signature, key
+        ):
+            response = {
+                "statusCode": 403,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps({"error": "Invalid signature"}),
+            }
+        else:
+            response = self._dispatch(method, {CACHEABLE_METHODS[method][1]: prompt})
+
+        if response["statusCode"] == 200:
+            response["headers"].update(cdn.cache_headers())
+        else:
+            response["headers"]["Cache-Control"] = "no-store"
+        self._send(response)
+
+    def _cacheable_url(self, method, canonical, key):
+        """GET URL for a result, relative to this function's path."""
+        mode = CACHEABLE_METHODS[method][0]
+        query = urlencode(
+            {"method": method, "q": canonical, "sig": cdn.sign(mode, canonical, key)}
+        )
+        return f"{self.path.split('?', 1)[0]}?{query}"
+
+    def _dispatch(self, method, data):
+        """Run the handler for ``method``."""
         if method == "generate":
             response = self._generate(data)
         elif method == "generate_with_thinking":
@@ -63,8 +135,10 @@ class Handler(BaseHTTPRequestHandler):
                 "headers": {"Content-Type": "application/json"},
                 "body": json.dumps({"error": "Unknown method"}),
             }
+        return response
 
-        # Send response
+    def _send(self, response):
+        """Write a handler result to the client."""
         self.send_response(response["statusCode"])
         for header, value in response["headers"].items():
             self.send_header(header, value)
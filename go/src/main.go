@@ -4,11 +4,73 @@
 package main
 
 import (
+	"crypto/rand"
+	"encoding/hex"
+	"encoding/json"
 	"fmt"
 	"net/http"
+	"os"
+	"regexp"
 	"strings"
+	"time"
 )
 
+// W3C trace context: version-traceid-parentid-flags
+var traceparentPattern = regexp.MustCompile(`^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$`)
+
+// Span for one request, continuing the caller's trace when it sent a
+// traceparent header. Sampled spans are written to stdout as JSON lines.
+type span struct {
+	TraceID  string  `json:"trace_id"`
+	SpanID   string  `json:"span_id"`
+	ParentID string  `json:"parent_span_id,omitempty"`
+	Name     string  `json:"name"`
+	Start    float64 `json:"start"`
+	Duration float64 `json:"duration_ms"`
+	Status   int     `json:"status"`
+	sampled  bool
+	started  time.Time
+}
+
+func randomHex(bytes int) string {
+	buf := make([]byte, bytes)
+	if _, err := rand.Read(buf); err != nil {
+		return strings.Repeat("0", bytes*2)
+	}
+	return hex.EncodeToString(buf)
+}
+
+func startSpan(r *http.Request, name string) *span {
+	now := time.Now()
+	s := &span{
+		SpanID:  randomHex(8),
+		Name:    name,
+		Start:   float64(now.UnixNano()) / 1e9,
+		started: now,
+	}
+	if m := traceparentPattern.FindStringSubmatch(r.Header.Get("traceparent")); m != nil {
+		s.TraceID, s.ParentID = m[1], m[2]
+		// Only the low bit means sampled; the other flag bits are reserved
+		if flags, err := hex.DecodeString(m[3]); err == nil {
+			s.sampled = flags[0]&0x01 != 0
+		}
+	} else {
+		s.TraceID = randomHex(16)
+	}
+	return s
+}
+
+func (s *span) end(status int) {
+	s.Duration = float64(time.Since(s.started).Microseconds()) / 1000
+	s.Status = status
+	if !s.sampled {
+		return
+	}
+	if line, err := json.Marshal(s); err == nil {
+		fmt.Fprintln(os.Stdout, string(line))
+	}
+}
+
 // Simple text processing function
 func processText(text string) string {
 	// Trim and normalize spaces
@@ -18,19 +80,23 @@ func processText(text string) string {
 
 // HTTP handler for text processing
 func textHandler(w http.ResponseWriter, r *http.Request) {
+	s := startSpan(r, "POST /process")
 	if r.Method != "POST" {
 		http.Error(w, "Method not allowed", http.StatusMethodNotAllowed)
+		s.end(http.StatusMethodNotAllowed)
 		return
 	}
 
 	text := r.FormValue("text")
 	if text == "" {
 		http.Error(w, "No text provided", http.StatusBadRequest)
+		s.end(http.StatusBadRequest)
 		return
 	}
 
 	processed := processText(text)
-	fmt.Fprintf(w, processed)
+	fmt.Fprint(w, processed)
+	s.end(http.StatusOK)
 }
 
 func main() {
@@ -0,0 +1,34 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+#
+# Micro-benchmark for the prompt canonicalization stage.
+# Usage: uv run python scripts/bench_canonicalize.py
+
+import timeit
+
+from vortai.prompts import cache_key, canonicalize
+
+PROMPTS = {
+    "short ascii": "what is rust?",
+    "messy ascii": "  Explain   quantum\tcomputing \n in simple   terms!!  ",
+    "unicode": "Qu'est-ce que le café ?  ",
+    "max length": "word " * 1000,
+}
+
+
+def main():
+    for name, prompt in PROMPTS.items():
+        for casefold in (False, True):
+            runs = 20000 if len(prompt) < 1000 else 2000
+            seconds = timeit.timeit(
+                lambda: cache_key(canonicalize(prompt, casefold=casefold), "text"),
+                number=runs,
+            )
+            print(
+                f"{name:<12} casefold={casefold!s:<5} "
+                f"{seconds / runs * 1e6:8.2f} us/prompt"
+            )
+
+
+if __name__ == "__main__":
+    main()
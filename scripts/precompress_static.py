@@ -0,0 +1,54 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+#
+# Build step: write .gz (and .br when brotli is installed) siblings for
+# text assets so the app can serve them without compressing per request.
+# Usage: uv run python scripts/precompress_static.py [static_dir]
+
+import gzip
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "deploy", "static", "web", "static"
+)
+EXTENSIONS = (".css", ".js", ".html", ".svg", ".json", ".map", ".txt")
+
+
+def write_if_smaller(path, data, original_size):
+    if len(data) < original_size:
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+        return True
+    if os.path.exists(path):
+        os.unlink(path)
+    return False
+
+
+def main():
+    static_dir = sys.argv[1] if len(sys.argv) > 1 else STATIC_DIR
+    for root, _, files in os.walk(static_dir):
+        for name in files:
+            if not name.endswith(EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            written = []
+            if write_if_smaller(path + ".gz", gzip.compress(data, 9), len(data)):
+                written.append("gz")
+            if brotli is not None and write_if_smaller(
+                path + ".br", brotli.compress(data, quality=11), len(data)
+            ):
+                written.append("br")
+            print(f"{os.path.relpath(path, static_dir)}: {', '.join(written) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
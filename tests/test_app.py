@@ -3,6 +3,7 @@
 
 import os
 import tempfile
+import time
 import pytest
 from unittest.mock import patch
 from vortai import create_app
@@ -341,3 +342,528 @@ def test_research_api_exception_handling(mock_research, client):
     data = response.get_json()
     assert "error" in data
     assert data["error"] == "Internal server error"
+
+
+@patch("vortai.routes.api.ai.research_topic")
+def test_research_api_idempotency_key(mock_research, client):
+    """Test that retries with the same Idempotency-Key run the research once."""
+    mock_research.return_value = {"report": "Mocked report", "citations": []}
+    headers = {"Idempotency-Key": "research-1"}
+
+    first = client.post("/api/research", json={"topic": "Test"}, headers=headers)
+    retry = client.post("/api/research", json={"topic": "Test"}, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.get_json() == first.get_json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    mock_research.assert_called_once_with("Test")
+
+    # The same key with a different body is rejected
+    other = client.post("/api/research", json={"topic": "Other"}, headers=headers)
+    assert other.status_code == 422
+
+
+@patch("vortai.routes.api.ai.research_topic")
+def test_research_api_idempotency_failure_not_stored(mock_research, client):
+    """Test that failed requests release their Idempotency-Key."""
+    mock_research.side_effect = [Exception("boom"), {"report": "ok"}]
+    headers = {"Idempotency-Key": "research-2"}
+
+    failed = client.post("/api/research", json={"topic": "Test"}, headers=headers)
+    retry = client.post("/api/research", json={"topic": "Test"}, headers=headers)
+    assert failed.status_code == 500
+    assert retry.status_code == 200
+    assert "Idempotent-Replayed" not in retry.headers
+
+
+@patch("vortai.routes.api.ai.research_topic")
+def test_research_api_idempotency_retries_client_errors(mock_research, monkeypatch):
+    """Test that 4xx responses are not replayed and replays are not charged."""
+    monkeypatch.setenv("RATE_LIMIT", "50/hour")
+    client = create_app().test_client()
+    mock_research.side_effect = [ValueError("quota exceeded 429"), {"report": "ok"}]
+    headers = {"Idempotency-Key": "research-3"}
+
+    limited = client.post("/api/research", json={"topic": "Test"}, headers=headers)
+    retry = client.post("/api/research", json={"topic": "Test"}, headers=headers)
+    assert limited.status_code == 429
+    assert retry.status_code == 200
+    assert mock_research.call_count == 2
+
+    # Research costs 25 of the 50 units, but replays are free
+    for _ in range(3):
+        replay = client.post("/api/research", json={"topic": "Test"}, headers=headers)
+        assert replay.headers["Idempotent-Replayed"] == "true"
+
+
+def test_rate_limit_enforced_locally_when_storage_fails():
+    """Test that an unavailable store falls back to per-worker limits."""
+    from vortai.extensions.ratelimit import RateLimiter
+
+    class BrokenStorage:
+        def charge(self, key, pending, cost, limit, expiry):
+            raise ConnectionError("Redis is marked unhealthy")
+
+    limiter = RateLimiter("10/hour", storage=BrokenStorage(), local_fraction=0)
+    results = [limiter.hit("client", 3)[0] for _ in range(4)]
+    assert results == [True, True, True, False]
+    # The denied hit was not counted
+    assert limiter.hit("client", 1)[0]
+
+
+def test_rate_limit_weights_expensive_endpoints(monkeypatch):
+    """Test that expensive endpoints consume more of the client's limit."""
+    monkeypatch.setenv("RATE_LIMIT", "10/hour")
+    client = create_app().test_client()
+
+    with patch("vortai.routes.api.ai.generate_text", return_value="ok"):
+        response = client.post("/api/generate", json={"prompt": "Test"})
+    assert response.status_code == 200
+
+    response = client.post("/api/research", json={"topic": "Test"})
+    assert response.status_code == 429
+    assert response.get_json()["error"] == "Rate limit exceeded"
+    assert "Retry-After" in response.headers
+
+
+def test_rate_limiter_batches_storage_updates():
+    """Test that hits well under the limit skip the shared store."""
+    from vortai.extensions.ratelimit import MemoryStorage, RateLimiter
+
+    class CountingStorage(MemoryStorage):
+        calls = 0
+
+        def charge(self, key, pending, cost, limit, expiry):
+            CountingStorage.calls += 1
+            return super().charge(key, pending, cost, limit, expiry)
+
+    limiter = RateLimiter(limit="100/hour", storage=CountingStorage())
+    assert all(limiter.hit("client")[0] for _ in range(40))
+    assert CountingStorage.calls == 8
+
+    results = [limiter.hit("client", 5)[0] for _ in range(20)]
+    assert results.count(True) == 12
+    assert not limiter.hit("client")[0]
+
+
+def test_rate_limit_does_not_charge_denied_requests(monkeypatch):
+    """Test that a rejected expensive call leaves room for cheaper ones."""
+    from vortai.extensions import ratelimit
+    from vortai.extensions.ratelimit import MemoryStorage, RateLimiter
+
+    storage = MemoryStorage()
+    limiter = RateLimiter(limit="100/hour", storage=storage, local_fraction=0)
+    assert limiter.hit("client", 90)[0]
+    assert not limiter.hit("client", 25)[0]
+    assert limiter.hit("client", 1)[0]
+    assert storage._counters[next(iter(storage._counters))][0] == 91
+
+    # Hits batched locally are written out when their window ends
+    batched = RateLimiter(limit="100/hour", storage=storage)
+    now = 7200.0
+    monkeypatch.setattr(ratelimit.time, "time", lambda: now)
+    assert batched.hit("other", 2)[0]
+    assert "vortai:rl:other:2" not in storage._counters
+    now += 3600
+    assert batched.hit("other")[0]
+    assert storage._counters["vortai:rl:other:2"][0] == 2
+
+
+@patch("vortai.routes.api.ai.generate_text")
+def test_generate_api_deadline_exceeded(mock_generate, client):
+    """Test that a request past its deadline returns 504."""
+    from vortai.resilience import DeadlineExceeded
+
+    mock_generate.side_effect = DeadlineExceeded("Request deadline exceeded")
+
+    response = client.post(
+        "/api/generate", json={"prompt": "Test"}, headers={"X-Request-Timeout": "1"}
+    )
+    assert response.status_code == 504
+    assert response.get_json()["error"] == "Request timed out"
+
+
+@patch("vortai.routes.api.ai.send_message")
+@patch("vortai.routes.api.ai.create_session")
+def test_session_api_success(mock_create, mock_send, client):
+    """Test creating a session and sending a message to it."""
+    mock_create.return_value = "abc123"
+    mock_send.return_value = "Mocked reply"
+
+    response = client.post("/api/sessions", json={"system_instruction": "Be brief"})
+    assert response.status_code == 201
+    assert response.get_json() == {"session_id": "abc123"}
+    mock_create.assert_called_once_with("Be brief")
+
+    response = client.post("/api/sessions/abc123/messages", json={"message": "Hi"})
+    assert response.status_code == 200
+    assert response.get_json() == {"response": "Mocked reply"}
+    mock_send.assert_called_once_with("abc123", "Hi")
+
+
+def test_session_api_unknown_session(client):
+    """Test sending a message to a session that does not exist."""
+    response = client.post("/api/sessions/missing/messages", json={"message": "Hi"})
+    assert response.status_code == 404
+    assert response.get_json()["error"] == "Session not found"
+
+
+def test_session_api_missing_message(client):
+    """Test sending an empty message to a session."""
+    response = client.post("/api/sessions/abc123/messages", json={})
+    assert response.status_code == 400
+    assert "No message provided" in response.get_json()["error"]
+
+
+@patch("vortai.routes.api.ai.generate_text")
+def test_large_json_responses_are_compressed(mock_generate, client):
+    """Test that large JSON answers are gzipped when the client accepts it."""
+    import gzip
+    import json
+
+    mock_generate.return_value = "word " * 1000
+
+    response = client.post(
+        "/api/generate", json={"prompt": "Test"}, headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    data = json.loads(gzip.decompress(response.get_data()))
+    assert data["response"] == mock_generate.return_value
+
+    response = client.post("/api/generate", json={"prompt": "Test"})
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json()["response"] == mock_generate.return_value
+
+
+def test_static_assets_are_fingerprinted(client):
+    """Test content-hash ETags and immutable caching for versioned assets."""
+    response = client.get("/static/css/main.css")
+    assert response.status_code == 200
+    assert "must-revalidate" in response.headers["Cache-Control"]
+    etag = response.headers["ETag"].strip('"')
+
+    response = client.get(f"/static/css/main.css?v={etag}")
+    assert "immutable" in response.headers["Cache-Control"]
+
+    response = client.get(
+        "/static/css/main.css", headers={"If-None-Match": f'"{etag}"'}
+    )
+    assert response.status_code == 304
+    assert client.get("/static/css/missing.css").status_code == 404
+
+
+def test_static_assets_serve_precompressed_variants(tmp_path):
+    """Test that .gz siblings are served to clients that accept gzip."""
+    import gzip
+    from flask import Flask
+    from vortai.extensions.compression import StaticAssets
+
+    (tmp_path / "app.js").write_text("console.log('hi');")
+    (tmp_path / "app.js.gz").write_bytes(gzip.compress(b"console.log('hi');"))
+    app = Flask(__name__, static_folder=str(tmp_path), static_url_path="/static")
+    StaticAssets(str(tmp_path)).init_app(app)
+    client = app.test_client()
+
+    response = client.get("/static/app.js", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"].endswith('-gzip"')
+    assert gzip.decompress(response.get_data()) == b"console.log('hi');"
+
+    response = client.get("/static/app.js")
+    assert "Content-Encoding" not in response.headers
+    assert response.get_data() == b"console.log('hi');"
+
+
+def test_index_served_from_memory_with_fingerprinted_links(client):
+    """Test the cached index page links to versioned static assets."""
+    response = client.get("/")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert b'href="/static/css/main.css?v=' in response.get_data()
+
+    response = client.get("/", headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+
+
+@patch("vortai.routes.api.ai.search_research")
+def test_research_search_api(mock_search, client):
+    """Test searching stored research reports."""
+    mock_search.return_value = [{"id": 1, "topic": "TPUs", "snippet": "[TPU]"}]
+
+    response = client.get("/api/research/search?q=tpu&limit=5")
+    assert response.status_code == 200
+    assert response.get_json()["results"] == mock_search.return_value
+    mock_search.assert_called_once_with("tpu", 5)
+
+    response = client.get("/api/research/search")
+    assert response.status_code == 400
+    assert "No query provided" in response.get_json()["error"]
+
+
+def test_metrics_api_requires_token(client, monkeypatch):
+    """Test that the metrics snapshot is off by default and needs a token."""
+    assert client.get("/api/metrics").status_code == 404
+
+    monkeypatch.setenv("METRICS_TOKEN", "secret")
+    assert client.get("/api/metrics").status_code == 401
+    response = client.get("/api/metrics", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    assert set(response.get_json()) == {"counters", "gauges", "timers"}
+
+
+def test_request_id_header(client):
+    """Test that request IDs are echoed back or generated."""
+    response = client.get("/api/metrics", headers={"X-Request-ID": "req-123"})
+    assert response.headers["X-Request-ID"] == "req-123"
+
+    response = client.get("/api/metrics", headers={"X-Request-ID": "bad id"})
+    assert len(response.headers["X-Request-ID"]) == 32
+
+
+def test_debug_endpoints_require_token(monkeypatch):
+    """Test that the debug blueprint is opt-in and admin-only."""
+    assert create_app().test_client().get("/debug/profiles").status_code == 404
+
+    monkeypatch.setenv("DEBUG_TOKEN", "admin")
+    debug_client = create_app().test_client()
+    auth = {"Authorization": "Bearer admin"}
+    assert debug_client.get("/debug/profiles").status_code == 401
+
+    response = debug_client.get("/debug/profile?seconds=0.05", headers=auth)
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+
+    assert (
+        debug_client.post("/debug/tracemalloc/start", headers=auth).status_code == 200
+    )
+    try:
+        for _ in range(2):
+            response = debug_client.post("/debug/tracemalloc/snapshot", headers=auth)
+            assert response.status_code == 200
+        response = debug_client.get("/debug/tracemalloc/diff", headers=auth)
+        assert "diff" in response.get_json()
+    finally:
+        debug_client.post("/debug/tracemalloc/stop", headers=auth)
+
+    response = debug_client.get("/api/metrics", headers={"X-Debug-Profile": "admin"})
+    profile_id = response.headers["X-Debug-Profile-Id"]
+    response = debug_client.get(f"/debug/profiles/{profile_id}", headers=auth)
+    assert "function calls" in response.get_data(as_text=True)
+
+
+def test_cli_serve_options():
+    """Test that `vortai serve` flags map onto gunicorn settings."""
+    from vortai.cli import build_parser, serve_options
+
+    args = build_parser().parse_args(
+        ["serve", "-w", "3", "--threads", "4", "--max-requests", "500"]
+    )
+    options = serve_options(args)
+    assert options["workers"] == 3
+    assert options["threads"] == 4
+    assert options["max_requests"] == 500
+    assert options["preload_app"] is False
+
+    args = build_parser().parse_args(["serve", "-k", "gevent", "--preload"])
+    options = serve_options(args)
+    assert "threads" not in options
+    assert options["preload_app"] is True
+
+
+def test_chat_channel_multiplexes_and_cancels():
+    """Test streaming, multiplexing and cancellation over a chat channel."""
+    import json
+    import threading
+    from vortai.routes.ws import ChatChannel
+
+    release = threading.Event()
+    done = threading.Event()
+
+    class FakeAI:
+        def stream_text(self, prompt, cancel):
+            if prompt == "slow":
+                yield "first"
+                release.wait(2)
+                if cancel.is_set():
+                    return
+            yield prompt
+
+    sent = []
+
+    def send(payload):
+        sent.append(json.loads(payload))
+        if sent[-1]["type"] in ("cancelled", "done") and sent[-1]["id"] == "slow":
+            done.set()
+
+    channel = ChatChannel(send, FakeAI())
+    channel.handle(json.dumps({"id": "slow", "type": "generate", "prompt": "slow"}))
+    channel.handle(json.dumps({"id": "fast", "type": "generate", "prompt": "fast"}))
+    channel.handle(json.dumps({"id": "slow", "type": "cancel"}))
+    release.set()
+    assert done.wait(2)
+    deadline = time.monotonic() + 2
+    while channel._in_flight and time.monotonic() < deadline:
+        time.sleep(0.01)
+    channel.handle("not json")
+
+    by_id = {}
+    for message in sent:
+        by_id.setdefault(message["id"], []).append(message["type"])
+    assert by_id["fast"] == ["chunk", "done"]
+    assert by_id["slow"][-1] == "cancelled"
+    assert by_id[None] == ["error"]
+
+
+def test_readyz_ready_without_warmup(client):
+    """Test that /readyz is ready at once when warm-up is disabled."""
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "ready"
+
+
+def test_readyz_waits_for_warmup():
+    """Test that /readyz reports 503 until the warm-up steps finish."""
+    import threading
+    from flask import Flask
+    from vortai.warmup import Warmup
+
+    release = threading.Event()
+
+    def broken():
+        raise RuntimeError("no credentials")
+
+    app = Flask(__name__)
+    warmup = Warmup([("slow", release.wait), ("broken", broken)])
+    warmup.init_app(app)
+    client = app.test_client()
+
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.get_json()["steps"]["slow"]["status"] == "pending"
+
+    release.set()
+    assert warmup.wait(2)
+    response = client.get("/readyz")
+    data = response.get_json()
+    # A failed step is reported but does not keep the instance unready
+    assert response.status_code == 200
+    assert data["steps"]["slow"]["status"] == "ok"
+    assert data["steps"]["broken"]["status"] == "failed"
+
+
+def test_readyz_gives_up_after_timeout():
+    """Test that a hung warm-up step cannot block readiness forever."""
+    import threading
+    from flask import Flask
+    from vortai.warmup import Warmup
+
+    hang = threading.Event()
+    app = Flask(__name__)
+    Warmup([("hang", hang.wait)], timeout=0.05).init_app(app)
+    time.sleep(0.1)
+    data = app.test_client().get("/readyz").get_json()
+    hang.set()
+    assert data["status"] == "ready"
+    assert data["timed_out"] is True
+
+
+def test_forked_worker_skips_inherited_warmup_steps():
+    """Test that a forked worker does not prime prompts the parent primed."""
+    from collections import Counter
+    from vortai import warmup as warmup_module
+    from vortai.warmup import Warmup
+
+    runs = Counter()
+    warmup = Warmup(
+        [
+            (name, lambda name=name: runs.update([name]))
+            for name in ("connections", "popular_prompts")
+        ]
+    )
+    warmup.start()
+    assert warmup.wait(2)
+    warmup_module._restart_after_fork()
+    assert warmup.wait(2)
+    assert runs == {"connections": 2, "popular_prompts": 1}
+    assert warmup.status()["steps"]["popular_prompts"]["status"] == "ok"
+
+
+@patch("vortai.routes.api.ai.generate_text")
+def test_cacheable_get_variant(mock_generate, client, monkeypatch):
+    """Test signed GET variants of generation endpoints for CDN caching."""
+    mock_generate.return_value = "Mocked response"
+    assert client.get("/api/generate?q=Hello&sig=x").status_code == 404
+
+    monkeypatch.setenv("CDN_SIGNING_KEY", "secret")
+    post = client.post("/api/generate", json={"prompt": "  Hello   world!"})
+    url = post.headers["Content-Location"]
+    assert url.startswith("/api/generate?q=Hello+world&sig=")
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.get_json() == {"response": "Mocked response"}
+    cache_control = response.headers["Cache-Control"]
+    assert "public" in cache_control
+    assert "s-maxage=" in cache_control
+    assert "stale-while-revalidate=" in cache_control
+    assert "Accept-Encoding" in response.headers["Vary"]
+    mock_generate.assert_called_with("Hello world")
+
+    revalidated = client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+    # A signature only covers the prompt it was issued for
+    forged = client.get(url.replace("Hello+world", "Goodbye+world"))
+    assert forged.status_code == 403
+    assert forged.headers["Cache-Control"] == "no-store"
+
+
+@patch("vortai.routes.api.ai.generate_image")
+def test_generate_image_async_job(mock_image_gen, client, monkeypatch):
+    """Test async image generation with a placeholder, polling and SSE."""
+    from vortai.routes.api import image_jobs
+
+    path = os.path.join(tempfile.gettempdir(), "vortai_images", "async_test.png")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"fake image data")
+    mock_image_gen.return_value = path
+
+    response = client.post(
+        "/api/generate-image", json={"prompt": "A red fox", "async": True}
+    )
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job["placeholder"]["color"].startswith("#")
+    assert job["placeholder"]["svg"].startswith("data:image/svg+xml,")
+    assert response.headers["Location"] == job["status_url"]
+
+    deadline = time.monotonic() + 2
+    while image_jobs.get(job["job_id"])["status"] == "pending":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    status = client.get(job["status_url"])
+    assert status.status_code == 303
+    image = client.get(status.headers["Location"])
+    assert image.data == b"fake image data"
+    assert "immutable" in image.headers["Cache-Control"]
+    # Threaded workers poll; event streams are only served on gevent
+    assert "events_url" not in job
+    events_url = f"{job['status_url']}/events"
+    assert client.get(events_url).status_code == 404
+    monkeypatch.setattr("vortai.routes.api.events_supported", lambda: True)
+    events = client.get(events_url).get_data(as_text=True)
+    assert events.startswith("retry: 1000\n\nevent: done\n")
+
+    # The same prompt joins the finished job instead of generating again
+    again = client.post(
+        "/api/generate-image", json={"prompt": "A  red fox.", "async": True}
+    )
+    assert again.get_json()["job_id"] == job["job_id"]
+    assert again.get_json()["placeholder"] == job["placeholder"]
+    mock_image_gen.assert_called_once_with("A red fox")
+    # The spool, not the job, decides when the file goes
+    os.remove(path)
+    assert client.get(status.headers["Location"]).status_code == 404
@@ -0,0 +1,919 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+import os
+import time
+import pytest
+from google.genai import errors
+from vortai.resilience import (
+    DeadlineExceeded,
+    LatencyTracker,
+    RetryBudget,
+    UpstreamCaller,
+    deadline,
+)
+
+# Set dummy API key for testing
+os.environ["GEMINI_API_KEY"] = "dummy"
+
+
+def flaky(failures, code=503):
+    """Return a call that fails ``failures`` times before succeeding."""
+    calls = []
+
+    def call(timeout):
+        calls.append(timeout)
+        if len(calls) <= failures:
+            raise errors.APIError(code, {"error": {"message": "unavailable"}})
+        return "ok"
+
+    return call, calls
+
+
+def test_upstream_retries_transient_errors():
+    """Test that 5xx responses are retried until they succeed."""
+    call, calls = flaky(2)
+    caller = UpstreamCaller(base_delay=0.001, budget=RetryBudget())
+    assert caller.call(call, "model") == "ok"
+    assert len(calls) == 3
+
+
+def test_upstream_does_not_retry_client_errors():
+    """Test that non-transient errors are raised immediately."""
+    call, calls = flaky(1, code=400)
+    caller = UpstreamCaller(base_delay=0.001, budget=RetryBudget())
+    with pytest.raises(errors.APIError):
+        caller.call(call, "model")
+    assert len(calls) == 1
+
+
+def test_upstream_retries_stop_when_budget_is_spent():
+    """Test that an empty retry budget turns off retries."""
+    call, calls = flaky(1)
+    budget = RetryBudget(ratio=0, min_per_second=0, max_tokens=0)
+    caller = UpstreamCaller(base_delay=0.001, budget=budget)
+    with pytest.raises(errors.APIError):
+        caller.call(call, "model")
+    assert len(calls) == 1
+
+
+def test_upstream_passes_remaining_deadline():
+    """Test that each attempt gets the time left on the request deadline."""
+    call, calls = flaky(0)
+    with deadline(2):
+        UpstreamCaller().call(call, "model")
+    assert 0 < calls[0] <= 2
+
+    with deadline(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            UpstreamCaller().call(call, "model")
+
+
+def test_upstream_hedges_slow_calls():
+    """Test that a hedged duplicate answers when the primary is slow."""
+    latency = LatencyTracker(min_samples=1)
+    latency.record("model", 0.01)
+    calls = []
+
+    def call(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    caller = UpstreamCaller(hedging=True, budget=RetryBudget(), latency=latency)
+    start = time.monotonic()
+    assert caller.call(call, "model") == "fast"
+    assert time.monotonic() - start < 0.4
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModels:
+    def __init__(self):
+        self.calls = []
+
+    def generate_content(self, model, contents, config=None):
+        self.calls.append({"model": model, "contents": contents, "config": config})
+        return FakeResponse(f"reply {len(self.calls)}")
+
+    def generate_content_stream(self, model, contents, config=None):
+        self.calls.append({"model": model, "contents": contents, "config": config})
+        for word in f"reply {len(self.calls)}".split():
+            yield FakeResponse(word)
+
+
+class FakeCaches:
+    def __init__(self):
+        self.created = []
+        self.deleted = []
+
+    def create(self, model, config):
+        self.created.append(config)
+        return type(
+            "CachedContent", (), {"name": f"cachedContents/{len(self.created)}"}
+        )
+
+    def delete(self, name):
+        self.deleted.append(name)
+
+
+class FakeClient:
+    def __init__(self):
+        self.models = FakeModels()
+        self.caches = FakeCaches()
+
+
+class FakeRedis:
+    """In-memory stand-in for redis-py that counts round trips."""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        self.round_trips = 0
+
+    def get(self, key):
+        self.round_trips += 1
+        return self.data.get(key)
+
+    def mget(self, keys):
+        self.round_trips += 1
+        return [self.data.get(key) for key in keys]
+
+    def _set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+        self.expiry[key] = ex
+        return True
+
+    def set(self, key, value, ex=None, nx=False):
+        self.round_trips += 1
+        return self._set(key, value, ex, nx)
+
+    def setex(self, key, ttl, value):
+        return self.set(key, value, ex=ttl)
+
+    def delete(self, *keys):
+        self.round_trips += 1
+        for key in keys:
+            self.data.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        redis, commands = self, []
+
+        class Pipeline:
+            def set(self, key, value, ex=None, nx=False):
+                commands.append((key, value, ex, nx))
+
+            def setex(self, key, ttl, value):
+                commands.append((key, value, ttl, False))
+
+            def execute(self):
+                redis.round_trips += 1
+                return [redis._set(*command) for command in commands]
+
+        return Pipeline()
+
+
+@pytest.fixture
+def ai():
+    from vortai import GeminiAI
+
+    ai = GeminiAI()
+    ai.client = FakeClient()
+    return ai
+
+
+def test_session_caches_long_history(ai, monkeypatch):
+    """Test that long sessions move their shared prefix into cached content."""
+    monkeypatch.setattr("vortai.sessions.CACHE_MIN_CHARS", 50)
+    session_id = ai.create_session("Be brief")
+
+    assert ai.send_message(session_id, "short") == "reply 1"
+    assert ai.client.caches.created == []
+    first = ai.client.models.calls[0]
+    assert first["config"]["system_instruction"] == "Be brief"
+
+    ai.send_message(session_id, "x" * 60)
+    assert len(ai.client.caches.created) == 1
+    assert len(ai.client.caches.created[0].contents) == 4
+
+    ai.send_message(session_id, "next")
+    last = ai.client.models.calls[-1]
+    assert last["config"]["cached_content"] == "cachedContents/1"
+    assert "system_instruction" not in last["config"]
+    assert len(last["contents"]) == 1
+
+
+def test_session_history_is_capped_and_cache_refreshed_sparingly(ai, monkeypatch):
+    """Test that long sessions are trimmed and not re-cached every turn."""
+    monkeypatch.setattr("vortai.sessions.CACHE_MIN_CHARS", 50)
+    monkeypatch.setattr("vortai.sessions.MAX_HISTORY_CHARS", 400)
+    session_id = ai.create_session()
+
+    ai.send_message(session_id, "x" * 60)
+    assert len(ai.client.caches.created) == 1
+    # The tail stays below half the cached prefix, so no new cache yet
+    ai.send_message(session_id, "y" * 20)
+    assert len(ai.client.caches.created) == 1
+    ai.send_message(session_id, "z" * 60)
+    assert len(ai.client.caches.created) == 2
+    assert ai.client.caches.deleted == ["cachedContents/1"]
+
+    for _ in range(4):
+        ai.send_message(session_id, "w" * 60)
+    session = ai.sessions.get(session_id)
+    total = sum(len(turn["text"]) for turn in session.history)
+    assert total <= 400
+    assert session.history[0]["role"] == "user"
+    assert session.history[-2]["text"] == "w" * 60
+    # The cache made before trimming is gone, and the new one matches
+    assert "cachedContents/2" in ai.client.caches.deleted
+    cache = ai.client.caches.created[-1]
+    assert len(cache.contents) == session.cached_turns == len(session.history)
+
+
+def test_session_store_writes_through_to_redis():
+    """Test that sessions are shared through Redis by every worker."""
+    from vortai.sessions import SessionStore
+
+    class FakeRedis(dict):
+        def setex(self, key, ttl, value):
+            self[key] = value
+
+    redis = FakeRedis()
+    store = SessionStore(redis, max_sessions=1)
+    first = store.create("first")
+    assert f"vortai:session:{first.id}" in redis
+    store.create("second")
+
+    reloaded = store.get(first.id)
+    assert reloaded.system_instruction == "first"
+    assert store.get("missing") is None
+
+    # A turn handled by another worker is seen here, not the stale copy
+    other = SessionStore(redis)
+    moved_on = other.get(first.id)
+    moved_on.history.append({"role": "user", "text": "hi"})
+    other.save(moved_on)
+    assert store.get(first.id).history == [{"role": "user", "text": "hi"}]
+    assert store.get(first.id) is store.get(first.id)
+
+
+def test_semantic_cache_serves_paraphrases(ai):
+    """Test that near-duplicate prompts are answered from the semantic cache."""
+    pytest.importorskip("numpy")
+    from vortai.extensions.semantic_cache import HashingEmbedder, SemanticCache
+
+    ai.semantic_cache = SemanticCache(HashingEmbedder(), threshold=0.75)
+    assert ai.generate_text("what is rust?") == "reply 1"
+    assert ai.generate_text("What's Rust") == "reply 1"
+    assert ai.generate_text("how do I bake bread") == "reply 2"
+    assert len(ai.client.models.calls) == 2
+
+
+def test_semantic_cache_evicts_lru_and_persists(tmp_path):
+    """Test LRU eviction and saving and loading the vector index."""
+    pytest.importorskip("numpy")
+    from vortai.extensions.semantic_cache import HashingEmbedder, SemanticCache
+
+    cache = SemanticCache(HashingEmbedder(), capacity=2, threshold=0.99)
+    cache.set("alpha prompt", "a")
+    cache.set("beta prompt", "b")
+    assert cache.get("alpha prompt") == "a"
+    cache.set("gamma prompt", "c")
+    assert cache.get_many(["alpha prompt", "beta prompt", "gamma prompt"]) == [
+        "a",
+        None,
+        "c",
+    ]
+
+    path = str(tmp_path / "index.npz")
+    cache.save(path)
+    restored = SemanticCache(HashingEmbedder(), capacity=2, threshold=0.99)
+    restored.load(path)
+    assert restored.get("gamma prompt") == "c"
+    assert len(restored) == 2
+
+
+def test_canonicalize_prompt_variants():
+    """Test that formatting-only differences map to one canonical prompt."""
+    from vortai.prompts import canonicalize
+
+    assert canonicalize("  what   is\trust?\n") == "what is rust"
+    assert canonicalize("cafe\u0301") == canonicalize("caf\u00e9")
+    assert canonicalize("What is Rust") == "What is Rust"
+    assert canonicalize("What is Rust", casefold=True) == "what is rust"
+    assert canonicalize("?!") == "?!"
+
+
+def test_generate_text_dedups_canonical_prompts(ai):
+    """Test that prompt variants share a cache entry but reach the model as sent."""
+    assert ai.generate_text("What is  Rust?") == "reply 1"
+    assert ai.generate_text(" What is Rust ") == "reply 1"
+    assert ai.generate_text("What is Rust!") == "reply 1"
+    assert len(ai.client.models.calls) == 1
+    assert ai.client.models.calls[0]["contents"] == "What is  Rust?"
+
+
+def test_research_store_batches_and_searches(tmp_path):
+    """Test storing reports off-thread, fresh lookups and full-text search."""
+    from vortai.extensions.research_store import ResearchStore
+
+    store = ResearchStore(str(tmp_path / "research.db"))
+    store.add("History of Google TPUs", "TPUs are custom ASICs.", ["https://a"])
+    store.add("Rust ownership", "Ownership and borrowing explained.", [])
+    store.flush()
+
+    fresh = store.find_fresh("  history of google TPUs ")
+    assert fresh == {"report": "TPUs are custom ASICs.", "citations": ["https://a"]}
+    assert store.find_fresh("History of Google TPUs", max_age=-1) is None
+
+    results = store.search("borrowing")
+    assert [r["topic"] for r in results] == ["Rust ownership"]
+    assert "[borrowing]" in results[0]["snippet"]
+    assert store.search('" OR *') == []
+
+
+def test_research_store_is_opt_in(monkeypatch, tmp_path):
+    """Test that reports are only persisted when RESEARCH_DB_PATH is set."""
+    from vortai.extensions.research_store import ResearchStore
+
+    monkeypatch.delenv("RESEARCH_DB_PATH", raising=False)
+    assert ResearchStore.from_env() is None
+
+    monkeypatch.setenv("RESEARCH_DB_PATH", str(tmp_path / "research.db"))
+    store = ResearchStore.from_env()
+    assert store is not None and store.path == str(tmp_path / "research.db")
+
+
+def test_research_topic_reuses_stored_report(ai, tmp_path):
+    """Test that an equivalent stored topic skips a new agent run."""
+    from vortai.extensions.research_store import ResearchStore
+
+    ai.research_store = ResearchStore(str(tmp_path / "research.db"))
+    ai.research_store.add("Quantum computing", "Stored report", [])
+    ai.research_store.flush()
+
+    assert ai.research_topic("quantum  computing")["report"] == "Stored report"
+
+
+def test_genai_clients_share_one_transport():
+    """Test that all google-genai clients reuse the process-wide pool."""
+    from vortai import transport
+
+    first = transport.get_client("key-one")
+    assert transport.get_client("key-one") is first
+    second = transport.get_client("key-two")
+    assert second is not first
+    assert first._api_client._httpx_client is transport.http_client()
+    assert second._api_client._httpx_client is transport.http_client()
+    assert "genai.pool.utilization" in transport.pool_stats()
+
+    pool = transport._transport._inner
+    transport._reinit_after_fork()
+    assert transport._transport._inner is not pool
+    assert transport.pool_stats()["genai.pool.in_flight"] == 0
+
+
+def test_log_sampling_and_json_format():
+    """Test that repeated errors are sampled and records render as JSON."""
+    import json
+    import logging
+    from vortai import log
+
+    sampler = log.SamplingFilter(burst=2, sample_rate=5)
+
+    def record(level=logging.ERROR):
+        return logging.LogRecord("x", level, __file__, 1, "boom %s", ("a",), None)
+
+    passed = [r for r in (record() for _ in range(10)) if sampler.filter(r)]
+    assert len(passed) == 4
+    assert [getattr(r, "suppressed", 0) for r in passed] == [0, 0, 2, 4]
+    assert all(sampler.filter(record(logging.INFO)) for _ in range(10))
+
+    token = log._context.set({"request_id": "abc", "endpoint": "api.generate"})
+    try:
+        log.bind(model="gemini", cache="hit")
+        entry = record()
+        log.ContextFilter().filter(entry)
+    finally:
+        log._context.reset(token)
+    entry.duration_ms = 1.5
+    data = json.loads(log.JsonFormatter().format(entry))
+    assert data["msg"] == "boom a"
+    assert data["request_id"] == "abc"
+    assert data["cache"] == "hit"
+    assert data["duration_ms"] == 1.5
+
+
+def test_research_store_restarts_after_fork(tmp_path):
+    """Test that a forked worker gets its own writer and connections."""
+    from vortai.extensions import research_store
+    from vortai.extensions.research_store import ResearchStore
+
+    store = ResearchStore(str(tmp_path / "research.db"))
+    writer, conn = store._writer, store._conn()
+    research_store._reset_after_fork()
+    assert store._writer is not writer and store._writer.is_alive()
+    assert store._conn() is not conn
+
+    store.add("Fork safety", "Report", [])
+    store.flush()
+    assert store.find_fresh("fork safety")["report"] == "Report"
+
+
+def test_stream_text_caches_complete_replies(ai):
+    """Test that streamed replies are cached, and cancelled ones are not."""
+    import threading
+
+    cancel = threading.Event()
+    stream = ai.stream_text("Stream this", cancel)
+    assert next(stream) == "reply"
+    cancel.set()
+    assert list(stream) == []
+
+    assert list(ai.stream_text("Stream this")) == ["reply", "2"]
+    assert list(ai.stream_text("Stream this")) == ["reply2"]
+    assert len(ai.client.models.calls) == 2
+
+
+def test_stream_message_updates_history(ai):
+    """Test that a streamed session reply is added to the history."""
+    session_id = ai.create_session()
+    assert list(ai.stream_message(session_id, "Hi")) == ["reply", "1"]
+    assert ai.sessions.get(session_id).history[-1] == {
+        "role": "model",
+        "text": "reply1",
+    }
+
+
+def test_model_router_fails_over_and_back(ai):
+    """Test routing away from an erroring model and back after a trial."""
+    from vortai.routing import ModelRouter, counts_against_model
+
+    ai.upstream = UpstreamCaller(max_attempts=1)
+    ai.router = ModelRouter(
+        {"text": ("primary", "backup"), "thinking": ("slow", "primary")},
+        {"text": {"p95": 10.0, "error_rate": 0.2}},
+        window=0.2,
+        min_samples=3,
+        trial_share=0,
+    )
+    fake = ai.client.models
+    healthy = fake.generate_content
+
+    def generate_content(model, contents, config=None):
+        if model == "primary":
+            raise errors.APIError(503, {"error": {"message": "overloaded"}})
+        return healthy(model, contents, config)
+
+    fake.generate_content = generate_content
+    for i in range(3):
+        with pytest.raises(ValueError):
+            ai.generate_text(f"Question {i}")
+    assert ai.router.choose("text") == "backup"
+    # Health is judged per capability
+    assert ai.router.choose("thinking") == "slow"
+    ai.generate_text("Another question")
+    assert fake.calls[-1]["model"] == "backup"
+
+    # Stale errors alone do not bring it back; a successful trial does
+    time.sleep(0.25)
+    assert ai.router.choose("text") == "backup"
+    fake.generate_content = healthy
+    ai.router.trial_share = 1.0
+    ai.generate_text("Trial question")
+    assert fake.calls[-1]["model"] == "primary"
+    ai.router.trial_share = 0
+    assert ai.router.choose("text") == "primary"
+    assert "model.healthy{capability=text,model=primary}" in ai.router.gauges()
+
+    # A retry goes to the next candidate
+    ai.upstream = UpstreamCaller(max_attempts=2, base_delay=0)
+    fake.generate_content = generate_content
+    ai.generate_text("Retried question")
+    assert fake.calls[-1]["model"] == "backup"
+
+    quota = errors.APIError(429, {"error": {"message": "quota"}})
+    assert counts_against_model(quota)
+    assert not counts_against_model(quota, pooled_key=True)
+
+
+def test_key_pool_spreads_calls_and_skips_limited_keys():
+    """Test that calls are spread across keys and 429s park a key."""
+    from vortai import GeminiAI
+    from vortai.keypool import KeyPool
+
+    clients = {key: FakeClient() for key in ("key-a", "key-b", "key-c")}
+    ai = GeminiAI(api_keys=list(clients))
+    ai.client = FakeClient()
+    ai.upstream = UpstreamCaller(max_attempts=2, base_delay=0)
+    ai.keys = KeyPool(list(clients), rpm=10, client_factory=clients.__getitem__)
+
+    for i in range(6):
+        ai.generate_text(f"Prompt {i}")
+    assert [len(c.models.calls) for c in clients.values()] == [2, 2, 2]
+
+    def rate_limited(model, contents, config=None):
+        raise errors.APIError(
+            429, {"error": {"message": "quota", "details": [{"retryDelay": "30s"}]}}
+        )
+
+    clients["key-a"].models.generate_content = rate_limited
+    for i in range(4):
+        ai.generate_text(f"Limited {i}")
+    assert ai.keys.gauges()["genai.key.cooling_down{key=...ey-a}"] == 1.0
+    served = sum(len(clients[key].models.calls) for key in ("key-b", "key-c"))
+    assert served == 8
+
+    # One collector covers every pool, however many clients are built
+    from vortai.metrics import metrics
+
+    collectors = len(metrics._collectors)
+    GeminiAI(api_keys=list(clients))
+    assert len(metrics._collectors) == collectors
+    assert "genai.key.cooling_down{key=...ey-a}" in metrics.snapshot()["gauges"]
+
+
+def test_key_pool_shares_quota_across_workers():
+    """Test that GEMINI_KEY_RPM is counted once for all workers via Redis."""
+    from vortai.keypool import KeyPool
+
+    class SharedCounts:
+        """Runs the acquire script's logic against a dict."""
+
+        def __init__(self):
+            self.counts = {}
+            self.down = False
+
+        def register_script(self, script):
+            def run(keys, args):
+                if self.down:
+                    raise ConnectionError("Redis is marked unhealthy")
+                rpm = int(args[0])
+                best = min(keys, key=lambda k: self.counts.get(k, 0))
+                if self.counts.get(best, 0) >= rpm:
+                    return 0
+                self.counts[best] = self.counts.get(best, 0) + 1
+                return keys.index(best) + 1
+
+            return run
+
+    redis_client = SharedCounts()
+    workers = [
+        KeyPool(["key-a", "key-b"], rpm=2, redis_client=redis_client) for _ in range(3)
+    ]
+    picked = [worker.acquire() for worker in workers for _ in range(2)]
+    assert sorted(picked[:4]) == ["key-a", "key-a", "key-b", "key-b"]
+    assert sum(redis_client.counts.values()) == 4
+    # Both keys are used up for this minute, across all workers
+    from vortai.metrics import metrics
+
+    exhausted = metrics.snapshot()["counters"].get("genai.keys.exhausted", 0)
+    workers[2].acquire()
+    assert metrics.snapshot()["counters"]["genai.keys.exhausted"] == exhausted + 1
+
+    redis_client.down = True
+    assert workers[0].acquire() in ("key-a", "key-b")
+
+
+def test_response_cache_serves_stale_while_refreshing(ai):
+    """Test that stale replies are served and refreshed in the background."""
+    from vortai import prompts
+    from vortai.extensions.response_cache import ResponseCache
+
+    ai.cache = ResponseCache(ttl=0.05, max_stale=60)
+    key = prompts.cache_key(ai.canonicalizer("Popular prompt"), "text")
+    assert ai.generate_text("Popular prompt") == "reply 1"
+    time.sleep(0.06)
+
+    # Stale: served immediately while a refresh runs in the background
+    assert ai.generate_text("Popular prompt") == "reply 1"
+    deadline = time.monotonic() + 2
+    while ai.cache.get(key)[1] != "hit":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert ai.generate_text("Popular prompt") == "reply 2"
+    assert len(ai.client.models.calls) == 2
+
+
+def test_response_cache_refreshes_hot_keys_ahead():
+    """Test that hot keys are refreshed before they go stale."""
+    import threading
+    from vortai.extensions.response_cache import ResponseCache
+
+    cache = ResponseCache(ttl=0.2, refresh_ahead=True, hot_hits=2, refresh_at=0.5)
+    cache.set("key", "old")
+    release = threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        release.wait(1)
+        return "new"
+
+    time.sleep(0.11)
+    assert cache.get("key", refresh) == ("old", "hit")
+    for _ in range(3):
+        assert cache.get("key", refresh) == ("old", "hit")
+    release.set()
+    deadline = time.monotonic() + 1
+    while cache.get("key")[0] != "new":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert len(calls) == 1
+
+
+def test_response_cache_snapshot_round_trip(tmp_path):
+    """Test that snapshots restore unexpired entries and reject corruption."""
+    from vortai.extensions.response_cache import ResponseCache
+
+    path = str(tmp_path / "cache.snap")
+    cache = ResponseCache(ttl=60, max_stale=60)
+    cache.set("old", "expired")
+    cache._memory["old"] = ("expired", time.time() - 500)
+    for i in range(3):
+        cache.set(f"key{i}", f"value {i} é")
+    cache.get("key0")
+    assert cache.save(path) == 4
+
+    restored = ResponseCache(ttl=60, max_stale=60)
+    restored.set("key1", "newer")
+    assert restored.load(path) == 2
+    assert list(restored._memory) == ["key2", "key0", "key1"]
+    assert restored.get("key1")[0] == "newer"
+    assert restored.get("key2")[0] == "value 2 é"
+    assert restored.get("old") == (None, "miss")
+
+    # Workers sharing the file add to it rather than overwrite each other
+    other = ResponseCache(ttl=60, max_stale=60)
+    other.set("key9", "from another worker")
+    assert other.save(path) == 4  # The expired entry is dropped
+    merged = ResponseCache(ttl=60, max_stale=60)
+    assert merged.load(path) == 4
+    assert merged.get("key9")[0] == "from another worker"
+
+    with open(path, "r+b") as f:
+        f.seek(-3, 2)
+        f.write(b"xxx")
+    assert ResponseCache().load(path) == 0
+
+
+def test_codec_compresses_large_values():
+    """Test the cache codec header, compression and round trips."""
+    from vortai.extensions import codec
+
+    small = codec.encode("short")
+    assert small[0] == codec.MAGIC and small[2:] == b"short"
+    large = "A long cached answer. " * 500
+    encoded = codec.encode(large)
+    assert encoded[1] >> 4 != codec.COMPRESS_NONE
+    assert len(encoded) < len(large) // 10
+    assert codec.decode(encoded) == large
+    assert codec.decode(codec.encode({"response": "x", "n": [1, 2]})) == {
+        "response": "x",
+        "n": [1, 2],
+    }
+    with pytest.raises(ValueError):
+        codec.decode(b'{"legacy": "json"}')
+
+
+def test_caches_batch_redis_round_trips():
+    """Test MGET/pipelined access and expiring, encoded Redis entries."""
+    from vortai.extensions.cache import Cache
+    from vortai.extensions.response_cache import ResponseCache
+
+    redis = FakeRedis()
+    cache = Cache()
+    cache.redis = redis
+    cache.set_many({"a": {"text": "x" * 2000}, "b": [1, 2]}, ttl=60)
+    redis.data["legacy"] = b'"old json"'
+    assert cache.get_many(["a", "b", "legacy", "missing"]) == [
+        {"text": "x" * 2000},
+        [1, 2],
+        "old json",
+        None,
+    ]
+    assert redis.round_trips == 2
+    assert redis.expiry["a"] == 60
+
+    responses = ResponseCache(redis, ttl=10, max_stale=20)
+    responses.set_many({"k1": "one", "k2": "two"})
+    redis.data["bare"] = b"written before timestamps"
+    assert responses.get_many(["k1", "k2", "bare", "nope"]) == [
+        ("one", "hit"),
+        ("two", "hit"),
+        ("written before timestamps", "stale"),
+        (None, "miss"),
+    ]
+    assert redis.expiry["k1"] == 30
+
+
+def test_tracing_spans_and_propagation(ai, monkeypatch):
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+        InMemorySpanExporter,
+    )
+    from vortai import sdk, tracing
+
+    # Off by default: span() hands back a shared no-op context manager
+    assert tracing.span("anything") is tracing.span("other")
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(tracing, "_tracer", provider.get_tracer("test"))
+
+    ai.generate_text("hello")
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    root = spans["GeminiAI.generate_text"]
+    assert spans["cache.lookup"].attributes["cache"] == "miss"
+    assert spans["genai.generate_content"].parent.span_id == root.context.span_id
+
+    sent = {}
+
+    class FakeReply:
+        text = "hello world"
+
+        def raise_for_status(self):
+            pass
+
+    def fake_post(url, data, headers, timeout):
+        sent.update(headers)
+        return FakeReply()
+
+    monkeypatch.setattr(sdk.requests, "post", fake_post)
+    assert ai.process_text_go("hello   world") == "hello world"
+    hop = {span.name: span for span in exporter.get_finished_spans()}["go.process_text"]
+    assert sent["traceparent"].split("-")[1] == f"{hop.context.trace_id:032x}"
+
+
+def test_redis_pool_trips_and_caches_fall_back_to_memory(monkeypatch):
+    """A refused connection opens the breaker; caches then use memory."""
+    pytest.importorskip("redis")
+    import redis
+    from vortai import redis_pool
+    from vortai.extensions.response_cache import ResponseCache
+
+    monkeypatch.setenv("REDIS_COOLDOWN", "60")
+    client = redis_pool.get_client("redis://127.0.0.1:1/0")
+    assert redis_pool.get_client("redis://127.0.0.1:1/0") is client
+    with pytest.raises(redis.ConnectionError):
+        client.ping()
+    assert not redis_pool.healthy(client)
+    start = time.monotonic()
+    with pytest.raises(redis.ConnectionError, match="unhealthy"):
+        client.get("k")
+    assert time.monotonic() - start < 0.05
+    assert redis_pool.pool_stats()["redis.healthy{server=127.0.0.1}"] == 0.0
+
+    responses = ResponseCache(client, ttl=10, max_stale=20)
+    responses.set("k", "v")
+    assert responses.get("k") == ("v", "hit")
+    assert responses.get_many(["k", "nope"]) == [("v", "hit"), (None, "miss")]
+
+
+def test_spool_writes_atomically_and_evicts(tmp_path, monkeypatch):
+    """Test spool reuse, the startup sweep and quota eviction."""
+    from vortai import sdk, spool
+
+    orphan = tmp_path / "tmp-dead.png"
+    orphan.write_bytes(b"partial")
+    stale = tmp_path / "old.png"
+    stale.write_bytes(b"old")
+    os.utime(orphan, (0, 0))
+    os.utime(stale, (0, 0))
+    images = spool.Spool(str(tmp_path), max_bytes=10, max_age=600)
+    assert not orphan.exists() and not stale.exists()
+
+    def save(data):
+        def write(path):
+            with open(path, "wb") as f:
+                f.write(data)
+            if not data:
+                raise OSError("disk full")
+
+        return write
+
+    first = images.write(".png", save(b"123456"), spool.key("image", "a fox"))
+    assert images.lookup(spool.key("image", "a fox")) == first
+    assert images.lookup(spool.key("image", "a cat")) is None
+    # Checking for a file does not count as using it
+    os.utime(first, (0, time.time()))
+    assert images.exists(spool.key("image", "a fox"))
+    assert not images.exists(spool.key("image", "a cat"))
+    assert os.stat(first).st_atime == 0
+    with pytest.raises(OSError):
+        images.write(".png", save(b""))
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(first)]
+    # Over the quota, but files about to be sent are never evicted
+    second = images.write(".png", save(b"abcdef"))
+    assert len(os.listdir(tmp_path)) == 2
+    os.utime(first, (0, time.time() - 120))  # least recently used
+    images.write(".png", save(b"123456"), spool.key("image", "a fox"))
+    assert images._bytes == 12
+    os.utime(first, (0, time.time() - 120))
+    images.sweep()
+    assert os.listdir(tmp_path) == [os.path.basename(second)]
+
+    # Speech for the same words is served from the spool
+    audio = spool.Spool(str(tmp_path / "tts"))
+    monkeypatch.setattr(spool, "audio", lambda: audio)
+    calls = []
+
+    class FakeTTS:
+        def __init__(self, text, **kwargs):
+            calls.append(text)
+
+        def save(self, path):
+            with open(path, "wb") as f:
+                f.write(b"mp3")
+
+    monkeypatch.setattr(sdk, "gTTS", FakeTTS)
+    ai = sdk.GeminiAI()
+    path = ai.text_to_speech("Hello  world")
+    assert ai.text_to_speech("Hello world") == path
+    assert calls == ["Hello  world"]
+    assert ai.cached("tts", ["Hello world", "Goodbye"]) == [True, False]
+
+
+def test_prewarm_ranks_logged_prompts_and_paces(ai, tmp_path):
+    """Test ranking prompts from access logs and warming the top ones."""
+    import json
+    from vortai.prewarm import Prewarmer, format_report, rank, read_access_log
+
+    now = time.time()
+
+    def record(prompt, age, **extra):
+        entry = {"logger": "vortai.access", "status": 200, "mode": "text"}
+        entry.update(prompt=prompt, ts=now - age, **extra)
+        return json.dumps(entry)
+
+    log_file = tmp_path / "access.log"
+    log_file.write_text(
+        "\n".join(
+            [
+                record("weekly report", 7 * 86400, cache="miss"),
+                record("weekly report", 7 * 86400, cache="miss"),
+                record("weekly report", 7 * 86400, cache="miss"),
+                record("what is rust", 60, cache="miss"),
+                record("what is rust", 30, cache="hit"),
+                record("rare question", 10, cache="miss"),
+                "[2025-01-01 12:00:00] gunicorn booting worker",
+                json.dumps({"logger": "vortai.access", "status": 200}),
+            ]
+        )
+    )
+    rankings = rank(read_access_log([str(log_file)]), now=now)
+    ranking = rankings["text"]
+    assert [text for text, _ in ranking.top(2)] == ["what is rust", "rare question"]
+
+    sleeps = []
+    report = Prewarmer(ai, limit="2/second", sleep=sleeps.append).run(ranking, 2)
+    assert report["computed"] == 2 and report["failed"] == 0
+    assert report["before"] == 0 and 0.5 < report["after"] < 1
+    assert report["logged"] == 1 / 6
+    assert "hit ratio 0.0%" in format_report(report)
+    # Paced by the endpoint's rate-limit cost (1 unit, 2 per second)
+    assert len(sleeps) == 1 and 0 < sleeps[0] <= 0.5
+    assert ai.generate_text("what  is rust") == "reply 1"
+    assert len(ai.client.models.calls) == 2
+
+    again = Prewarmer(ai, sleep=sleeps.append).run(ranking, 2)
+    assert again["already_cached"] == 2 and again["computed"] == 0
+
+
+def test_prewarm_cli_needs_shared_cache(tmp_path, monkeypatch, capsys):
+    """Test that prewarm only warms text, and only into Redis."""
+    import json
+    from vortai import cli
+
+    log_file = tmp_path / "access.log"
+    log_file.write_text(
+        "\n".join(
+            json.dumps(
+                {"logger": "vortai.access", "status": 200, "mode": m, "prompt": "hi"}
+            )
+            for m in ("text", "tts")
+        )
+    )
+
+    def run(*argv):
+        args = cli.build_parser().parse_args(["prewarm", str(log_file), *argv])
+        return args.func(args)
+
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    assert run() == 1
+    assert "set REDIS_URL" in capsys.readouterr().err
+    assert run("--dry-run") == 0
+    # The tts record is not ranked
+    assert capsys.readouterr().out.splitlines() == ["1.00\thi"]
@@ -6,23 +6,26 @@
 
 __version__ = "0.0.5"
 
-from flask import Flask, send_file, request
+from flask import Flask
 from .sdk import GeminiAI
+from .extensions.compression import Compression, StaticAssets
+from .extensions import idempotency
+from . import redis_pool
+from .extensions.ratelimit import DEFAULT_LIMIT, RateLimiter, RedisStorage
+from .log import configure_logging, init_request_logging
+from .tracing import configure_tracing, init_request_tracing
+from .warmup import Warmup
+from .cli import main
 from flask_cors import CORS
-from flask_limiter import Limiter
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 __all__ = ["create_app", "GeminiAI", "main"]
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
 
 # Load environment variables
 load_dotenv()
 
-# Configure the Gemini API with your API key
-genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-
 
 def create_app():
     app = Flask(
@@ -36,6 +39,14 @@ def create_app():
     )
     CORS(app)  # Enable CORS for all routes
 
+    # Structured, queue-backed logging with per-request IDs
+    configure_logging()
+    init_request_logging(app)
+
+    # Optional OpenTelemetry spans (TRACING=otlp|console); no-op otherwise
+    configure_tracing()
+    init_request_tracing(app)
+
     # Conditionally apply ProxyFix if PROXY_COUNT is set and > 0
     proxy_count = int(os.environ.get("PROXY_COUNT", "0"))
     if proxy_count > 0:
@@ -43,28 +54,50 @@ def create_app():
             app.wsgi_app, x_for=proxy_count, x_proto=proxy_count, x_host=proxy_count
         )
 
-    # Initialize rate limiter
-    storage_uri = os.environ.get("REDIS_URL") or "memory://"
-    limiter = Limiter(
-        storage_uri=storage_uri,
-        key_func=lambda: (
-            request.remote_addr if hasattr(request, "remote_addr") else "unknown"
-        ),
+    # Initialize cost-weighted rate limiting for API routes
+    # One pooled client per process, shared with the SDK cache and job state
+    redis_client = redis_pool.get_client()
+    storage = RedisStorage(redis_client) if redis_client is not None else None
+    limiter = RateLimiter(
+        limit=os.environ.get("RATE_LIMIT", DEFAULT_LIMIT), storage=storage
     )
     limiter.init_app(app)
 
     # Register blueprints
-    from .routes.api import api_bp
+    from .routes.api import ai, api_bp, request_timeout
+    from .routes.ws import init_websocket
 
     app.register_blueprint(api_bp)
+    # Streaming chat over WebSocket (requires flask-sock)
+    init_websocket(app, ai)
+
+    # Admin-only profiling endpoints, disabled unless DEBUG_TOKEN is set
+    if os.environ.get("DEBUG_TOKEN"):
+        from .routes.debug import debug_bp, init_request_profiling
 
-    # Apply rate limiting to API routes
-    limiter.limit("100/hour")(api_bp)
+        app.register_blueprint(debug_bp)
+        init_request_profiling(app)
+
+    # Compress large JSON/SSE responses and serve fingerprinted static assets
+    Compression(min_size=int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))).init_app(app)
+    assets = StaticAssets(app.static_folder)
+    assets.init_app(app)
+
+    # Replay stored responses for retried image/research requests that
+    # carry an Idempotency-Key; registered after Compression on purpose
+    idempotency.Idempotency(
+        idempotency.RedisStorage(redis_client) if redis_client else None,
+        ttl=int(os.environ.get("IDEMPOTENCY_TTL", "86400")),
+        timeout=request_timeout,
+    ).init_app(app)
+
+    # Optional warm-up (WARMUP=1); /readyz reports 503 until it finishes
+    Warmup.from_env(ai, [redis_client, ai.cache.redis]).init_app(app)
 
     # Serve React build for root route
     @app.route("/")
     def index():
-        return send_file(os.path.join(app.template_folder, "index.html"))
+        return assets.index(os.path.join(app.template_folder, "index.html"))
 
     @app.after_request
     def add_security_headers(response):
@@ -74,9 +107,3 @@ def create_app():
         return response
 
     return app
-
-
-def main():
-    """Entry point for the CLI application."""
-    app = create_app()
-    app.run()
@@ -0,0 +1,64 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Signed, CDN-cacheable GET URLs for deterministic generation modes.
+A URL names the mode and the canonical prompt, plus an HMAC so that
+only prompts this server has produced can be requested by GET.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+from typing import Dict, Optional
+from urllib.parse import urlencode
+
+# Cacheable mode -> GET path serving it
+PATHS = {
+    "text": "/api/generate",
+    "tts": "/api/text-to-speech",
+    "image": "/api/generate-image",
+}
+
+
+def signing_key() -> Optional[bytes]:
+    """CDN_SIGNING_KEY; GET variants are disabled without it."""
+    key = os.environ.get("CDN_SIGNING_KEY")
+    return key.encode("utf-8") if key else None
+
+
+def sign(mode: str, canonical: str, key: bytes) -> str:
+    """URL-safe signature over the mode and canonical prompt (128 bits)."""
+    message = f"{mode}\n{canonical}".encode("utf-8")
+    digest = hmac.new(key, message, hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def verify(mode: str, canonical: str, signature: str, key: bytes) -> bool:
+    return hmac.compare_digest(sign(mode, canonical, key), signature)
+
+
+def url_for(mode: str, canonical: str, key: bytes) -> str:
+    """Relative GET URL serving ``mode`` for a canonical prompt."""
+    query = urlencode({"q": canonical, "sig": sign(mode, canonical, key)})
+    return f"{PATHS[mode]}?{query}"
+
+
+def cache_headers() -> Dict[str, str]:
+    """Headers letting browsers, CDNs and proxies share a cached result.
+
+    Browsers keep the result for CDN_MAX_AGE seconds and shared caches
+    for CDN_S_MAXAGE, then serve it stale for up to
+    CDN_STALE_WHILE_REVALIDATE seconds while fetching a fresh copy.
+    """
+    max_age = int(os.environ.get("CDN_MAX_AGE", "300"))
+    s_maxage = int(os.environ.get("CDN_S_MAXAGE", "86400"))
+    stale = int(os.environ.get("CDN_STALE_WHILE_REVALIDATE", "604800"))
+    return {
+        "Cache-Control": (
+            f"public, max-age={max_age}, s-maxage={s_maxage}, "
+            f"stale-while-revalidate={stale}"
+        ),
+        "Vary": "Accept-Encoding",
+    }
@@ -0,0 +1,206 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Command-line interface for Vortai.
+``vortai`` runs the development server; ``vortai serve`` runs a
+multi-worker production server on gunicorn, and ``vortai prewarm``
+fills the shared cache with popular prompts from the access log.
+"""
+
+import argparse
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+# Upper bound on a single request (the research endpoint allows 330s)
+DEFAULT_WORKER_TIMEOUT = 360
+
+
+def _default_workers() -> int:
+    return int(os.environ.get("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+
+
+def serve_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """Translate ``vortai serve`` arguments into gunicorn settings."""
+    options: Dict[str, Any] = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": args.worker_class,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests_jitter,
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "preload_app": args.preload,
+        "accesslog": None,  # Requests are logged by vortai.log
+    }
+    if args.worker_class == "gthread":
+        options["threads"] = args.threads
+    elif args.worker_class == "gevent":
+        options["worker_connections"] = args.worker_connections
+    return options
+
+
+if BaseApplication is not None:
+
+    class VortaiServer(BaseApplication):
+        """Gunicorn application serving ``create_app()``.
+
+        By default every worker builds its own app. ``preload_app`` builds
+        it once in the master instead, which is not fork-safe:
+        ``create_app`` starts background threads (warm-up, the log
+        listener, the snapshot loader, the research writer), and a lock
+        one of them holds at fork time stays held in the worker.
+        """
+
+        def __init__(self, options: Dict[str, Any]):
+            self.options = options
+            super().__init__()
+
+        def load_config(self) -> None:
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from . import create_app
+
+            return create_app()
+
+
+def serve(args: argparse.Namespace) -> int:
+    if BaseApplication is None:
+        print("vortai serve requires gunicorn: uv sync --group serve", file=sys.stderr)
+        return 1
+    VortaiServer(serve_options(args)).run()
+    return 0
+
+
+def prewarm(args: argparse.Namespace) -> int:
+    from .prewarm import Prewarmer, format_report, rank, read_access_log
+
+    if args.nice and hasattr(os, "nice"):
+        # Yield the CPU to any server sharing the host
+        os.nice(args.nice)
+    try:
+        rankings = rank(read_access_log(args.logs), half_life=args.half_life * 3600)
+    except OSError as e:
+        print(f"Could not read access log: {e}", file=sys.stderr)
+        return 1
+    ranking = rankings.get("text")
+    if ranking is None:
+        print(
+            "No prompts in the access log; run the server with LOG_PROMPTS=1",
+            file=sys.stderr,
+        )
+        return 1
+    if args.dry_run:
+        for text, score in ranking.top(args.top_k):
+            print(f"{score:.2f}\t{text}")
+        return 0
+    if not os.environ.get("REDIS_URL"):
+        # Without Redis the response cache lives in this process and is lost
+        print("vortai prewarm needs a shared cache: set REDIS_URL", file=sys.stderr)
+        return 1
+
+    from .sdk import GeminiAI
+
+    prewarmer = Prewarmer(
+        GeminiAI(), limit=args.limit, timeout=args.timeout, budget=args.budget
+    )
+    print(format_report(prewarmer.run(ranking, args.top_k)))
+    return 0
+
+
+def run_dev(args: argparse.Namespace) -> int:
+    from . import create_app
+
+    create_app().run()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="vortai")
+    parser.set_defaults(func=run_dev)
+    commands = parser.add_subparsers(dest="command")
+
+    serve_parser = commands.add_parser("serve", help="Run the production server")
+    serve_parser.add_argument(
+        "--bind", default=f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+    )
+    serve_parser.add_argument("-w", "--workers", type=int, default=_default_workers())
+    serve_parser.add_argument(
+        "-k",
+        "--worker-class",
+        choices=["gthread", "sync", "gevent"],
+        default=os.environ.get("VORTAI_WORKER_CLASS", "gthread"),
+        help="gthread: threaded workers; gevent: async workers (needs gevent)",
+    )
+    serve_parser.add_argument(
+        "--threads", type=int, default=int(os.environ.get("VORTAI_THREADS", "8"))
+    )
+    serve_parser.add_argument("--worker-connections", type=int, default=1000)
+    serve_parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=int(os.environ.get("VORTAI_MAX_REQUESTS", "1000")),
+        help="Restart a worker after this many requests (0 disables)",
+    )
+    serve_parser.add_argument("--max-requests-jitter", type=int, default=100)
+    serve_parser.add_argument("--timeout", type=int, default=DEFAULT_WORKER_TIMEOUT)
+    serve_parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=int(os.environ.get("VORTAI_GRACEFUL_TIMEOUT", "30")),
+        help="Seconds to finish in-flight requests after SIGTERM",
+    )
+    serve_parser.add_argument(
+        "--preload",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Build the app once in the master before forking workers "
+        "(saves memory, but threads started by the app can leave locks held)",
+    )
+    serve_parser.set_defaults(func=serve)
+
+    prewarm_parser = commands.add_parser(
+        "prewarm", help="Cache the most requested text prompts from access logs"
+    )
+    prewarm_parser.add_argument(
+        "logs", nargs="+", help="JSON access logs written with LOG_PROMPTS=1"
+    )
+    prewarm_parser.add_argument("-k", "--top-k", type=int, default=50)
+    prewarm_parser.add_argument(
+        "--half-life",
+        type=float,
+        default=24.0,
+        help="Hours after which a request counts half as much",
+    )
+    prewarm_parser.add_argument(
+        "--limit",
+        default=os.environ.get("PREWARM_LIMIT", "60/minute"),
+        help="Rate budget in the API's cost units, like RATE_LIMIT; it is "
+        "not drawn from the server's limit, so leave room for live traffic",
+    )
+    prewarm_parser.add_argument(
+        "--timeout", type=float, default=60.0, help="Seconds per prompt"
+    )
+    prewarm_parser.add_argument(
+        "--budget", type=float, help="Stop starting new prompts after this many seconds"
+    )
+    prewarm_parser.add_argument("--nice", type=int, default=10)
+    prewarm_parser.add_argument(
+        "--dry-run", action="store_true", help="Print the ranking and exit"
+    )
+    prewarm_parser.set_defaults(func=prewarm)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for the CLI application."""
+    args = build_parser().parse_args(argv)
+    sys.exit(args.func(args))
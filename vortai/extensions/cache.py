@@ -8,16 +8,23 @@ Provides simple in-memory caching and Redis support for API responses.
 
 import hashlib
 import json
-from typing import Any, Optional
-import redis
+import time
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from . import codec
+from .. import redis_pool
 
 
 class Cache:
-    """Simple cache with in-memory and Redis support."""
+    """Simple cache with in-memory and Redis support.
+
+    Redis values are written with :mod:`codec` (compressed when large) and
+    always expire; multi-key access uses MGET and pipelined writes.
+    """
 
     def __init__(self, redis_url: Optional[str] = None):
-        self.redis = redis.from_url(redis_url) if redis_url else None
-        self.memory_cache = {}
+        self.redis = redis_pool.get_client(redis_url) if redis_url else None
+        self.memory_cache: Dict[str, Tuple[Any, float]] = {}  # value, expires_at
 
     def _key(self, func_name: str, args: tuple, kwargs: dict) -> str:
         """Generate cache key from function name and arguments."""
@@ -26,19 +33,52 @@ class Cache:
         )
         return hashlib.md5(key_data.encode()).hexdigest()
 
+    @staticmethod
+    def _decode(raw: Optional[bytes]) -> Optional[Any]:
+        if not raw:
+            return None
+        if codec.is_encoded(raw):
+            return codec.decode(raw)
+        return json.loads(raw)  # Written before the codec existed
+
+    def _memory_get(self, key: str) -> Optional[Any]:
+        entry = self.memory_cache.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            self.memory_cache.pop(key, None)
+            return None
+        return entry[0]
+
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache."""
         if self.redis:
-            value = self.redis.get(key)
-            return json.loads(value) if value else None
-        return self.memory_cache.get(key)
+            return self._decode(self.redis.get(key))
+        return self._memory_get(key)
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        """Get several values in one round trip."""
+        if not keys:
+            return []
+        if self.redis:
+            return [self._decode(raw) for raw in self.redis.mget(keys)]
+        return [self._memory_get(key) for key in keys]
 
     def set(self, key: str, value: Any, ttl: int = 3600):
         """Set value in cache with TTL."""
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Mapping[str, Any], ttl: int = 3600):
+        """Set several values with TTL in one round trip."""
         if self.redis:
-            self.redis.setex(key, ttl, json.dumps(value))
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.setex(key, ttl, codec.encode(value))
+            pipe.execute()
         else:
-            self.memory_cache[key] = value
+            expires_at = time.time() + ttl
+            for key, value in items.items():
+                self.memory_cache[key] = (value, expires_at)
 
     def cached(self, ttl: int = 3600):
         """Decorator to cache function results."""
@@ -0,0 +1,94 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Cache value codec for Gemini AI SDK.
+Compact binary encoding for Redis cache entries: a version header,
+msgpack (or compact JSON) serialization, and zstd or zlib compression
+for large values.
+"""
+
+import json
+import zlib
+from typing import Any, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# First byte of every encoded value: marker 0xA and codec version 1.
+# 0xA1 can never start UTF-8 text, so values written before the codec
+# existed are still recognised.
+MAGIC = 0xA1
+
+FORMAT_TEXT = 0  # a str, stored as UTF-8
+FORMAT_JSON = 1
+FORMAT_MSGPACK = 2
+
+COMPRESS_NONE = 0
+COMPRESS_ZLIB = 1
+COMPRESS_ZSTD = 2
+
+DEFAULT_THRESHOLD = 512  # bytes; smaller payloads are not worth compressing
+
+_zstd_compressor = zstandard.ZstdCompressor(level=3) if zstandard else None
+_zstd_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+
+def encode(value: Any, threshold: int = DEFAULT_THRESHOLD) -> bytes:
+    """Serialize ``value`` with a two-byte header, compressing if large."""
+    if isinstance(value, str):
+        fmt, payload = FORMAT_TEXT, value.encode("utf-8")
+    elif msgpack is not None:
+        fmt, payload = FORMAT_MSGPACK, msgpack.packb(value, use_bin_type=True)
+    else:
+        fmt = FORMAT_JSON
+        payload = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    compression = COMPRESS_NONE
+    if len(payload) >= threshold:
+        if _zstd_compressor is not None:
+            packed, method = _zstd_compressor.compress(payload), COMPRESS_ZSTD
+        else:
+            packed, method = zlib.compress(payload, 6), COMPRESS_ZLIB
+        if len(packed) < len(payload):
+            payload, compression = packed, method
+    return bytes((MAGIC, compression << 4 | fmt)) + payload
+
+
+def is_encoded(data: bytes) -> bool:
+    return len(data) >= 2 and data[0] == MAGIC
+
+
+def decode(data: Optional[bytes]) -> Any:
+    """Inverse of :func:`encode`. Raises ValueError for foreign data."""
+    if data is None:
+        return None
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if not is_encoded(data):
+        raise ValueError("Not an encoded cache value")
+    compression, fmt = data[1] >> 4, data[1] & 0x0F
+    payload = data[2:]
+    if compression == COMPRESS_ZLIB:
+        payload = zlib.decompress(payload)
+    elif compression == COMPRESS_ZSTD:
+        if _zstd_decompressor is None:
+            raise ValueError("zstandard is required to decode this value")
+        payload = _zstd_decompressor.decompress(payload)
+    elif compression != COMPRESS_NONE:
+        raise ValueError(f"Unknown compression: {compression}")
+    if fmt == FORMAT_TEXT:
+        return payload.decode("utf-8")
+    if fmt == FORMAT_JSON:
+        return json.loads(payload)
+    if fmt == FORMAT_MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack is required to decode this value")
+        return msgpack.unpackb(payload, raw=False)
+    raise ValueError(f"Unknown format: {fmt}")
@@ -0,0 +1,201 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Compression and static asset extension for the Vortai app.
+Negotiated gzip/brotli for JSON and SSE responses, precompressed static
+files with content-hash ETags, and an in-memory index page.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import zlib
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from flask import Flask, Response, abort, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/event-stream")
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+
+_STATIC_REF = re.compile(r'(?P<attr>src|href)="/static/(?P<path>[^"?#]+)(?:\?[^"]*)?"')
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(available: Iterable[str]) -> Optional[str]:
+    """Pick the client's preferred encoding from ``available``."""
+    return request.accept_encodings.best_match(list(available))
+
+
+def compress(data: bytes, encoding: str, level: int = 6) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level)
+
+
+def _compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Compress a streamed body, flushing after every chunk so SSE stays live."""
+    if encoding == "br":
+        compressor = brotli.Compressor()
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+class Compression:
+    """Compress JSON and SSE responses when the client accepts it."""
+
+    def __init__(self, min_size: int = 1024, level: int = 6):
+        self.min_size = min_size
+        self.level = level
+
+    def init_app(self, app: Flask) -> None:
+        app.after_request(self._compress)
+
+    def _compress(self, response: Response) -> Response:
+        if (
+            response.mimetype not in COMPRESSIBLE_TYPES
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = negotiate(supported_encodings())
+        if not encoding:
+            return response
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            if response.direct_passthrough:
+                return response
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(compress(data, encoding, self.level))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+
+class StaticAssets:
+    """Serve static files with fingerprints, precompressed variants and caching.
+
+    Files requested with ``?v=<fingerprint>`` matching their content hash
+    are marked immutable; anything else must be revalidated with its ETag.
+    Run ``scripts/precompress_static.py`` at build time to create the
+    ``.br``/``.gz`` siblings picked up here.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self._fingerprints: Dict[str, Tuple[float, str]] = {}
+        self._index: Optional[Dict[str, object]] = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        app.extensions["vortai_assets"] = self
+        app.view_functions["static"] = self.send
+        app.add_template_global(self.url, "asset_url")
+
+    def fingerprint(self, filename: str) -> Optional[str]:
+        path = safe_join(self.folder, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        mtime = os.path.getmtime(path)
+        cached = self._fingerprints.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        self._fingerprints[path] = (mtime, digest)
+        return digest
+
+    def url(self, filename: str) -> str:
+        fingerprint = self.fingerprint(filename)
+        url = f"/static/{filename}"
+        return f"{url}?v={fingerprint}" if fingerprint else url
+
+    def send(self, filename: str) -> Response:
+        path = safe_join(self.folder, filename)
+        fingerprint = self.fingerprint(filename)
+        if path is None or fingerprint is None:
+            abort(404)
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        available = [
+            enc
+            for enc, suffix in PRECOMPRESSED_SUFFIXES.items()
+            if os.path.isfile(path + suffix)
+        ]
+        encoding = negotiate(available) if available else None
+        etag = fingerprint
+        if encoding:
+            path += PRECOMPRESSED_SUFFIXES[encoding]
+            etag = f"{fingerprint}-{encoding}"
+        response = send_file(path, mimetype=mimetype, etag=etag, conditional=True)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        if available:
+            response.vary.add("Accept-Encoding")
+        versioned = request.args.get("v") == fingerprint
+        response.headers["Cache-Control"] = IMMUTABLE if versioned else REVALIDATE
+        return response
+
+    def _load_index(self, path: str) -> Dict[str, object]:
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+
+        def fingerprinted(match: "re.Match[str]") -> str:
+            fingerprint = self.fingerprint(match.group("path"))
+            if fingerprint is None:
+                return match.group(0)
+            return (
+                f'{match.group("attr")}="/static/{match.group("path")}'
+                f'?v={fingerprint}"'
+            )
+
+        body = _STATIC_REF.sub(fingerprinted, html).encode("utf-8")
+        variants = {None: body}
+        for encoding in supported_encodings():
+            variants[encoding] = compress(body, encoding, level=9)
+        return {
+            "mtime": os.path.getmtime(path),
+            "etag": hashlib.sha256(body).hexdigest()[:16],
+            "variants": variants,
+        }
+
+    def index(self, path: str) -> Response:
+        """Serve ``index.html`` from memory, with static links fingerprinted."""
+        with self._lock:
+            if self._index is None or self._index["mtime"] != os.path.getmtime(path):
+                self._index = self._load_index(path)
+            index = self._index
+        variants = index["variants"]
+        encoding = negotiate(k for k in variants if k)
+        etag = index["etag"] if not encoding else f'{index["etag"]}-{encoding}'
+        response = Response(variants[encoding], mimetype="text/html")
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
@@ -0,0 +1,219 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Idempotency extension for the Vortai API.
+Requests carrying an ``Idempotency-Key`` header run once; retries get the
+stored response, or wait for the run still in progress.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from flask import Flask, Response, g, jsonify, request
+
+from ..metrics import metrics
+
+DEFAULT_ENDPOINTS = ("api.generate_image", "api.research_topic")
+
+_KEY = re.compile(r"^[\x21-\x7e]{1,255}$")
+
+
+class MemoryStorage:
+    """Per-process records, used when Redis is not configured."""
+
+    def __init__(self):
+        self._records: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        for key in [k for k, (_, exp) in self._records.items() if exp <= now]:
+            del self._records[key]
+
+    def claim(self, key: str, record: Dict[str, Any], ttl: int) -> bool:
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            if key in self._records:
+                return False
+            self._records[key] = (record, now + ttl)
+            return True
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._records.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def set(self, key: str, record: Dict[str, Any], ttl: int) -> None:
+        with self._lock:
+            self._records[key] = (record, time.time() + ttl)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._records.pop(key, None)
+
+
+class RedisStorage:
+    """Records shared by all workers: JSON metadata, a newline, then the body."""
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _dump(record: Dict[str, Any]) -> bytes:
+        meta = {k: v for k, v in record.items() if k != "body"}
+        return json.dumps(meta).encode("utf-8") + b"\n" + record.get("body", b"")
+
+    def claim(self, key: str, record: Dict[str, Any], ttl: int) -> bool:
+        return bool(self.client.set(key, self._dump(record), nx=True, ex=ttl))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self.client.get(key)
+        if raw is None:
+            return None
+        meta, _, body = raw.partition(b"\n")
+        record = json.loads(meta)
+        record["body"] = body
+        return record
+
+    def set(self, key: str, record: Dict[str, Any], ttl: int) -> None:
+        self.client.set(key, self._dump(record), ex=ttl)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+
+class Idempotency:
+    """Deduplicate retried POSTs to expensive endpoints.
+
+    The first request with a given key claims it (``SET NX``) and runs;
+    a successful (2xx) response is stored for ``ttl`` seconds. A retry
+    with the same key and body replays that response, free of rate-limit
+    charges, or polls until the first run finishes, for at most the
+    route's own ``timeout()``. Reusing a key with a different body is
+    rejected with 422. Errors are not stored, so a retry after a timeout
+    or quota error reaches upstream again.
+    """
+
+    def __init__(
+        self,
+        storage=None,
+        endpoints: Iterable[str] = DEFAULT_ENDPOINTS,
+        ttl: int = 86400,
+        lock_ttl: int = 360,
+        max_body: int = 10 * 1024 * 1024,
+        poll_interval: float = 0.25,
+        timeout: Optional[Callable[[], float]] = None,
+    ):
+        self.storage = storage or MemoryStorage()
+        self.endpoints = set(endpoints)
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl  # longer than the slowest endpoint's deadline
+        self.max_body = max_body
+        self.poll_interval = poll_interval
+        # Seconds the current request may take; our hook runs before the
+        # blueprint sets its deadline, so this cannot come from remaining()
+        self.timeout = timeout
+
+    def init_app(self, app: Flask) -> None:
+        # Register after Compression: after_request hooks run in reverse,
+        # so the stored body is the uncompressed one.
+        app.extensions["vortai_idempotency"] = self
+        app.after_request(self._after)
+        # Check keys before the rate limiter, so replays are not charged
+        funcs = app.before_request_funcs.setdefault(None, [])
+        limiter = app.extensions.get("vortai_limiter")
+        check = getattr(limiter, "_check_request", None)
+        funcs.insert(funcs.index(check) if check in funcs else len(funcs), self._before)
+
+    def _before(self) -> Optional[Response]:
+        if request.endpoint not in self.endpoints or request.method != "POST":
+            return None
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return None
+        if not _KEY.match(key):
+            return _error("Invalid Idempotency-Key", 400)
+        store_key = f"vortai:idem:{request.endpoint}:{key}"
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        try:
+            if self.storage.claim(
+                store_key, {"state": "pending", "fp": fingerprint}, self.lock_ttl
+            ):
+                g.idempotency_key = store_key
+                g.idempotency_fp = fingerprint
+                return None
+            return self._replay(store_key, fingerprint)
+        except Exception as e:
+            # Fail open: without storage the request simply runs
+            logging.warning("Idempotency storage unavailable: %s", e)
+            return None
+
+    def _replay(self, store_key: str, fingerprint: str) -> Response:
+        wait = self.lock_ttl if self.timeout is None else self.timeout()
+        give_up = time.monotonic() + min(self.lock_ttl, wait)
+        while True:
+            record = self.storage.get(store_key)
+            if record is None:
+                # The first run failed and released the key; let the client retry
+                return _error("Previous attempt failed, retry the request", 409)
+            if record.get("fp") != fingerprint:
+                return _error("Idempotency-Key reused with a different request", 422)
+            if record["state"] == "done":
+                metrics.inc("idempotency.replayed")
+                response = Response(
+                    record["body"],
+                    status=record["status"],
+                    content_type=record["content_type"],
+                )
+                response.headers["Idempotent-Replayed"] = "true"
+                return response
+            if time.monotonic() + self.poll_interval >= give_up:
+                response = _error("Request with this Idempotency-Key in progress", 409)
+                response.headers["Retry-After"] = "5"
+                return response
+            time.sleep(self.poll_interval)
+
+    def _after(self, response: Response) -> Response:
+        store_key = g.pop("idempotency_key", None)
+        if store_key is None:
+            return response
+        try:
+            # send_file responses count as streamed but are plain files
+            streamed = response.is_streamed and not response.direct_passthrough
+            if not 200 <= response.status_code < 300 or streamed:
+                self.storage.delete(store_key)
+                return response
+            # Read the file into memory; Compression skips passthrough bodies
+            response.direct_passthrough = False
+            body = response.get_data()
+            if len(body) > self.max_body:
+                self.storage.delete(store_key)
+                return response
+            self.storage.set(
+                store_key,
+                {
+                    "state": "done",
+                    "fp": g.pop("idempotency_fp"),
+                    "status": response.status_code,
+                    "content_type": response.content_type,
+                    "body": body,
+                },
+                self.ttl,
+            )
+        except Exception as e:
+            logging.warning("Could not store idempotent response: %s", e)
+        return response
+
+
+def _error(message: str, status: int) -> Response:
+    response = jsonify({"error": message})
+    response.status_code = status
+    return response
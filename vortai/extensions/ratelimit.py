@@ -0,0 +1,237 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Rate limiting extension for the Vortai API.
+Cost-weighted fixed-window limits with a local pre-check and atomic Redis updates.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import Flask, jsonify, request
+
+from .. import tracing
+
+DEFAULT_LIMIT = "100/hour"
+
+# Relative cost of each API endpoint, keyed by Flask endpoint name.
+# A request consumes this many units of the client's limit.
+ENDPOINT_COSTS = {
+    "api.generate_response": 1,
+    "api.generate_response_with_thinking": 3,
+    "api.generate_response_with_url_context": 3,
+    "api.text_to_speech": 1,
+    "api.generate_image": 10,
+    "api.generate_response_cached": 1,
+    "api.text_to_speech_cached": 1,
+    "api.generate_image_cached": 10,
+    "api.image_job_status": 0,
+    "api.image_job_events": 1,
+    "api.image_job_result": 0,
+    "api.process_text_go": 1,
+    "api.research_topic": 25,
+    "api.get_metrics": 0,
+}
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Atomically add batched hits and the request cost to the window counter,
+# taking the cost back out if it went over the limit; returns the total and
+# whether the request was allowed.
+_CHARGE_SCRIPT = """
+local current = redis.call('INCRBY', KEYS[1], ARGV[1] + ARGV[2])
+if redis.call('TTL', KEYS[1]) < 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+end
+if current > tonumber(ARGV[3]) then
+    return {redis.call('DECRBY', KEYS[1], ARGV[2]), 0}
+end
+return {current, 1}
+"""
+
+
+def parse_limit(value: str) -> Tuple[int, int]:
+    """Parse a limit string such as ``100/hour`` into (amount, seconds)."""
+    try:
+        amount, period = value.strip().split("/", 1)
+        seconds = _PERIODS[period.strip().lower().rstrip("s")]
+        return int(amount), seconds
+    except (ValueError, KeyError) as e:
+        raise ValueError(f"Invalid rate limit: {value!r}") from e
+
+
+class MemoryStorage:
+    """Per-process window counters, used when Redis is not configured."""
+
+    def __init__(self):
+        self._counters: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def charge(
+        self, key: str, pending: int, cost: int, limit: int, expiry: int
+    ) -> Tuple[int, bool]:
+        """Add ``pending`` hits, then ``cost`` if it fits within ``limit``."""
+        now = time.time()
+        with self._lock:
+            count, expires_at = self._counters.get(key, (0, 0.0))
+            if expires_at <= now:
+                count, expires_at = 0, now + expiry
+                # Drop expired windows so the dict does not grow unbounded
+                for stale in [k for k, v in self._counters.items() if v[1] <= now]:
+                    del self._counters[stale]
+            count += pending
+            allowed = count + cost <= limit
+            if allowed:
+                count += cost
+            self._counters[key] = (count, expires_at)
+            return count, allowed
+
+
+class RedisStorage:
+    """Shared window counters in Redis, updated with a single script call."""
+
+    def __init__(self, client):
+        self.client = client
+        self._charge = client.register_script(_CHARGE_SCRIPT)
+
+    def charge(
+        self, key: str, pending: int, cost: int, limit: int, expiry: int
+    ) -> Tuple[int, bool]:
+        total, allowed = self._charge(keys=[key], args=[pending, cost, limit, expiry])
+        return int(total), bool(allowed)
+
+
+class _Window:
+    __slots__ = ("index", "synced", "pending")
+
+    def __init__(self, index: int):
+        self.index = index
+        self.synced = 0  # Last total seen in shared storage
+        self.pending = 0  # Local hits not yet written to shared storage
+
+
+class RateLimiter:
+    """Cost-weighted fixed-window rate limiter for the API blueprint.
+
+    Each worker keeps a local view of every client's window. While the
+    client is well under its limit, hits are counted locally and flushed
+    to storage in batches, so most requests never touch Redis. Once the
+    estimate gets close to the limit every hit is synced, which keeps
+    enforcement global across workers. While storage is unavailable each
+    worker enforces the limit on its own counts. Denied requests are not
+    charged, so one rejected expensive call does not lock a client out
+    of cheap ones.
+    """
+
+    def __init__(
+        self,
+        limit: str = DEFAULT_LIMIT,
+        costs: Optional[Dict[str, int]] = None,
+        storage=None,
+        key_func: Optional[Callable[[], str]] = None,
+        blueprint: str = "api",
+        local_fraction: float = 0.5,
+        batch_size: Optional[int] = None,
+    ):
+        self.amount, self.period = parse_limit(limit)
+        self.costs = dict(ENDPOINT_COSTS if costs is None else costs)
+        self.storage = storage or MemoryStorage()
+        self.key_func = key_func or (lambda: request.remote_addr or "unknown")
+        self.blueprint = blueprint
+        self.local_threshold = int(self.amount * local_fraction)
+        self.batch_size = batch_size or max(1, self.amount // 20)
+        self._windows: Dict[str, _Window] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        app.extensions["vortai_limiter"] = self
+        app.before_request(self._check_request)
+
+    def cost_for(self, endpoint: Optional[str]) -> int:
+        return self.costs.get(endpoint or "", 1)
+
+    def hit(self, client: str, cost: int = 1) -> Tuple[bool, int]:
+        """Record a hit and return (allowed, seconds until the window resets)."""
+        now = time.time()
+        index = int(now // self.period)
+        retry_after = int(self.period - now % self.period) + 1
+        ended: List[Tuple[str, _Window]] = []
+        with self._lock:
+            window = self._windows.get(client)
+            if window is None or window.index != index:
+                if window is not None and window.pending:
+                    ended.append((client, window))
+                if len(self._windows) > 10000:
+                    ended.extend(self._prune(index))
+                window = self._windows[client] = _Window(index)
+        for old_client, old in ended:
+            self._flush(old_client, old)
+        with self._lock:
+            if window.synced >= self.amount:
+                # Counters never decrease within a window
+                return False, retry_after
+            estimate = window.synced + window.pending + cost
+            if (
+                estimate <= self.local_threshold
+                and window.pending + cost < self.batch_size
+            ):
+                window.pending += cost
+                return True, retry_after
+            pending = window.pending
+            window.pending = 0
+        try:
+            total, allowed = self.storage.charge(
+                f"vortai:rl:{client}:{index}", pending, cost, self.amount, self.period
+            )
+        except Exception as e:
+            # An unavailable store must not take the API down, nor lift the
+            # limit: count the hits locally and enforce them per worker
+            logging.warning("Rate limit storage unavailable: %s", e)
+            with self._lock:
+                window.synced += pending
+                allowed = window.synced + cost <= self.amount
+                if allowed:
+                    window.synced += cost
+                return allowed, retry_after
+        with self._lock:
+            if window.synced < total:
+                window.synced = total
+        return allowed, retry_after
+
+    def _flush(self, client: str, window: _Window) -> None:
+        """Write hits counted locally in a window that has since ended."""
+        try:
+            self.storage.charge(
+                f"vortai:rl:{client}:{window.index}",
+                window.pending,
+                0,
+                self.amount,
+                self.period,
+            )
+        except Exception as e:
+            logging.warning("Rate limit storage unavailable: %s", e)
+
+    def _prune(self, index: int) -> List[Tuple[str, _Window]]:
+        """Forget ended windows; returns those with hits still to flush."""
+        stale = [(c, w) for c, w in self._windows.items() if w.index != index]
+        for client, _ in stale:
+            del self._windows[client]
+        return [(c, w) for c, w in stale if w.pending]
+
+    def _check_request(self):
+        if request.blueprint != self.blueprint:
+            return None
+        cost = self.cost_for(request.endpoint)
+        if cost <= 0:
+            return None
+        with tracing.span("ratelimit", cost=cost):
+            allowed, retry_after = self.hit(self.key_func(), cost)
+        if allowed:
+            return None
+        response = jsonify({"error": "Rate limit exceeded"})
+        response.status_code = 429
+        response.headers["Retry-After"] = str(retry_after)
+        return response
@@ -0,0 +1,204 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Research report storage extension for Gemini AI SDK.
+Persists Deep Research reports in SQLite with an FTS5 full-text index.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional
+
+from ..prompts import cache_key, canonicalize
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    topic TEXT NOT NULL,
+    topic_key TEXT NOT NULL,
+    report TEXT NOT NULL,
+    citations TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_topic_key ON reports (topic_key, created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5 (
+    topic, report, content='reports', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS reports_ai AFTER INSERT ON reports BEGIN
+    INSERT INTO reports_fts (rowid, topic, report)
+    VALUES (new.id, new.topic, new.report);
+END;
+"""
+
+DEFAULT_MAX_AGE = 7 * 86400  # seconds a stored report counts as fresh
+
+_stores: "weakref.WeakSet[ResearchStore]" = weakref.WeakSet()
+
+
+def topic_key(topic: str) -> str:
+    """Key shared by topics that only differ in formatting or case."""
+    return cache_key(canonicalize(topic, casefold=True), "research")
+
+
+def _match_query(query: str) -> Optional[str]:
+    """Turn free text into an FTS5 query that cannot be a syntax error."""
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms)
+
+
+class ResearchStore:
+    """SQLite store for completed research reports.
+
+    Reads run on the calling thread. Writes are queued and committed in
+    batches by a background thread so requests never wait on disk.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_age: float = DEFAULT_MAX_AGE,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+    ):
+        self.path = path
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._start()
+        self._conn().executescript(_SCHEMA)
+        _stores.add(self)
+
+    def _start(self) -> None:
+        self._local = threading.local()
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._writer = threading.Thread(
+            target=self._write_loop, name="vortai-research-store", daemon=True
+        )
+        self._writer.start()
+
+    @classmethod
+    def from_env(cls) -> Optional["ResearchStore"]:
+        """Open the store at RESEARCH_DB_PATH; without it nothing is kept."""
+        path = os.environ.get("RESEARCH_DB_PATH")
+        if not path:
+            return None
+        try:
+            store = cls(
+                path,
+                max_age=float(os.environ.get("RESEARCH_MAX_AGE", str(DEFAULT_MAX_AGE))),
+            )
+        except sqlite3.Error as e:
+            logging.warning("Could not open research store: %s", e)
+            return None
+        atexit.register(store.flush)
+        return store
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, topic: str, report: Any, citations: Any) -> None:
+        """Queue a completed report for storage."""
+        self._queue.put(
+            (
+                topic,
+                topic_key(topic),
+                report if isinstance(report, str) else str(report),
+                json.dumps(citations or [], default=str),
+                time.time(),
+            )
+        )
+
+    def flush(self) -> None:
+        """Block until every queued report has been written."""
+        self._queue.join()
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=deadline - time.monotonic()))
+                except (queue.Empty, ValueError):
+                    break
+            try:
+                with self._conn() as conn:
+                    conn.executemany(
+                        "INSERT INTO reports "
+                        "(topic, topic_key, report, citations, created_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        batch,
+                    )
+            except sqlite3.Error as e:
+                logging.warning(
+                    "Could not store %d research reports: %s", len(batch), e
+                )
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def find_fresh(
+        self, topic: str, max_age: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return the newest stored report for an equivalent topic, if fresh."""
+        oldest = time.time() - (self.max_age if max_age is None else max_age)
+        row = (
+            self._conn()
+            .execute(
+                "SELECT report, citations FROM reports "
+                "WHERE topic_key = ? AND created_at >= ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (topic_key(topic), oldest),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        return {"report": row["report"], "citations": json.loads(row["citations"])}
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Full-text search over stored topics and reports, best match first."""
+        match = _match_query(query)
+        if match is None:
+            return []
+        rows = (
+            self._conn()
+            .execute(
+                "SELECT reports.id, reports.topic, reports.created_at, "
+                "snippet(reports_fts, 1, '[', ']', '...', 24) AS snippet "
+                "FROM reports_fts JOIN reports ON reports.id = reports_fts.rowid "
+                "WHERE reports_fts MATCH ? ORDER BY bm25(reports_fts) LIMIT ?",
+                (match, limit),
+            )
+            .fetchall()
+        )
+        return [dict(row) for row in rows]
+
+
+def _reset_after_fork() -> None:
+    # SQLite connections must not cross fork, and the writer thread is gone;
+    # reports still queued in the parent are left for the parent to write.
+    for store in list(_stores):
+        store._start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
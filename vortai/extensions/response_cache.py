@@ -0,0 +1,510 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Response cache extension for Gemini AI SDK.
+Exact-match reply cache with soft and hard TTLs: stale replies are served
+while a single background refresh fetches a new one. The in-memory cache
+can be snapshotted to disk and reloaded after a restart.
+"""
+
+import atexit
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+import weakref
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are not serialized between processes
+    fcntl = None
+
+from .. import redis_pool
+from ..metrics import metrics
+from . import codec
+
+DEFAULT_TTL = 3600  # seconds a reply is fresh
+DEFAULT_MAX_STALE = 86400  # further seconds a stale reply may be served
+
+# Snapshot file: magic and version, then zlib-compressed blocks of records,
+# each block prefixed with its sizes and a CRC32 of the compressed bytes.
+SNAPSHOT_MAGIC = b"VRTC"
+SNAPSHOT_VERSION = 1
+_FILE_HEADER = struct.Struct("<4sH")
+_BLOCK_HEADER = struct.Struct("<III")  # compressed size, raw size, crc32
+_RECORD = struct.Struct("<dII")  # stored_at, key length, value length
+_BLOCK_SIZE = 1 << 20
+
+_snapshotting: "weakref.WeakSet[ResponseCache]" = weakref.WeakSet()
+
+
+class ResponseCache:
+    """Reply cache with stale-while-revalidate, in memory or in Redis.
+
+    A reply younger than ``ttl`` is fresh. Up to ``max_stale`` seconds
+    after that it is still returned, and one deduplicated background
+    refresh replaces it. With ``refresh_ahead``, a key read at least
+    ``hot_hits`` times is refreshed once it reaches ``refresh_at`` of its
+    TTL, so popular prompts never go stale at all. While Redis is failing
+    the in-memory cache stands in for it.
+    """
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+
+    def __init__(
+        self,
+        redis_client=None,
+        ttl: float = DEFAULT_TTL,
+        max_stale: float = DEFAULT_MAX_STALE,
+        max_entries: int = 10000,
+        refresh_ahead: bool = False,
+        hot_hits: int = 5,
+        refresh_at: float = 0.8,
+    ):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self.refresh_ahead = refresh_ahead
+        self.hot_hits = hot_hits
+        self.refresh_at = refresh_at
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._hits: Dict[str, int] = {}
+        self._refreshing: Set[str] = set()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._snapshot_path: Optional[str] = None
+        self._snapshot_interval = 0.0
+        # Set once the startup snapshot has been read (or there is none)
+        self._snapshot_loaded = threading.Event()
+
+    @classmethod
+    def from_env(cls, redis_client=None) -> "ResponseCache":
+        """Build a cache from RESPONSE_CACHE_* settings.
+
+        Without Redis, RESPONSE_CACHE_SNAPSHOT names a file the cache is
+        loaded from at startup and saved to every
+        RESPONSE_CACHE_SNAPSHOT_INTERVAL seconds and at exit. Workers
+        sharing the file merge their entries into it.
+        """
+        cache = cls(
+            redis_client,
+            ttl=float(os.environ.get("RESPONSE_CACHE_TTL", str(DEFAULT_TTL))),
+            max_stale=float(
+                os.environ.get("RESPONSE_CACHE_MAX_STALE", str(DEFAULT_MAX_STALE))
+            ),
+            max_entries=int(os.environ.get("RESPONSE_CACHE_SIZE", "10000")),
+            refresh_ahead=os.environ.get("RESPONSE_CACHE_REFRESH_AHEAD", "").lower()
+            in ("1", "true"),
+            hot_hits=int(os.environ.get("RESPONSE_CACHE_HOT_HITS", "5")),
+        )
+        path = os.environ.get("RESPONSE_CACHE_SNAPSHOT")
+        if path and redis_client is None:
+            cache.start_snapshots(
+                path,
+                float(os.environ.get("RESPONSE_CACHE_SNAPSHOT_INTERVAL", "300")),
+            )
+        return cache
+
+    @classmethod
+    def _pool(cls) -> ThreadPoolExecutor:
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=4, thread_name_prefix="vortai-refresh"
+                )
+            return cls._executor
+
+    def _memory_entry(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            return entry
+
+    @staticmethod
+    def _decode_entry(raw: Optional[bytes]) -> Optional[Tuple[str, float]]:
+        """Turn a Redis value into (value, stored_at)."""
+        if raw is None:
+            return None
+        if codec.is_encoded(raw):
+            try:
+                value, stored_at = codec.decode(raw)
+                return value, float(stored_at)
+            except (ValueError, TypeError) as e:
+                logging.warning("Unreadable cache entry: %s", e)
+                return None
+        # Written by an earlier version: a JSON envelope or a bare string
+        text = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        try:
+            entry = json.loads(text)
+            return entry["v"], float(entry["t"])
+        except (ValueError, TypeError, KeyError):
+            return text, 0.0
+
+    def _remote(self):
+        """The Redis client, unless there is none or its breaker is open."""
+        if self.redis is None or not redis_pool.healthy(self.redis):
+            return None
+        return self.redis
+
+    @staticmethod
+    def _redis_failed(e: Exception) -> None:
+        metrics.inc("response_cache.redis_errors")
+        logging.warning("Redis cache unavailable, using memory: %s", e)
+
+    def get(
+        self, key: str, refresh: Optional[Callable[[], str]] = None
+    ) -> Tuple[Optional[str], str]:
+        """Look up ``key``; returns (value, "hit" | "stale" | "miss").
+
+        ``refresh`` recomputes the value and is run in the background when
+        the entry is stale or hot and close to expiry.
+        """
+        client = self._remote()
+        if client is not None:
+            try:
+                entry = self._decode_entry(client.get(key))
+                return self._check(key, entry, refresh)
+            except Exception as e:
+                self._redis_failed(e)
+        return self._check(key, self._memory_entry(key), refresh, local=True)
+
+    def get_many(self, keys: Sequence[str]) -> List[Tuple[Optional[str], str]]:
+        """Look up several keys at once (one MGET with Redis)."""
+        if not keys:
+            return []
+        client = self._remote()
+        if client is not None:
+            try:
+                entries = [self._decode_entry(raw) for raw in client.mget(keys)]
+                return [
+                    self._check(key, entry, None) for key, entry in zip(keys, entries)
+                ]
+            except Exception as e:
+                self._redis_failed(e)
+        return [
+            self._check(key, self._memory_entry(key), None, local=True) for key in keys
+        ]
+
+    def _check(
+        self,
+        key: str,
+        entry: Optional[Tuple[str, float]],
+        refresh: Optional[Callable[[], str]],
+        local: bool = False,
+    ) -> Tuple[Optional[str], str]:
+        if entry is None:
+            return None, "miss"
+        value, stored_at = entry
+        age = time.time() - stored_at
+        # Redis expires its own keys; memory entries are dropped on read
+        if local and age >= self.ttl + self.max_stale:
+            with self._lock:
+                self._memory.pop(key, None)
+            return None, "miss"
+        if age >= self.ttl:
+            metrics.inc("response_cache.stale")
+            if refresh is not None:
+                self._schedule_refresh(key, refresh)
+            return value, "stale"
+        if self.refresh_ahead and refresh is not None:
+            with self._lock:
+                if len(self._hits) > self.max_entries:
+                    self._hits.clear()
+                hits = self._hits[key] = self._hits.get(key, 0) + 1
+            if hits >= self.hot_hits and age >= self.ttl * self.refresh_at:
+                metrics.inc("response_cache.refresh_ahead")
+                self._schedule_refresh(key, refresh)
+        return value, "hit"
+
+    def set(self, key: str, value: str) -> None:
+        self.set_many({key: value})
+
+    def set_many(self, items: Mapping[str, str]) -> None:
+        """Store several replies (one pipelined round trip with Redis)."""
+        now = time.time()
+        with self._lock:
+            for key in items:
+                self._hits.pop(key, None)
+        client = self._remote()
+        if client is not None:
+            expiry = max(1, int(self.ttl + self.max_stale))
+            pipe = client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.set(key, codec.encode([value, now]), ex=expiry)
+            try:
+                pipe.execute()
+                return
+            except Exception as e:
+                self._redis_failed(e)
+        with self._lock:
+            for key, value in items.items():
+                self._memory[key] = (value, now)
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+            self._dirty = True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._memory)
+
+    def _schedule_refresh(self, key: str, refresh: Callable[[], str]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        if self._remote() is not None and not self._claim(key):
+            # Another worker is already refreshing this key
+            with self._lock:
+                self._refreshing.discard(key)
+            return
+        try:
+            self._pool().submit(self._refresh, key, refresh)
+        except RuntimeError:
+            # The interpreter is shutting down
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _claim(self, key: str) -> bool:
+        try:
+            return bool(self.redis.set(f"{key}:refresh", 1, nx=True, ex=60))
+        except Exception:
+            return True
+
+    def _refresh(self, key: str, refresh: Callable[[], Any]) -> None:
+        try:
+            self.set(key, refresh())
+            metrics.inc("response_cache.refreshed")
+            if self._remote() is not None:
+                self.redis.delete(f"{key}:refresh")
+        except Exception as e:
+            metrics.inc("response_cache.refresh_errors")
+            logging.warning("Background cache refresh failed: %s", e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def save(self, path: str) -> int:
+        """Merge the in-memory entries into ``path``; returns how many it holds.
+
+        Other processes may save to the same file, so unexpired entries
+        already in it are kept, and the newer copy of a key wins. Saves
+        are serialized with a lock file and written atomically.
+        """
+        with self._lock:
+            entries = list(self._memory.items())
+            self._dirty = False
+        directory = os.path.dirname(os.path.abspath(path))
+        with _locked(path):
+            records = self._merge(path, entries)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    _write_records(f, records)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        return len(records)
+
+    def _merge(
+        self, path: str, entries: List[Tuple[str, Tuple[str, float]]]
+    ) -> List[Tuple[str, str, float]]:
+        """This process's entries, most recently used first, then the file's."""
+        ours = dict(entries)
+        theirs: List[Tuple[str, str, float]] = []
+        oldest = time.time() - self.ttl - self.max_stale
+        try:
+            with open(path, "rb") as f:
+                magic, version = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+                if magic == SNAPSHOT_MAGIC and version == SNAPSHOT_VERSION:
+                    for key, value, stored_at in _read_records(f):
+                        if key in ours:
+                            if ours[key][1] < stored_at:
+                                ours[key] = (value, stored_at)
+                        elif stored_at >= oldest:
+                            theirs.append((key, value, stored_at))
+        except FileNotFoundError:
+            pass
+        except (OSError, struct.error, zlib.error) as e:
+            logging.warning("Could not merge cache snapshot: %s", e)
+        records = [(key, *ours[key]) for key, _ in reversed(entries)]
+        return (records + theirs)[: max(self.max_entries, len(records))]
+
+    def load(self, path: str) -> int:
+        """Add unexpired entries from a snapshot; returns how many were added.
+
+        The file is read block by block, and reading stops at the first
+        block that is truncated or fails its checksum. Entries already in
+        the cache are newer and are kept.
+        """
+        oldest = time.time() - self.ttl - self.max_stale
+        loaded = 0
+        with open(path, "rb") as f:
+            magic, version = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported cache snapshot: {path}")
+            for key, value, stored_at in _read_records(f):
+                if stored_at < oldest:
+                    continue
+                with self._lock:
+                    if key in self._memory or len(self._memory) >= self.max_entries:
+                        continue
+                    # Behind anything cached since startup, in LRU order
+                    self._memory[key] = (value, stored_at)
+                    self._memory.move_to_end(key, last=False)
+                loaded += 1
+        metrics.inc("response_cache.snapshot_loaded", loaded)
+        return loaded
+
+    def start_snapshots(self, path: str, interval: float = 300) -> None:
+        """Load ``path`` in the background, then save to it periodically."""
+        self._snapshot_path = path
+        self._snapshot_interval = interval
+        _snapshotting.add(self)
+        atexit.register(self._save_if_dirty)
+        threading.Thread(
+            target=self._snapshot_loop,
+            args=(True,),
+            name="vortai-cache-snapshot",
+            daemon=True,
+        ).start()
+
+    def wait_for_snapshot(self, timeout: Optional[float] = None) -> bool:
+        """Block until the startup snapshot is loaded; True if it was."""
+        if self._snapshot_path is None:
+            return True
+        return self._snapshot_loaded.wait(timeout)
+
+    def _save_if_dirty(self) -> None:
+        # Only processes that cached something write, so a preloading
+        # master cannot overwrite its workers' snapshots at shutdown
+        if self._snapshot_path and self._dirty:
+            try:
+                self.save(self._snapshot_path)
+            except OSError as e:
+                logging.warning("Could not save cache snapshot: %s", e)
+
+    def _snapshot_loop(self, load_first: bool) -> None:
+        if load_first and self._snapshot_path:
+            try:
+                self.load(self._snapshot_path)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, struct.error) as e:
+                logging.warning("Could not load cache snapshot: %s", e)
+        self._snapshot_loaded.set()
+        while self._snapshot_interval > 0:
+            time.sleep(self._snapshot_interval)
+            self._save_if_dirty()
+
+
+@contextmanager
+def _locked(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on ``path``'s lock file."""
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _write_records(f: BinaryIO, records: List[Tuple[str, str, float]]) -> None:
+    f.write(_FILE_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION))
+    block: List[bytes] = []
+    size = 0
+    # Most recently used first, so a partial load keeps the hottest
+    for key, value, stored_at in records:
+        k, v = key.encode("utf-8"), value.encode("utf-8")
+        block.append(_RECORD.pack(stored_at, len(k), len(v)) + k + v)
+        size += _RECORD.size + len(k) + len(v)
+        if size >= _BLOCK_SIZE:
+            _write_block(f, b"".join(block))
+            block, size = [], 0
+    if block:
+        _write_block(f, b"".join(block))
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _write_block(f: BinaryIO, raw: bytes) -> None:
+    data = zlib.compress(raw, 1)
+    f.write(_BLOCK_HEADER.pack(len(data), len(raw), zlib.crc32(data)))
+    f.write(data)
+
+
+def _read_records(f: BinaryIO) -> Iterator[Tuple[str, str, float]]:
+    while True:
+        header = f.read(_BLOCK_HEADER.size)
+        if len(header) < _BLOCK_HEADER.size:
+            return
+        size, raw_size, crc = _BLOCK_HEADER.unpack(header)
+        data = f.read(size)
+        if len(data) < size or zlib.crc32(data) != crc:
+            logging.warning("Cache snapshot is truncated or corrupt; stopping")
+            return
+        raw = zlib.decompress(data)
+        if len(raw) != raw_size:
+            return
+        view = memoryview(raw)
+        offset = 0
+        while offset < len(raw):
+            stored_at, key_len, value_len = _RECORD.unpack_from(view, offset)
+            offset += _RECORD.size
+            key = bytes(view[offset : offset + key_len]).decode("utf-8")
+            offset += key_len
+            value = bytes(view[offset : offset + value_len]).decode("utf-8")
+            offset += value_len
+            yield key, value, stored_at
+
+
+def _reset_after_fork() -> None:
+    # Refresh threads do not survive fork; the child starts its own pool
+    ResponseCache._executor = None
+    ResponseCache._executor_lock = threading.Lock()
+    for cache in list(_snapshotting):
+        # The snapshot thread may have held these at fork time
+        cache._lock = threading.Lock()
+        loaded = cache._snapshot_loaded.is_set()
+        cache._snapshot_loaded = threading.Event()
+        if loaded:
+            cache._snapshot_loaded.set()
+        threading.Thread(
+            target=cache._snapshot_loop,
+            # Finish the startup load if the fork interrupted it
+            args=(not cache._snapshot_loaded.is_set(),),
+            name="vortai-cache-snapshot",
+            daemon=True,
+        ).start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,257 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Semantic caching extension for Gemini AI SDK.
+Serves near-duplicate prompts from a NumPy vector index of past answers.
+"""
+
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from typing import Callable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# An embedder maps a batch of texts to a (len(texts), dim) float32 matrix
+Embedder = Callable[[Sequence[str]], "np.ndarray"]
+
+INDEX_VERSION = 1
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("numpy is required for the semantic cache")
+
+
+def _normalize_rows(matrix: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder:
+    """Deterministic local embedder built from hashed character n-grams.
+
+    Needs no network access, which makes it a stand-in for tests and
+    offline runs. It only captures surface similarity.
+    """
+
+    def __init__(self, dim: int = 256, ngram: int = 3):
+        _require_numpy()
+        self.dim = dim
+        self.ngram = ngram
+
+    def __call__(self, texts: Sequence[str]) -> "np.ndarray":
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            text = " " + re.sub(r"[^\w\s]", "", text.lower()).strip() + " "
+            for i in range(max(1, len(text) - self.ngram + 1)):
+                h = zlib.crc32(text[i : i + self.ngram].encode("utf-8"))
+                matrix[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize_rows(matrix)
+
+
+class GeminiEmbedder:
+    """Embedder backed by the Gemini embedding model."""
+
+    def __init__(self, client, model: Optional[str] = None):
+        _require_numpy()
+        from .. import models
+
+        self.client = client
+        self.model = model or models.EMBEDDING_MODEL
+
+    def __call__(self, texts: Sequence[str]) -> "np.ndarray":
+        result = self.client.models.embed_content(
+            model=self.model, contents=list(texts)
+        )
+        matrix = np.array([e.values for e in result.embeddings], dtype=np.float32)
+        return _normalize_rows(matrix)
+
+
+class SemanticCache:
+    """Cache answers by prompt meaning rather than exact text.
+
+    Vectors live in one contiguous float32 matrix, so a lookup is a single
+    matrix product against every stored prompt. When the index is full the
+    least recently used entry is overwritten in place.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        capacity: int = 10000,
+        threshold: float = 0.92,
+    ):
+        _require_numpy()
+        self.embedder = embedder
+        self.capacity = capacity
+        self.threshold = threshold
+        self._vectors: Optional["np.ndarray"] = None  # Allocated on first add
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._prompts: List[Optional[str]] = [None] * capacity
+        self._values: List[Optional[str]] = [None] * capacity
+        self._size = 0
+        self._tick = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def embed(self, prompts: Sequence[str]) -> "np.ndarray":
+        return self.embedder(prompts)
+
+    def search(
+        self, vectors: "np.ndarray", k: int = 1
+    ) -> List[List[Tuple[int, float]]]:
+        """Return the top-k (slot, similarity) pairs for each query vector."""
+        with self._lock:
+            return self._search(vectors, k)
+
+    def _search(self, vectors: "np.ndarray", k: int) -> List[List[Tuple[int, float]]]:
+        # Callers hold self._lock
+        if self._size == 0 or self._vectors is None:
+            return [[] for _ in range(len(vectors))]
+        scores = vectors @ self._vectors[: self._size].T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, slots in enumerate(top):
+            ordered = slots[np.argsort(-scores[row, slots])]
+            results.append([(int(s), float(scores[row, s])) for s in ordered])
+        return results
+
+    def get_many(self, prompts: Sequence[str]) -> List[Optional[str]]:
+        """Look up a batch of prompts with one embedding call and one search."""
+        if not prompts:
+            return []
+        return [value for value, _ in self.lookup_many(prompts)]
+
+    def lookup_many(
+        self, prompts: Sequence[str]
+    ) -> List[Tuple[Optional[str], "np.ndarray"]]:
+        """Return (cached value or None, query vector) for each prompt."""
+        vectors = self.embed(prompts)
+        results = []
+        # One critical section, so a concurrent set() cannot reuse a matched
+        # slot for another prompt before its value is read
+        with self._lock:
+            for vector, matches in zip(vectors, self._search(vectors, 1)):
+                value = None
+                if matches and matches[0][1] >= self.threshold:
+                    slot = matches[0][0]
+                    value = self._values[slot]
+                    self._tick += 1
+                    self._last_used[slot] = self._tick
+                results.append((value, vector))
+        return results
+
+    def get(self, prompt: str) -> Optional[str]:
+        return self.get_many([prompt])[0]
+
+    def set(
+        self, prompt: str, value: str, vector: Optional["np.ndarray"] = None
+    ) -> None:
+        """Store an answer, reusing the query vector from a lookup if given."""
+        if vector is None:
+            vector = self.embed([prompt])[0]
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros(
+                    (self.capacity, vector.shape[0]), dtype=np.float32
+                )
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used[: self._size]))
+            self._vectors[slot] = vector
+            self._prompts[slot] = prompt
+            self._values[slot] = value
+            self._tick += 1
+            self._last_used[slot] = self._tick
+
+    def save(self, path: str) -> None:
+        """Write the index to ``path`` atomically."""
+        with self._lock:
+            size = self._size
+            vectors = (
+                self._vectors[:size].copy()
+                if self._vectors is not None
+                else np.zeros((0, 0), dtype=np.float32)
+            )
+            last_used = self._last_used[:size].copy()
+            meta = json.dumps(
+                {
+                    "version": INDEX_VERSION,
+                    "prompts": self._prompts[:size],
+                    "values": self._values[:size],
+                }
+            )
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                vectors=vectors,
+                last_used=last_used,
+                meta=np.frombuffer(meta.encode("utf-8"), dtype=np.uint8),
+            )
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> None:
+        """Replace the index contents with a file written by :meth:`save`."""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            if meta.get("version") != INDEX_VERSION:
+                raise ValueError(f"Unsupported semantic cache index: {path}")
+            vectors = data["vectors"]
+            last_used = data["last_used"]
+        # Keep the most recently used entries if the index has shrunk
+        keep = np.sort(np.argsort(-last_used, kind="stable")[: self.capacity])
+        size = len(keep)
+        with self._lock:
+            if size:
+                self._vectors = np.zeros(
+                    (self.capacity, vectors.shape[1]), dtype=np.float32
+                )
+                self._vectors[:size] = vectors[keep]
+            self._last_used[:size] = last_used[keep]
+            self._prompts[:size] = [meta["prompts"][i] for i in keep]
+            self._values[:size] = [meta["values"][i] for i in keep]
+            self._size = size
+            self._tick = int(last_used.max()) if size else 0
+
+
+def from_env(client) -> Optional[SemanticCache]:
+    """Build the semantic cache if SEMANTIC_CACHE is enabled, else None."""
+    if os.environ.get("SEMANTIC_CACHE", "").lower() not in ("1", "true"):
+        return None
+    cache = SemanticCache(
+        GeminiEmbedder(client),
+        capacity=int(os.environ.get("SEMANTIC_CACHE_SIZE", "10000")),
+        threshold=float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+    )
+    path = os.environ.get("SEMANTIC_CACHE_PATH")
+    if path:
+        if os.path.exists(path):
+            try:
+                cache.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning("Could not load semantic cache index: %s", e)
+
+        def save():
+            try:
+                cache.save(path)
+            except OSError as e:
+                logging.warning("Could not save semantic cache index: %s", e)
+
+        atexit.register(save)
+    return cache
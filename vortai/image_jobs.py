@@ -0,0 +1,328 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Asynchronous image generation jobs.
+Submitting a prompt returns at once with a job ID and a placeholder
+derived from the prompt; the image is generated on a small worker pool.
+"""
+
+import colorsys
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import quote
+
+from .metrics import metrics
+from .resilience import deadline
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+# Point a prompt link from a failed job to a new one, if nobody did first
+_TAKE_OVER_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class QueueFull(RuntimeError):
+    """Raised when too many image jobs are already waiting."""
+
+
+def placeholder(canonical: str) -> Dict[str, str]:
+    """A dominant colour and a small SVG gradient, both from the prompt hash.
+
+    Costs one hash, so it can be shown before generation even starts, and
+    the same prompt always gets the same placeholder.
+    """
+    digest = hashlib.sha256(canonical.encode("utf-8")).digest()
+    colors = []
+    for offset in (0, 3):
+        hue = int.from_bytes(digest[offset : offset + 2], "big") / 65535
+        lightness = 0.45 + digest[offset + 2] / 255 * 0.2
+        r, g, b = colorsys.hls_to_rgb(hue, lightness, 0.55)
+        colors.append(f"#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}")
+    svg = (
+        '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 64 64">'
+        '<defs><linearGradient id="g" x2="1" y2="1">'
+        f'<stop offset="0" stop-color="{colors[0]}"/>'
+        f'<stop offset="1" stop-color="{colors[1]}"/>'
+        '</linearGradient></defs><rect width="64" height="64" fill="url(#g)"/></svg>'
+    )
+    return {"color": colors[0], "svg": "data:image/svg+xml," + quote(svg)}
+
+
+def _read(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None  # Evicted from the spool
+
+
+class MemoryJobStore:
+    """Jobs for one process, evicting the oldest beyond ``max_jobs``.
+
+    Finished jobs keep the path of their spooled image, which is readable
+    until the spool evicts it.
+    """
+
+    def __init__(self, ttl: int = 3600, max_jobs: int = 200):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._paths: Dict[str, str] = {}
+        self._by_prompt: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, prompt_key: str, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Store ``job`` unless the prompt has a live job; return the winner."""
+        now = time.time()
+        with self._lock:
+            existing = self._live(self._by_prompt.get(prompt_key), now)
+            if existing is not None and existing["status"] != FAILED:
+                path = self._paths.get(existing["id"])
+                # A finished job whose image left the spool is generated again
+                if existing["status"] != DONE or os.path.exists(path or ""):
+                    return existing
+            self._jobs[job["id"]] = (job, now + self.ttl)
+            self._by_prompt[prompt_key] = job["id"]
+            while len(self._jobs) > self.max_jobs:
+                old_id, (old, _) = self._jobs.popitem(last=False)
+                self._paths.pop(old_id, None)
+                if self._by_prompt.get(old["prompt_key"]) == old_id:
+                    del self._by_prompt[old["prompt_key"]]
+            return job
+
+    def _live(self, job_id: Optional[str], now: float) -> Optional[Dict[str, Any]]:
+        entry = self._jobs.get(job_id) if job_id else None
+        if entry is None or entry[1] <= now:
+            return None
+        return entry[0]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._live(job_id, time.time())
+            return dict(job) if job is not None else None
+
+    def update(self, job: Dict[str, Any], path: Optional[str] = None) -> None:
+        with self._lock:
+            if job["id"] not in self._jobs:
+                return  # evicted while running
+            self._jobs[job["id"]] = (job, time.time() + self.ttl)
+            if path is not None:
+                self._paths[job["id"]] = path
+
+    def image(self, job_id: str) -> Optional[bytes]:
+        with self._lock:
+            if self._live(job_id, time.time()) is None:
+                return None
+            path = self._paths.get(job_id)
+        return _read(path) if path is not None else None
+
+
+class RedisJobStore:
+    """Jobs shared by every worker, so any of them can answer a poll.
+
+    Images are copied into Redis, since the spool is local to one host.
+    """
+
+    def __init__(self, client, ttl: int = 3600):
+        self.client = client
+        self.ttl = ttl
+        self._take_over = client.register_script(_TAKE_OVER_SCRIPT)
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"vortai:imgjob:{job_id}"
+
+    def claim(self, prompt_key: str, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Store ``job`` unless the prompt has a live job; return the winner."""
+        link = f"vortai:imgjob:prompt:{prompt_key}"
+        # The record goes first, so a prompt link always leads to a job
+        self.client.set(self._key(job["id"]), json.dumps(job), ex=self.ttl)
+        for _ in range(2):
+            if self.client.set(link, job["id"], nx=True, ex=self.ttl):
+                return job
+            existing_id = self.client.get(link)
+            existing = self.get(existing_id.decode()) if existing_id else None
+            if existing is not None and existing["status"] != FAILED:
+                self.client.delete(self._key(job["id"]))
+                return existing
+            # Failed or expired: take over, unless another job already has
+            if existing_id and self._take_over(
+                keys=[link], args=[existing_id, job["id"], self.ttl]
+            ):
+                return job
+        self.client.delete(self._key(job["id"]))
+        raise RuntimeError("Could not claim image job")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.client.get(self._key(job_id))
+        return json.loads(raw) if raw is not None else None
+
+    def update(self, job: Dict[str, Any], path: Optional[str] = None) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        if path is not None:
+            with open(path, "rb") as f:
+                pipe.set(self._key(job["id"]) + ":image", f.read(), ex=self.ttl)
+        pipe.set(self._key(job["id"]), json.dumps(job), ex=self.ttl)
+        pipe.execute()
+
+    def image(self, job_id: str) -> Optional[bytes]:
+        return self.client.get(self._key(job_id) + ":image")
+
+
+class ImageJobs:
+    """Run image generations in the background.
+
+    Identical prompts (after canonicalization) share one job while it is
+    pending or done, so a burst of retries costs one generation. At most
+    ``workers`` generations run at once, and once ``max_queue`` jobs are
+    queued or running :meth:`submit` raises :class:`QueueFull`. A job
+    still pending well past ``timeout`` (its process died) reads as
+    failed.
+    """
+
+    def __init__(
+        self,
+        ai,
+        store=None,
+        workers: int = 4,
+        max_queue: int = 64,
+        timeout: float = 120.0,
+    ):
+        self.ai = ai
+        self.store = store or MemoryJobStore()
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        _pools.add(self)
+
+    @classmethod
+    def from_env(cls, ai, redis_client=None) -> "ImageJobs":
+        """Build from IMAGE_JOB_* settings, sharing state through Redis if given."""
+        ttl = int(os.environ.get("IMAGE_JOB_TTL", "3600"))
+        store = (
+            RedisJobStore(redis_client, ttl)
+            if redis_client is not None
+            else MemoryJobStore(ttl)
+        )
+        return cls(
+            ai,
+            store,
+            workers=int(os.environ.get("IMAGE_JOB_WORKERS", "4")),
+            max_queue=int(os.environ.get("IMAGE_JOB_QUEUE", "64")),
+            timeout=float(os.environ.get("IMAGE_JOB_TIMEOUT", "120")),
+        )
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="vortai-image"
+                )
+            return self._executor
+
+    def submit(self, prompt: str) -> Dict[str, Any]:
+        """Start (or join) the job for ``prompt`` and return its record."""
+        canonical = self.ai.canonicalizer(prompt)
+        prompt_key = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        with self._lock:
+            if self._queued >= self.max_queue:
+                metrics.inc("image_jobs.rejected")
+                raise QueueFull("Too many image jobs in progress")
+            self._queued += 1
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": PENDING,
+            "prompt_key": prompt_key,
+            "placeholder": placeholder(canonical),
+            "created": time.time(),
+        }
+        try:
+            claimed = self.store.claim(prompt_key, job)
+            if claimed["id"] == job["id"]:
+                self._pool().submit(self._run, job, prompt)
+                metrics.inc("image_jobs.submitted")
+                return job
+        except BaseException:
+            self._release()
+            raise
+        self._release()
+        metrics.inc("image_jobs.joined")
+        return claimed
+
+    def _release(self) -> None:
+        with self._lock:
+            self._queued -= 1
+
+    def _run(self, job: Dict[str, Any], prompt: str) -> None:
+        started = time.monotonic()
+        try:
+            with deadline(self.timeout):
+                filepath = self.ai.generate_image(prompt)
+            mime_type, _ = mimetypes.guess_type(filepath)
+            job.update(status=DONE, mimetype=mime_type or "image/png")
+            self.store.update(job, filepath)
+            metrics.inc("image_jobs.completed")
+        except Exception as e:
+            logging.warning("Image job %s failed: %s", job["id"], e)
+            job.update(status=FAILED, error="Image generation failed")
+            try:
+                self.store.update(job)
+            except Exception as store_error:
+                logging.warning("Could not record failed image job: %s", store_error)
+            metrics.inc("image_jobs.failed")
+        finally:
+            metrics.observe("image_jobs.latency", time.monotonic() - started)
+            self._release()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id)
+        if (
+            job is not None
+            and job["status"] == PENDING
+            and time.time() - job["created"] > self.timeout + 30
+        ):
+            job.update(status=FAILED, error="Image generation failed")
+        return job
+
+    def image(self, job_id: str) -> Optional[bytes]:
+        return self.store.image(job_id)
+
+    def gauges(self) -> Dict[str, float]:
+        return {"image_jobs.queued": self._queued}
+
+
+# Every pool, so workers can drop executors inherited across fork
+_pools: "weakref.WeakSet[ImageJobs]" = weakref.WeakSet()
+
+
+def _reset_after_fork() -> None:
+    for jobs in list(_pools):
+        jobs._lock = threading.Lock()
+        jobs._executor = None
+        jobs._queued = 0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -7,11 +7,11 @@ Supports multiple AI providers (Gemini, Imagen) through a unified interface.
 """
 
 import os
-import uuid
-import tempfile
 import mimetypes
-from google import genai as google_genai
+from typing import Optional
 from google.genai import types
+from . import spool, tracing, transport
+from .resilience import http_options, time_left
 
 # Vertex AI for Imagen models
 try:
@@ -26,8 +26,10 @@ except ImportError:
 class ImageProvider:
     """Base class for image generation providers."""
 
-    def generate_image(self, prompt: str, model: str) -> str:
-        """Generate image and return file path."""
+    def generate_image(
+        self, prompt: str, model: str, stem: Optional[str] = None
+    ) -> str:
+        """Generate image and return its path in the image spool."""
         raise NotImplementedError
 
 
@@ -35,9 +37,11 @@ class GeminiImageProvider(ImageProvider):
     """Image generation using Gemini API."""
 
     def __init__(self, api_key: str):
-        self.client = google_genai.Client(api_key=api_key)
+        self.client = transport.get_client(api_key)
 
-    def generate_image(self, prompt: str, model: str) -> str:
+    def generate_image(
+        self, prompt: str, model: str, stem: Optional[str] = None
+    ) -> str:
         """Generate image using Gemini API."""
         contents = [
             types.Content(
@@ -50,12 +54,14 @@ class GeminiImageProvider(ImageProvider):
         generate_content_config = types.GenerateContentConfig(
             response_modalities=["image", "text"],
             response_mime_type="text/plain",
+            http_options=http_options(),
         )
-        response = self.client.models.generate_content(
-            model=model,
-            contents=contents,
-            config=generate_content_config,
-        )
+        with tracing.span("image.generate", client=True, model=model):
+            response = self.client.models.generate_content(
+                model=model,
+                contents=contents,
+                config=generate_content_config,
+            )
         if (
             response.candidates
             and response.candidates[0].content
@@ -63,17 +69,17 @@ class GeminiImageProvider(ImageProvider):
         ):
             for part in response.candidates[0].content.parts:
                 if part.inline_data:
-                    file_extension = mimetypes.guess_extension(
-                        part.inline_data.mime_type
-                    )
-                    filename = f"{uuid.uuid4()}{file_extension}"
-                    filepath = os.path.join(
-                        tempfile.gettempdir(), "vortai_images", filename
+                    file_extension = (
+                        mimetypes.guess_extension(part.inline_data.mime_type) or ".png"
                     )
-                    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                    with open(filepath, "wb") as f:
-                        f.write(part.inline_data.data)
-                    return filepath
+                    data = part.inline_data.data
+
+                    def save(path: str) -> None:
+                        with open(path, "wb") as f:
+                            f.write(data)
+
+                    with tracing.span("image.save"):
+                        return spool.images().write(file_extension, save, stem)
         raise ValueError("Failed to generate image")
 
 
@@ -98,36 +104,46 @@ class ImagenImageProvider(ImageProvider):
         # Cache for model instances
         self._model_cache = {}
 
-    def generate_image(self, prompt: str, model: str) -> str:
-        """Generate image using Imagen via Vertex AI."""
+    def preload(self, model: str):
+        """Return the cached model instance, loading it on first use."""
         if not VERTEX_AI_AVAILABLE:
             raise ValueError(
                 "Vertex AI not available. Install google-cloud-aiplatform package."
             )
-
-        # Get cached model or create new one
         if model not in self._model_cache:
-            self._model_cache[model] = ImageGenerationModel.from_pretrained(model)
+            with tracing.span("imagen.load_model", model=model):
+                self._model_cache[model] = ImageGenerationModel.from_pretrained(model)
+        return self._model_cache[model]
 
-        imagen_model = self._model_cache[model]
+    def generate_image(
+        self, prompt: str, model: str, stem: Optional[str] = None
+    ) -> str:
+        """Generate image using Imagen via Vertex AI."""
+        imagen_model = self.preload(model)
+
+        # Fail fast if the request deadline has already passed
+        time_left()
 
         # Generate image
-        images = imagen_model.generate_images(
-            prompt=prompt,
-            number_of_images=1,
-            aspect_ratio="1:1",
-            safety_filter_level="block_some",
-            person_generation="allow_adult",
-        )
+        with tracing.span("image.generate", client=True, model=model):
+            images = imagen_model.generate_images(
+                prompt=prompt,
+                number_of_images=1,
+                aspect_ratio="1:1",
+                safety_filter_level="block_some",
+                person_generation="allow_adult",
+            )
 
         if images and len(images) > 0:
-            filename = f"{uuid.uuid4()}.png"
-            filepath = os.path.join(tempfile.gettempdir(), "vortai_images", filename)
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-
             # Save the image
-            images[0].save(location=filepath, include_generation_parameters=False)
-            return filepath
+            with tracing.span("image.save"):
+                return spool.images().write(
+                    ".png",
+                    lambda path: images[0].save(
+                        location=path, include_generation_parameters=False
+                    ),
+                    stem,
+                )
 
         raise ValueError("Failed to generate image with Imagen")
 
@@ -141,8 +157,13 @@ class ImageGenerationService:
             "imagen": ImagenImageProvider(),
         }
 
-    def generate_image(self, prompt: str, model: str) -> str:
-        """Generate image using the appropriate provider based on model name."""
+    def generate_image(
+        self, prompt: str, model: str, stem: Optional[str] = None
+    ) -> str:
+        """Generate image using the appropriate provider based on model name.
+
+        ``stem`` names the spooled file, so the image can be found again.
+        """
         # Centralize prompt validation to follow DRY principle
         if not prompt or len(prompt) > 5000:
             raise ValueError("Invalid prompt")
@@ -151,10 +172,18 @@ class ImageGenerationService:
             provider = self.providers.get("imagen")
             if not provider:
                 raise ValueError("Imagen provider not available")
-            return provider.generate_image(prompt, model)
+            return provider.generate_image(prompt, model, stem)
         else:
             # Default to Gemini for other models
             provider = self.providers.get("gemini")
             if not provider:
                 raise ValueError("Gemini provider not available")
-            return provider.generate_image(prompt, model)
+            return provider.generate_image(prompt, model, stem)
+
+    def preload(self, model: str) -> None:
+        """Load ``model`` before its first request, where the provider needs it."""
+        if model.startswith("imagen-"):
+            provider = self.providers.get("imagen")
+            if not provider:
+                raise ValueError("Imagen provider not available")
+            provider.preload(model)
@@ -0,0 +1,249 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+API key pool for Gemini AI SDK.
+Spreads upstream calls across several keys, tracking each key's
+per-minute usage and backing off keys that are rate-limited or rejected.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from google.genai import errors
+
+from . import transport
+from .metrics import metrics
+
+WINDOW = 60.0  # seconds; quotas are per minute
+MAX_COOLDOWN = 300.0
+AUTH_COOLDOWN = 600.0  # for keys the API rejects outright
+
+# Pick the candidate key with the fewest calls this minute across all
+# workers and count the call; returns its 1-based index, or 0 if every
+# candidate has used up ARGV[1] calls.
+_ACQUIRE_SCRIPT = """
+local best, best_count = 0, tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local count = tonumber(redis.call('GET', key) or '0')
+    if count < best_count then
+        best, best_count = i, count
+    end
+end
+if best > 0 then
+    redis.call('INCR', KEYS[best])
+    redis.call('EXPIRE', KEYS[best], ARGV[2])
+end
+return best
+"""
+
+
+def retry_delay(exc: BaseException) -> Optional[float]:
+    """The server's suggested retry delay (google.rpc.RetryInfo), if any."""
+    details = getattr(exc, "details", None)
+    if not isinstance(details, dict):
+        return None
+    for item in details.get("error", {}).get("details", []) or []:
+        delay = item.get("retryDelay") if isinstance(item, dict) else None
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return float(delay[:-1])
+            except ValueError:
+                return None
+    return None
+
+
+class _Key:
+    __slots__ = ("key", "label", "digest", "calls", "cooldown_until", "failures")
+
+    def __init__(self, key: str):
+        self.key = key
+        self.label = f"...{key[-4:]}"  # never expose whole keys in metrics
+        self.digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        self.calls: Deque[float] = deque()
+        self.cooldown_until = 0.0
+        self.failures = 0
+
+
+class KeyPool:
+    """Choose an API key per upstream call.
+
+    Each call goes to the available key with the most quota left in the
+    current minute (or the least used one when ``rpm`` is unknown). A 429
+    parks the key for the server's retry delay, or an exponential backoff;
+    401/403 park it for longer. When every key is parked, the one that
+    frees up first is used.
+
+    With a Redis client, ``rpm`` is enforced across every worker sharing
+    it, counting calls per clock minute; without one (or while Redis is
+    down) each process counts only its own calls.
+    """
+
+    def __init__(
+        self,
+        keys: List[str],
+        rpm: Optional[int] = None,
+        client_factory: Callable[[str], Any] = transport.get_client,
+        redis_client=None,
+    ):
+        unique = list(dict.fromkeys(k for k in keys if k))
+        if not unique:
+            raise ValueError("At least one API key is required")
+        self.rpm = rpm
+        self.client_factory = client_factory
+        self._keys = [_Key(key) for key in unique]
+        self._by_key = {entry.key: entry for entry in self._keys}
+        self._lock = threading.Lock()
+        self._acquire_shared = (
+            redis_client.register_script(_ACQUIRE_SCRIPT)
+            if redis_client is not None and rpm is not None and len(unique) > 1
+            else None
+        )
+        _pools.add(self)
+
+    @classmethod
+    def from_env(
+        cls,
+        api_key: Optional[str] = None,
+        api_keys: Optional[List[str]] = None,
+        redis_client=None,
+    ) -> "KeyPool":
+        """Build a pool from ``api_keys``, GEMINI_API_KEYS or ``api_key``.
+
+        GEMINI_API_KEYS is comma-separated; GEMINI_KEY_RPM sets the per-key
+        requests-per-minute quota, shared by all workers through
+        ``redis_client``.
+        """
+        if api_keys is None:
+            api_keys = [
+                k.strip()
+                for k in os.environ.get("GEMINI_API_KEYS", "").split(",")
+                if k.strip()
+            ]
+        rpm = os.environ.get("GEMINI_KEY_RPM")
+        return cls(
+            api_keys or [api_key or ""],
+            rpm=int(rpm) if rpm else None,
+            redis_client=redis_client,
+        )
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def keys(self) -> List[str]:
+        return [entry.key for entry in self._keys]
+
+    def _prune(self, entry: _Key, now: float) -> None:
+        while entry.calls and entry.calls[0] <= now - WINDOW:
+            entry.calls.popleft()
+
+    def acquire(self) -> str:
+        """Pick a key for one call and count the call against it."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = []
+            for entry in self._keys:
+                self._prune(entry, now)
+                if entry.cooldown_until > now:
+                    continue
+                if self.rpm is not None and len(entry.calls) >= self.rpm:
+                    continue
+                candidates.append(entry)
+            candidates.sort(key=lambda e: len(e.calls))
+        if candidates and self._acquire_shared is not None:
+            candidates = self._shared(candidates)
+        with self._lock:
+            best = candidates[0] if candidates else None
+            if best is None:
+                # Everything is exhausted; use whichever recovers first
+                best = min(
+                    self._keys,
+                    key=lambda e: max(
+                        e.cooldown_until,
+                        e.calls[0] + WINDOW if e.calls else 0.0,
+                    ),
+                )
+                metrics.inc("genai.keys.exhausted")
+            best.calls.append(now)
+            return best.key
+
+    def _shared(self, candidates: List[_Key]) -> List[_Key]:
+        """Narrow ``candidates`` to the one with the most quota left overall."""
+        minute = int(time.time() // WINDOW)
+        try:
+            index = int(
+                self._acquire_shared(
+                    keys=[f"vortai:key:{e.digest}:{minute}" for e in candidates],
+                    args=[self.rpm, int(WINDOW * 2)],
+                )
+            )
+        except Exception as e:
+            logging.warning("Shared key usage unavailable: %s", e)
+            return candidates
+        return [candidates[index - 1]] if index else []
+
+    def client(self, key: str) -> Any:
+        return self.client_factory(key)
+
+    def report(self, key: str, error: Optional[BaseException] = None) -> None:
+        """Record the outcome of a call made with ``key``."""
+        with self._lock:
+            entry = self._by_key.get(key)
+            if entry is None:
+                return
+            if error is None:
+                entry.failures = 0
+                return
+            code = error.code if isinstance(error, errors.APIError) else None
+            now = time.monotonic()
+            if code == 429:
+                entry.failures += 1
+                delay = retry_delay(error)
+                if delay is None:
+                    delay = min(MAX_COOLDOWN, 2.0**entry.failures)
+                entry.cooldown_until = max(entry.cooldown_until, now + delay)
+            elif code in (401, 403):
+                entry.cooldown_until = now + AUTH_COOLDOWN
+        if code in (401, 403, 429):
+            metrics.inc("genai.key.errors", key=entry.label, code=code)
+
+    def gauges(self) -> Dict[str, float]:
+        """Per-key usage in the current minute, for the metrics snapshot."""
+        now = time.monotonic()
+        gauges: Dict[str, float] = {}
+        with self._lock:
+            for entry in self._keys:
+                self._prune(entry, now)
+                labels = f"{{key={entry.label}}}"
+                gauges[f"genai.key.requests_per_minute{labels}"] = len(entry.calls)
+                gauges[f"genai.key.cooling_down{labels}"] = float(
+                    entry.cooldown_until > now
+                )
+                if self.rpm:
+                    gauges[f"genai.key.utilization{labels}"] = (
+                        len(entry.calls) / self.rpm
+                    )
+        return gauges
+
+
+# Every live pool; one collector reports them all, so building another
+# GeminiAI neither leaks a collector nor duplicates gauges
+_pools: "weakref.WeakSet[KeyPool]" = weakref.WeakSet()
+
+
+def pool_gauges() -> Dict[str, float]:
+    gauges: Dict[str, float] = {}
+    for pool in list(_pools):
+        if len(pool) > 1:
+            gauges.update(pool.gauges())
+    return gauges
+
+
+metrics.register_collector(pool_gauges)
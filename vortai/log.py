@@ -0,0 +1,218 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Structured logging for Vortai.
+JSON records are written off the request thread through a queue, carry
+the request ID and per-request fields, and repetitive warnings and
+errors are sampled.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from flask import Flask, g, request
+
+from .metrics import metrics
+
+_context: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "vortai_log_context", default=None
+)
+_REQUEST_ID = re.compile(r"^[\w.:-]{1,128}$")
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+logger = logging.getLogger("vortai.access")
+
+
+def bind(**fields: Any) -> None:
+    """Attach fields (model, cache status, timings...) to the current request."""
+    context = _context.get()
+    if context is not None:
+        context.update(fields)
+
+
+def current_request_id() -> Optional[str]:
+    context = _context.get()
+    return context.get("request_id") if context else None
+
+
+class ContextFilter(logging.Filter):
+    """Copy the current request's fields onto each record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _context.get()
+        if context:
+            record.context = dict(context)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Rate-limit repetitive warnings and errors.
+
+    Records are grouped by logger, level and unformatted message. In each
+    window the first ``burst`` records of a group pass, then one in every
+    ``sample_rate``, carrying how many were dropped since the last one.
+    """
+
+    def __init__(self, burst: int = 10, sample_rate: int = 100, window: float = 10):
+        super().__init__()
+        self.burst = burst
+        self.sample_rate = sample_rate
+        self.window = window
+        self._groups: Dict[Tuple[str, int, Any], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            group = self._groups.get(key)
+            if group is None or now - group[0] >= self.window:
+                if len(self._groups) > 1000:
+                    self._groups.clear()
+                group = self._groups[key] = [now, 0, 0]  # start, seen, dropped
+            group[1] += 1
+            if group[1] <= self.burst or group[1] % self.sample_rate == 0:
+                if group[2]:
+                    record.suppressed = group[2]
+                    group[2] = 0
+                return True
+            group[2] += 1
+        metrics.inc("log.sampled_out")
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    """Render records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "context", {}))
+        for key, value in vars(record).items():
+            if key not in _RESERVED and key != "context":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when full.
+
+    Message formatting is left to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            # Tracebacks hold frames that may change once the request ends
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("log.dropped")
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[_NonBlockingQueueHandler] = None
+_config_lock = threading.Lock()
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> None:
+    """Route all logging through a background queue. Safe to call repeatedly."""
+    global _listener, _handler
+    with _config_lock:
+        if _listener is not None:
+            return
+        stream = logging.StreamHandler(sys.stdout)
+        if (fmt or os.environ.get("LOG_FORMAT", "json")) == "json":
+            stream.setFormatter(JsonFormatter())
+        else:
+            stream.setFormatter(
+                logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+            )
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=10000)
+        _handler = _NonBlockingQueueHandler(log_queue)
+        _handler.addFilter(ContextFilter())
+        _handler.addFilter(SamplingFilter())
+        _listener = logging.handlers.QueueListener(
+            log_queue, stream, respect_handler_level=True
+        )
+        _listener.start()
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel(level or os.environ.get("LOG_LEVEL", "INFO"))
+        atexit.register(_listener.stop)
+
+
+def _restart_after_fork() -> None:
+    # The listener thread does not survive fork; start a fresh one
+    global _config_lock
+    _config_lock = threading.Lock()
+    if _listener is not None and _handler is not None:
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=10000)
+        _handler.queue = log_queue
+        _listener.queue = log_queue
+        _listener._thread = None
+        _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def init_request_logging(app: Flask) -> None:
+    """Assign request IDs and emit one structured access record per request."""
+
+    @app.before_request
+    def start_request_log() -> None:
+        request_id = request.headers.get("X-Request-ID", "")
+        if not _REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        g.log_token = _context.set(
+            {"request_id": request_id, "endpoint": request.endpoint}
+        )
+        g.log_start = time.perf_counter()
+
+    @app.after_request
+    def finish_request_log(response):
+        context = _context.get()
+        if context is None:
+            return response
+        response.headers["X-Request-ID"] = context["request_id"]
+        duration_ms = round((time.perf_counter() - g.log_start) * 1000, 2)
+        logger.info(
+            "%s %s %s",
+            request.method,
+            request.path,
+            response.status_code,
+            extra={"status": response.status_code, "duration_ms": duration_ms},
+        )
+        return response
+
+    @app.teardown_request
+    def clear_request_log(exc) -> None:
+        token = g.pop("log_token", None)
+        if token is not None:
+            _context.reset(token)
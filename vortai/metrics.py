@@ -0,0 +1,77 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+In-process metrics for Vortai.
+Counters, gauges and timing summaries, exposed as a JSON snapshot.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List
+
+
+def _name(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    inner = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+    return f"{name}{{{inner}}}"
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and timers."""
+
+    def __init__(self):
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._timers: Dict[str, List[float]] = {}  # [count, total, max]
+        self._collectors: List[Callable[[], Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = _name(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        key = _name(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        key = _name(name, labels)
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                self._timers[key] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                timer[2] = max(timer[2], seconds)
+
+    def register_collector(self, collector: Callable[[], Dict[str, Any]]) -> None:
+        """Add a callable whose gauges are read at snapshot time."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timers = {
+                key: {"count": c, "total": t, "max": m, "avg": t / c}
+                for key, (c, t, m) in self._timers.items()
+            }
+            collectors = list(self._collectors)
+        for collector in collectors:
+            gauges.update(collector())
+        return {"counters": counters, "gauges": gauges, "timers": timers}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timers.clear()
+
+
+# Global metrics registry
+metrics = Metrics()
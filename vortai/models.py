@@ -11,6 +11,25 @@ TEXT_MODEL = "gemini-2.5-flash"
 THINKING_MODEL = "gemini-2.5-pro"
 URL_CONTEXT_MODEL = "gemini-2.5-pro"
 
+# Ordered candidates per capability. Traffic goes to the first candidate
+# meeting its SLO; override with MODEL_CANDIDATES_<CAPABILITY>="a,b,c".
+MODEL_CANDIDATES = {
+    "text": (TEXT_MODEL, "gemini-2.5-flash-lite", "gemini-2.0-flash"),
+    "thinking": (THINKING_MODEL, "gemini-2.5-flash"),
+    "url_context": (URL_CONTEXT_MODEL, "gemini-2.5-flash"),
+}
+
+# Per-capability service level objectives: p95 latency (seconds) and the
+# share of calls failing with 429, 5xx or a timeout.
+MODEL_SLOS = {
+    "text": {"p95": 10.0, "error_rate": 0.05},
+    "thinking": {"p95": 60.0, "error_rate": 0.05},
+    "url_context": {"p95": 45.0, "error_rate": 0.05},
+}
+
+# Embedding model for the semantic cache
+EMBEDDING_MODEL = "gemini-embedding-001"
+
 # Image generation model
 IMAGE_MODEL = "imagen-4.0-generate-001"
 
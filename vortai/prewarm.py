@@ -0,0 +1,178 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Cache pre-warming from access logs.
+Ranks the text prompts recorded with LOG_PROMPTS=1 by frequency and
+recency and computes the top ones into the shared response cache ahead
+of the traffic.
+"""
+
+import json
+import logging
+import math
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .extensions.ratelimit import ENDPOINT_COSTS, parse_limit
+from .resilience import deadline
+
+logger = logging.getLogger(__name__)
+
+# The POST endpoint whose rate-limit cost a pre-computed result stands for.
+# Speech and images go to per-host spools that expire within minutes, so
+# warming them off-peak would be gone by the time the traffic comes.
+MODE_ENDPOINTS = {"text": "api.generate_response"}
+
+# Cache states in the access log that did not call the model
+_SERVED_FROM_CACHE = ("hit", "stale", "semantic_hit")
+
+
+def read_access_log(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Successful access records carrying a prompt, from JSON log files."""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.startswith("{"):
+                    continue  # Another process's output in the same stream
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if (
+                    record.get("logger") == "vortai.access"
+                    and record.get("status") == 200
+                    and record.get("mode") in MODE_ENDPOINTS
+                    and isinstance(record.get("prompt"), str)
+                ):
+                    yield record
+
+
+class Ranking:
+    """Prompts of one mode, scored by a recency-weighted request count.
+
+    Each request adds ``0.5 ** (age / half_life)``, so a prompt asked
+    twice today outranks one asked three times last week.
+    """
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.scores: Dict[str, float] = defaultdict(float)
+        self.logged_hits = 0
+        self.logged_lookups = 0
+
+    @property
+    def total(self) -> float:
+        return sum(self.scores.values())
+
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        return sorted(self.scores.items(), key=lambda item: -item[1])[:k]
+
+
+def rank(
+    records: Iterable[Dict[str, Any]],
+    half_life: float = 86400.0,
+    now: Optional[float] = None,
+) -> Dict[str, Ranking]:
+    """Score every logged prompt, per mode."""
+    now = time.time() if now is None else now
+    rankings: Dict[str, Ranking] = {}
+    for record in records:
+        ranking = rankings.get(record["mode"])
+        if ranking is None:
+            ranking = rankings[record["mode"]] = Ranking(record["mode"])
+        age = max(0.0, now - float(record.get("ts", now)))
+        ranking.scores[record["prompt"]] += math.pow(0.5, age / half_life)
+        if "cache" in record:
+            ranking.logged_lookups += 1
+            ranking.logged_hits += record["cache"] in _SERVED_FROM_CACHE
+    return rankings
+
+
+class Prewarmer:
+    """Compute top prompts into the cache without crowding out live traffic.
+
+    Requests are paced so their rate-limit cost (see ``ENDPOINT_COSTS``)
+    stays within ``limit``, e.g. ``"60/minute"``. This budget is separate
+    from the server's RATE_LIMIT: it is not charged to any client. Each one gets
+    ``timeout`` seconds, and nothing new is started once ``budget``
+    seconds have passed since construction, so a run fits an off-peak
+    window.
+    """
+
+    def __init__(
+        self,
+        ai,
+        limit: str = "60/minute",
+        timeout: float = 60.0,
+        budget: Optional[float] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.ai = ai
+        amount, seconds = parse_limit(limit)
+        self.seconds_per_unit = seconds / amount
+        self.timeout = timeout
+        self.stop_at = time.monotonic() + budget if budget is not None else None
+        self._sleep = sleep
+
+    def coverage(self, ranking: Ranking) -> float:
+        """Share of the ranking's (weighted) requests a cache would answer."""
+        if not ranking.scores:
+            return 0.0
+        texts = list(ranking.scores)
+        cached = self.ai.cached(ranking.mode, texts)
+        hit = sum(ranking.scores[t] for t, ok in zip(texts, cached) if ok)
+        return hit / ranking.total
+
+    def run(self, ranking: Ranking, top_k: int) -> Dict[str, Any]:
+        """Pre-compute the top ``top_k`` prompts of ``ranking``; returns a report."""
+        top = [text for text, _ in ranking.top(top_k)]
+        report: Dict[str, Any] = {
+            "mode": ranking.mode,
+            "prompts": len(top),
+            "already_cached": 0,
+            "computed": 0,
+            "failed": 0,
+            "skipped": 0,
+            "before": self.coverage(ranking),
+        }
+        cost = ENDPOINT_COSTS.get(MODE_ENDPOINTS[ranking.mode], 1)
+        next_at = time.monotonic()
+        for text, cached in zip(top, self.ai.cached(ranking.mode, top)):
+            if cached:
+                report["already_cached"] += 1
+                continue
+            if self.stop_at is not None and time.monotonic() >= self.stop_at:
+                report["skipped"] += 1
+                continue
+            wait = next_at - time.monotonic()
+            if wait > 0:
+                self._sleep(wait)
+            next_at = max(next_at, time.monotonic()) + cost * self.seconds_per_unit
+            try:
+                with deadline(self.timeout):
+                    self.ai.precompute(ranking.mode, text)
+                report["computed"] += 1
+            except Exception as e:
+                logger.warning("Could not pre-compute a %s prompt: %s", ranking.mode, e)
+                report["failed"] += 1
+        report["after"] = self.coverage(ranking)
+        if ranking.logged_lookups:
+            report["logged"] = ranking.logged_hits / ranking.logged_lookups
+        return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    line = (
+        f"{report['mode']}: {report['prompts']} prompts, "
+        f"{report['already_cached']} already cached, {report['computed']} computed, "
+        f"{report['failed']} failed"
+    )
+    if report["skipped"]:
+        line += f", {report['skipped']} skipped (out of time)"
+    # The share of logged requests the cache would have answered
+    line += f"; hit ratio {report['before']:.1%} -> {report['after']:.1%}"
+    if "logged" in report:
+        line += f" (logged: {report['logged']:.1%})"
+    return line
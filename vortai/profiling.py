@@ -0,0 +1,152 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Low-overhead profiling helpers for live processes.
+A statistical stack sampler, tracemalloc snapshots and per-request cProfile.
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+def _collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class StackSampler:
+    """Sample every thread's stack at a fixed interval.
+
+    The result is in collapsed-stack format (``frame;frame;frame count``),
+    ready for flamegraph.pl or speedscope. Only one sampling run may be
+    active at a time.
+    """
+
+    def __init__(self, max_seconds: float = 30, min_interval: float = 0.001):
+        self.max_seconds = max_seconds
+        self.min_interval = min_interval
+        self._running = threading.Lock()
+
+    def sample(self, seconds: float, interval: float = 0.005) -> Optional[str]:
+        """Run for ``seconds``; returns None if another run is in progress."""
+        seconds = min(max(seconds, 0), self.max_seconds)
+        interval = max(interval, self.min_interval)
+        if not self._running.acquire(blocking=False):
+            return None
+        try:
+            own = threading.get_ident()
+            counts: Counter = Counter()
+            end = time.monotonic() + seconds
+            while True:
+                for ident, frame in sys._current_frames().items():
+                    if ident != own:
+                        counts[_collapse(frame)] += 1
+                if time.monotonic() >= end:
+                    break
+                time.sleep(interval)
+        finally:
+            self._running.release()
+        return "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+
+
+class MemoryTracer:
+    """tracemalloc snapshots with a bounded history for diffing."""
+
+    def __init__(self, history: int = 5):
+        self.snapshots: Deque[tracemalloc.Snapshot] = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def start(self, frames: int = 10) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, min(frames, 50)))
+
+    def stop(self) -> None:
+        with self._lock:
+            self.snapshots.clear()
+        tracemalloc.stop()
+
+    def snapshot(self, limit: int = 25) -> List[Dict[str, Any]]:
+        """Take a snapshot and return the call sites owning the most memory."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+        snap = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        with self._lock:
+            self.snapshots.append(snap)
+        return [
+            {
+                "traceback": stat.traceback.format(),
+                "size": stat.size,
+                "count": stat.count,
+            }
+            for stat in snap.statistics("traceback")[:limit]
+        ]
+
+    def diff(self, limit: int = 25) -> List[Dict[str, Any]]:
+        """Compare the two most recent snapshots, largest growth first."""
+        with self._lock:
+            if len(self.snapshots) < 2:
+                raise RuntimeError("At least two snapshots are required")
+            old, new = self.snapshots[-2], self.snapshots[-1]
+        return [
+            {
+                "traceback": stat.traceback.format(),
+                "size_diff": stat.size_diff,
+                "size": stat.size,
+                "count_diff": stat.count_diff,
+            }
+            for stat in new.compare_to(old, "traceback")[:limit]
+        ]
+
+
+class RequestProfiles:
+    """Recent per-request cProfile results, keyed by request ID."""
+
+    def __init__(self, maxlen: int = 20):
+        self._results: Dict[str, str] = {}
+        self._order: Deque[str] = deque()
+        self.maxlen = maxlen
+        self._lock = threading.Lock()
+
+    def start(self) -> Optional[cProfile.Profile]:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this process
+            return None
+        return profiler
+
+    def finish(
+        self, key: str, profiler: cProfile.Profile, sort: str = "cumulative"
+    ) -> None:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(50)
+        with self._lock:
+            if key not in self._results:
+                self._order.append(key)
+            self._results[key] = out.getvalue()
+            while len(self._order) > self.maxlen:
+                del self._results[self._order.popleft()]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._results.get(key)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._order)
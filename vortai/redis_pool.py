@@ -0,0 +1,206 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Shared Redis client for the Vortai server.
+One bounded, instrumented connection pool per URL and process, with
+socket timeouts, health checks and a circuit breaker that makes callers
+skip Redis quickly while it is failing.
+"""
+
+import os
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from .metrics import metrics
+
+try:
+    import redis
+    from redis.connection import (
+        BlockingConnectionPool,
+        Connection,
+        SSLConnection,
+        UnixDomainSocketConnection,
+    )
+except ImportError:
+    redis = None
+
+
+class Health:
+    """Circuit breaker for one Redis server.
+
+    A connection or timeout error marks the server down for ``cooldown``
+    seconds. Meanwhile commands fail at once instead of waiting on a
+    socket; the first command after the cooldown is the trial.
+    """
+
+    def __init__(self, cooldown: float = 5.0):
+        self.cooldown = cooldown
+        self.down_until = 0.0
+
+    def ok(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def failed(self) -> None:
+        if self.ok():
+            metrics.inc("redis.tripped")
+        self.down_until = time.monotonic() + self.cooldown
+
+
+if redis is not None:
+
+    class _HealthTracking:
+        """Connection mixin reporting network failures to the pool's breaker."""
+
+        health: Optional[Health] = None
+
+        def connect(self, *args: Any, **kwargs: Any) -> None:
+            try:
+                super().connect(*args, **kwargs)  # type: ignore[misc]
+            except (redis.ConnectionError, redis.TimeoutError):
+                if self.health is not None:
+                    self.health.failed()
+                raise
+
+        def read_response(self, *args: Any, **kwargs: Any) -> Any:
+            try:
+                return super().read_response(*args, **kwargs)  # type: ignore[misc]
+            except (redis.ConnectionError, redis.TimeoutError):
+                if self.health is not None:
+                    self.health.failed()
+                raise
+
+    class _TrackedConnection(_HealthTracking, Connection):
+        pass
+
+    class _TrackedSSLConnection(_HealthTracking, SSLConnection):
+        pass
+
+    class _TrackedUnixConnection(_HealthTracking, UnixDomainSocketConnection):
+        pass
+
+    _CONNECTION_CLASSES = {
+        "redis": _TrackedConnection,
+        "rediss": _TrackedSSLConnection,
+        "unix": _TrackedUnixConnection,
+    }
+
+    class InstrumentedPool(BlockingConnectionPool):
+        """Blocking pool that times waits, counts use and honours the breaker."""
+
+        def __init__(self, health: Optional[Health] = None, **kwargs: Any):
+            super().__init__(**kwargs)
+            self.health = health or Health()
+            self.in_use = 0
+            self._stats_lock = threading.Lock()
+
+        def get_connection(self, *args: Any, **kwargs: Any):
+            if not self.health.ok():
+                metrics.inc("redis.short_circuited")
+                raise redis.ConnectionError("Redis is marked unhealthy")
+            start = time.monotonic()
+            try:
+                connection = super().get_connection(*args, **kwargs)
+            except redis.ConnectionError:
+                metrics.inc("redis.pool.errors")
+                raise
+            finally:
+                metrics.observe("redis.pool.wait", time.monotonic() - start)
+            with self._stats_lock:
+                self.in_use += 1
+            return connection
+
+        def make_connection(self):
+            connection = super().make_connection()
+            connection.health = self.health
+            return connection
+
+        def release(self, connection) -> None:
+            super().release(connection)
+            with self._stats_lock:
+                self.in_use = max(0, self.in_use - 1)
+
+        def stats(self, label: str) -> Dict[str, float]:
+            labels = f"{{server={label}}}"
+            return {
+                f"redis.pool.in_use{labels}": self.in_use,
+                f"redis.pool.max{labels}": self.max_connections,
+                f"redis.healthy{labels}": float(self.health.ok()),
+            }
+
+
+def _float_env(name: str, default: float) -> float:
+    return float(os.environ.get(name, str(default)))
+
+
+_lock = threading.Lock()
+_clients: Dict[str, Any] = {}
+_pools: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+
+
+def get_client(url: Optional[str] = None):
+    """The shared client for ``url`` (default REDIS_URL), or None.
+
+    Returns None when no URL is configured or redis-py is missing, so
+    callers keep their local, in-memory behaviour. Tuned by
+    REDIS_SOCKET_TIMEOUT, REDIS_CONNECT_TIMEOUT, REDIS_HEALTH_CHECK_INTERVAL,
+    REDIS_MAX_CONNECTIONS, REDIS_POOL_TIMEOUT and REDIS_COOLDOWN.
+    """
+    url = url or os.environ.get("REDIS_URL")
+    if not url or redis is None:
+        return None
+    with _lock:
+        client = _clients.get(url)
+        if client is None:
+            parsed = urlparse(url)
+            pool = InstrumentedPool.from_url(
+                url,
+                health=Health(_float_env("REDIS_COOLDOWN", 5.0)),
+                connection_class=_CONNECTION_CLASSES.get(
+                    parsed.scheme, _TrackedConnection
+                ),
+                max_connections=int(os.environ.get("REDIS_MAX_CONNECTIONS", "64")),
+                # How long a command waits for a free pooled connection
+                timeout=_float_env("REDIS_POOL_TIMEOUT", 0.1),
+                socket_timeout=_float_env("REDIS_SOCKET_TIMEOUT", 1.0),
+                socket_connect_timeout=_float_env("REDIS_CONNECT_TIMEOUT", 0.5),
+                socket_keepalive=True,
+                health_check_interval=int(
+                    os.environ.get("REDIS_HEALTH_CHECK_INTERVAL", "15")
+                ),
+            )
+            client = _clients[url] = redis.Redis(connection_pool=pool)
+            # Never expose credentials in metric labels
+            _pools[parsed.hostname or parsed.path or "redis"] = pool
+        return client
+
+
+def healthy(client: Any) -> bool:
+    """Whether ``client`` is worth trying; clients from elsewhere always are."""
+    health = getattr(getattr(client, "connection_pool", None), "health", None)
+    return health is None or health.ok()
+
+
+def pool_stats() -> Dict[str, float]:
+    stats: Dict[str, float] = {}
+    for label, pool in list(_pools.items()):
+        stats.update(pool.stats(label))
+    return stats
+
+
+def _reset_after_fork() -> None:
+    # redis-py pools notice the new PID and drop inherited sockets on
+    # their own; only our bookkeeping needs resetting
+    global _lock
+    _lock = threading.Lock()
+    for pool in list(_pools.values()):
+        pool.in_use = 0
+        pool._stats_lock = threading.Lock()
+
+
+metrics.register_collector(pool_stats)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
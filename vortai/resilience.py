@@ -0,0 +1,275 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Resilience helpers for upstream Gemini calls.
+Per-request deadlines, jittered retries under a global retry budget,
+and optional hedged requests.
+"""
+
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+import httpx
+from google.genai import errors
+
+T = TypeVar("T")
+
+DEFAULT_TIMEOUT = 60.0  # seconds, used when no request deadline is set
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "vortai_deadline", default=None
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request runs past its deadline."""
+
+
+def set_deadline(seconds: float) -> contextvars.Token:
+    """Set the deadline for the current request, keeping any earlier one."""
+    expires_at = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        expires_at = min(expires_at, current)
+    return _deadline.set(expires_at)
+
+
+def reset_deadline(token: contextvars.Token) -> None:
+    _deadline.reset(token)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Run a block with a deadline ``seconds`` from now."""
+    token = set_deadline(seconds)
+    try:
+        yield
+    finally:
+        reset_deadline(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None if there is none."""
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
+
+
+def time_left(default: float = DEFAULT_TIMEOUT) -> float:
+    """Seconds left for an upstream call; raise if the deadline has passed."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left
+
+
+def http_options(default: float = DEFAULT_TIMEOUT) -> Dict[str, int]:
+    """google-genai ``http_options`` carrying the remaining deadline."""
+    return {"timeout": max(1, int(time_left(default) * 1000))}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether an upstream error is transient (429, 5xx or transport)."""
+    if isinstance(exc, errors.APIError):
+        return exc.code == 429 or exc.code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+class RetryBudget:
+    """Token bucket limiting retries to a fraction of regular traffic.
+
+    Every call deposits ``ratio`` tokens and every retry or hedge spends
+    one, with a small time-based reserve so low traffic can still retry.
+    """
+
+    def __init__(
+        self, ratio: float = 0.2, min_per_second: float = 0.5, max_tokens: float = 20
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.max_tokens,
+            self._tokens + (now - self._updated) * self.min_per_second,
+        )
+        self._updated = now
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class LatencyTracker:
+    """Rolling window of call latencies per model."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(model)
+            if samples is None:
+                samples = self._samples[model] = deque(maxlen=self._window)
+            samples.append(seconds)
+
+    def percentile(self, model: str, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def p95(self, model: str) -> Optional[float]:
+        return self.percentile(model, 0.95)
+
+
+# Shared across all callers in the process so retries stay globally bounded
+RETRY_BUDGET = RetryBudget()
+LATENCY = LatencyTracker()
+
+
+class UpstreamCaller:
+    """Run upstream calls inside the request deadline.
+
+    ``fn`` receives the per-attempt timeout in seconds. Transient errors are
+    retried with full-jitter exponential backoff while the retry budget
+    allows it. With hedging enabled, a duplicate attempt is started once
+    the primary has run longer than the model's p95 latency, and the
+    first successful answer wins.
+    """
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        default_timeout: float = DEFAULT_TIMEOUT,
+        hedging: bool = False,
+        budget: Optional[RetryBudget] = None,
+        latency: Optional[LatencyTracker] = None,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.default_timeout = default_timeout
+        self.hedging = hedging
+        self.budget = budget or RETRY_BUDGET
+        self.latency = latency or LATENCY
+
+    @classmethod
+    def from_env(cls) -> "UpstreamCaller":
+        return cls(
+            max_attempts=int(os.environ.get("GEMINI_MAX_ATTEMPTS", "3")),
+            default_timeout=float(
+                os.environ.get("GEMINI_TIMEOUT", str(DEFAULT_TIMEOUT))
+            ),
+            hedging=os.environ.get("GEMINI_HEDGING", "").lower() in ("1", "true"),
+        )
+
+    @classmethod
+    def _pool(cls) -> ThreadPoolExecutor:
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=16, thread_name_prefix="vortai-hedge"
+                )
+            return cls._executor
+
+    def call(self, fn: Callable[[float], T], model: str) -> T:
+        self.budget.deposit()
+        for attempt in range(self.max_attempts):
+            timeout = time_left(self.default_timeout)
+            try:
+                return self._attempt(fn, model, timeout)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if (
+                    not is_retryable(e)
+                    or attempt == self.max_attempts - 1
+                    or not self.budget.try_spend()
+                ):
+                    raise
+                delay = random.uniform(
+                    0, min(self.max_delay, self.base_delay * 2**attempt)
+                )
+                left = remaining()
+                if left is not None and delay >= left:
+                    raise
+                time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def _timed(self, fn: Callable[[float], T], model: str, timeout: float) -> T:
+        start = time.monotonic()
+        result = fn(timeout)
+        self.latency.record(model, time.monotonic() - start)
+        return result
+
+    def _attempt(self, fn: Callable[[float], T], model: str, timeout: float) -> T:
+        hedge_delay = self.latency.p95(model) if self.hedging else None
+        if hedge_delay is None or hedge_delay >= timeout:
+            return self._timed(fn, model, timeout)
+
+        pool = self._pool()
+        start = time.monotonic()
+        pending = {pool.submit(self._timed, fn, model, timeout)}
+        done, pending = wait(pending, timeout=hedge_delay)
+        if not done and self.budget.try_spend():
+            left = timeout - (time.monotonic() - start)
+            pending.add(pool.submit(self._timed, fn, model, left))
+        error: Optional[BaseException] = None
+        while True:
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            if not pending:
+                break
+            left = timeout - (time.monotonic() - start)
+            if left <= 0:
+                raise DeadlineExceeded("Upstream call timed out")
+            done, pending = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
+        assert error is not None
+        raise error
+
+
+def _reset_after_fork() -> None:
+    # Executor threads do not survive fork; the child builds its own pool
+    UpstreamCaller._executor = None
+    UpstreamCaller._executor_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -4,13 +4,29 @@
 # This module defines the API routes for the Gemini AI Search application,
 # including text generation, thinking mode, URL context, TTS, and image generation.
 
-from flask import Blueprint, request, jsonify, send_file, after_this_request, Response
+from flask import (
+    Blueprint,
+    request,
+    jsonify,
+    send_file,
+    Response,
+    g,
+)
 import os
-import tempfile
+import re
+import hmac
+import json
+import time
 import mimetypes
 import logging
-from typing import Any, cast, Dict, Tuple, Union
+from typing import Any, cast, Dict, Optional, Tuple, Union
+from .. import cdn, log, spool
+from ..prompts import collapse_whitespace
 from ..sdk import GeminiAI
+from ..resilience import DeadlineExceeded, reset_deadline, set_deadline
+from ..sessions import SessionNotFound
+from ..metrics import metrics
+from ..image_jobs import DONE, FAILED, PENDING, ImageJobs, QueueFull
 
 
 def is_safe_path(base_path: str, target_path: str) -> bool:
@@ -25,13 +41,58 @@ def is_safe_path(base_path: str, target_path: str) -> bool:
 
 ai = GeminiAI()
 api_bp = Blueprint("api", __name__)
+logger = logging.getLogger(__name__)
 
-# Create directories for temporary files
-TEMP_AUDIO_DIR = os.path.join(tempfile.gettempdir(), "gemini_tts")
-os.makedirs(TEMP_AUDIO_DIR, exist_ok=True)
+# Background image generation for async requests, shared through Redis
+image_jobs = ImageJobs.from_env(ai, ai.cache.redis)
+metrics.register_collector(image_jobs.gauges)
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+# An event stream ends after this many seconds and the browser reconnects
+EVENTS_WINDOW = 25.0
 
-TEMP_IMAGE_DIR = os.path.join(tempfile.gettempdir(), "vortai_images")
-os.makedirs(TEMP_IMAGE_DIR, exist_ok=True)
+
+def events_supported() -> bool:
+    """Whether requests run on gevent, where an open stream holds no thread.
+
+    On thread-per-request workers a stream would tie up a worker thread
+    for the whole generation, so clients poll instead.
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("threading")
+
+
+# Bounded spools for generated files; creating them sweeps leftovers
+TEMP_AUDIO_DIR = spool.audio().directory
+TEMP_IMAGE_DIR = spool.images().directory
+
+# Per-request deadlines in seconds; clients may ask for less via X-Request-Timeout
+REQUEST_TIMEOUT = float(os.environ.get("REQUEST_TIMEOUT", "60"))
+ENDPOINT_TIMEOUTS = {"api.research_topic": 330.0}
+
+
+def request_timeout() -> float:
+    """Deadline in seconds for the current request."""
+    timeout = ENDPOINT_TIMEOUTS.get(request.endpoint or "", REQUEST_TIMEOUT)
+    try:
+        requested = float(request.headers.get("X-Request-Timeout", timeout))
+    except ValueError:
+        requested = timeout
+    return max(0.1, min(requested, timeout))
+
+
+@api_bp.before_request
+def start_deadline() -> None:
+    g.deadline_token = set_deadline(request_timeout())
+
+
+@api_bp.teardown_request
+def clear_deadline(exc) -> None:
+    token = g.pop("deadline_token", None)
+    if token is not None:
+        reset_deadline(token)
 
 
 @api_bp.route("/api/generate", methods=["POST"])
@@ -49,8 +110,10 @@ def generate_response() -> Union[Response, Tuple[Response, int]]:
         response = ai.generate_text(prompt)
         return jsonify({"response": response})
 
+    except DeadlineExceeded:
+        return jsonify({"error": "Request timed out"}), 504
     except Exception as e:
-        logging.error(f"Error in generate_response: {e}")
+        logger.error("Error in generate_response: %s", e)
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -69,8 +132,10 @@ def generate_response_with_thinking() -> Union[Response, Tuple[Response, int]]:
         result = ai.generate_text_with_thinking(prompt)
         return jsonify(result)
 
+    except DeadlineExceeded:
+        return jsonify({"error": "Request timed out"}), 504
     except Exception as e:
-        logging.error(f"Error in generate_response_with_thinking: {e}")
+        logger.error("Error in generate_response_with_thinking: %s", e)
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -89,14 +154,15 @@ def generate_response_with_url_context() -> Union[Response, Tuple[Response, int]
         response = ai.generate_text_with_url_context(prompt)
         return jsonify({"response": response})
 
+    except DeadlineExceeded:
+        return jsonify({"error": "Request timed out"}), 504
     except Exception as e:
-        logging.error(f"Error in generate_response_with_url_context: {e}")
+        logger.error("Error in generate_response_with_url_context: %s", e)
         return jsonify({"error": "Internal server error"}), 500
 
 
 @api_bp.route("/api/text-to-speech", methods=["POST"])
 def text_to_speech() -> Union[Response, Tuple[Response, int]]:
-    filepath = None
     try:
         data = cast(Dict[str, Any], request.get_json() or {})
         text = data.get("text", "").strip()
@@ -108,41 +174,15 @@ def text_to_speech() -> Union[Response, Tuple[Response, int]]:
             return jsonify({"error": "Text too long (max 1000 chars)"}), 400
 
         filepath = ai.text_to_speech(text)
-
-        # Prevent path traversal
-        if not is_safe_path(TEMP_AUDIO_DIR, filepath):
-            try:
-                os.unlink(filepath)
-            except OSError:
-                pass
-            return jsonify({"error": "Invalid file path"}), 400
-
-        @after_this_request
-        def cleanup(response):
-            try:
-                os.unlink(filepath)
-            except OSError:
-                pass
-            return response
-
-        filename = os.path.basename(filepath)
-        return send_file(
-            filepath, mimetype="audio/mp3", as_attachment=True, download_name=filename
-        )
+        return _send_audio(filepath)
 
     except Exception as e:
-        logging.error(f"Error in text_to_speech: {e}")
-        if filepath is not None:
-            try:
-                os.unlink(filepath)
-            except OSError:
-                pass
+        logger.error("Error in text_to_speech: %s", e)
         return jsonify({"error": "Internal server error"}), 500
 
 
 @api_bp.route("/api/generate-image", methods=["POST"])
 def generate_image() -> Union[Response, Tuple[Response, int]]:
-    filepath = None
     try:
         data = cast(Dict[str, Any], request.get_json() or {})
         prompt = data.get("prompt", "").strip()
@@ -153,41 +193,281 @@ def generate_image() -> Union[Response, Tuple[Response, int]]:
         if len(prompt) > 5000:
             return jsonify({"error": "Prompt too long (max 5000 chars)"}), 400
 
+        # Async mode: answer now with a placeholder, generate in the background
+        if data.get("async") is True or "respond-async" in request.headers.get(
+            "Prefer", ""
+        ):
+            job = image_jobs.submit(prompt)
+            response = jsonify(_job_json(job))
+            response.status_code = 202
+            response.headers["Location"] = f"/api/images/jobs/{job['id']}"
+            return response
+
         filepath = ai.generate_image(prompt)
+        return _send_image(filepath)
 
-        # Prevent path traversal
-        if not is_safe_path(TEMP_IMAGE_DIR, filepath):
-            try:
-                os.unlink(filepath)
-            except OSError:
-                pass
-            return jsonify({"error": "Invalid file path"}), 400
-
-        @after_this_request
-        def cleanup(response):
-            try:
-                os.unlink(filepath)
-            except OSError:
-                pass
-            return response
+    except QueueFull:
+        return (
+            jsonify({"error": "Too many image jobs in progress"}),
+            503,
+            {"Retry-After": "5"},
+        )
+    except DeadlineExceeded:
+        return jsonify({"error": "Request timed out"}), 504
+    except Exception as e:
+        logger.error("Error in generate_image: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+
+def _send_generated_file(
+    filepath: str, base_dir: str, **kwargs: Any
+) -> Union[Response, Tuple[Response, int]]:
+    """Send a spooled file; the spool evicts it later, so repeats can reuse it."""
+    # Prevent path traversal
+    if not is_safe_path(base_dir, filepath):
+        return jsonify({"error": "Invalid file path"}), 400
+    return send_file(filepath, **kwargs)
+
+
+def _send_audio(filepath: str) -> Union[Response, Tuple[Response, int]]:
+    return _send_generated_file(
+        filepath,
+        TEMP_AUDIO_DIR,
+        mimetype="audio/mp3",
+        as_attachment=True,
+        download_name=os.path.basename(filepath),
+    )
+
+
+def _send_image(filepath: str) -> Union[Response, Tuple[Response, int]]:
+    # Detect mime type
+    mime_type, _ = mimetypes.guess_type(filepath)
+    if not mime_type:
+        mime_type = "image/png"
+    return _send_generated_file(filepath, TEMP_IMAGE_DIR, mimetype=mime_type)
+
+
+# Cacheable GET variants. Their URLs carry the canonical prompt and an
+# HMAC (see vortai.cdn) and are advertised in the Content-Location header
+# of the matching POST responses, so CDNs can serve repeats.
+CACHEABLE_POSTS = {
+    "api.generate_response": ("text", "prompt"),
+    "api.text_to_speech": ("tts", "text"),
+    "api.generate_image": ("image", "prompt"),
+}
+CACHEABLE_GETS = {
+    "api.generate_response_cached": "text",
+    "api.text_to_speech_cached": "tts",
+    "api.generate_image_cached": "image",
+}
+
+# Opt-in: add the canonical prompt of cacheable requests to the access log,
+# which is what `vortai prewarm` reads. Prompts may hold personal data.
+LOG_PROMPTS = os.environ.get("LOG_PROMPTS", "").lower() in ("1", "true")
+
+
+def _canonical(mode: str, value: str) -> str:
+    # Speech keeps its punctuation, which changes how it is read out
+    return collapse_whitespace(value) if mode == "tts" else ai.canonicalizer(value)
+
+
+def _signed_query(
+    mode: str, max_length: int
+) -> Tuple[Optional[str], Optional[Tuple[Response, int]]]:
+    """The canonical prompt of a signed GET, or an error response."""
+    key = cdn.signing_key()
+    if key is None:
+        return None, (jsonify({"error": "Not found"}), 404)
+    prompt = request.args.get("q", "")
+    if not prompt:
+        return None, (jsonify({"error": "No prompt provided"}), 400)
+    if len(prompt) > max_length:
+        return None, (
+            jsonify({"error": f"Prompt too long (max {max_length} chars)"}),
+            400,
+        )
+    if not cdn.verify(mode, prompt, request.args.get("sig", ""), key):
+        return None, (jsonify({"error": "Invalid signature"}), 403)
+    return prompt, None
+
+
+@api_bp.route("/api/generate", methods=["GET"])
+def generate_response_cached() -> Union[Response, Tuple[Response, int]]:
+    prompt, error = _signed_query("text", 5000)
+    if error is not None:
+        return error
+    try:
+        response = ai.generate_text(cast(str, prompt))
+        return jsonify({"response": response})
+
+    except DeadlineExceeded:
+        return jsonify({"error": "Request timed out"}), 504
+    except Exception as e:
+        logger.error("Error in generate_response_cached: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
 
-        # Detect mime type
-        mime_type, _ = mimetypes.guess_type(filepath)
-        if not mime_type:
-            mime_type = "image/png"
 
-        return send_file(filepath, mimetype=mime_type)
+@api_bp.route("/api/text-to-speech", methods=["GET"])
+def text_to_speech_cached() -> Union[Response, Tuple[Response, int]]:
+    text, error = _signed_query("tts", 1000)
+    if error is not None:
+        return error
+    try:
+        filepath = ai.text_to_speech(cast(str, text))
+        return _send_audio(filepath)
 
     except Exception as e:
-        logging.error(f"Error in generate_image: {e}")
-        if filepath is not None:
-            try:
-                os.unlink(filepath)
-            except OSError:
-                pass
+        logger.error("Error in text_to_speech_cached: %s", e)
         return jsonify({"error": "Internal server error"}), 500
 
 
+@api_bp.route("/api/generate-image", methods=["GET"])
+def generate_image_cached() -> Union[Response, Tuple[Response, int]]:
+    prompt, error = _signed_query("image", 5000)
+    if error is not None:
+        return error
+    try:
+        filepath = ai.generate_image(cast(str, prompt))
+        return _send_image(filepath)
+
+    except DeadlineExceeded:
+        return jsonify({"error": "Request timed out"}), 504
+    except Exception as e:
+        logger.error("Error in generate_image_cached: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@api_bp.after_request
+def add_cache_headers(response: Response) -> Response:
+    if request.endpoint in CACHEABLE_GETS:
+        if response.status_code != 200:
+            # Errors (including timeouts) must never be shared
+            response.headers["Cache-Control"] = "no-store"
+            return response
+        response.headers.update(cdn.cache_headers())
+        if not response.direct_passthrough:
+            # Weak, since Compression may re-encode the body afterwards
+            response.add_etag(weak=True)
+        return response.make_conditional(request)
+    cacheable = CACHEABLE_POSTS.get(request.endpoint or "")
+    key = cdn.signing_key()
+    if cacheable is None or key is None or response.status_code != 200:
+        return response
+    mode, field = cacheable
+    data = request.get_json(silent=True) or {}
+    value = data.get(field)
+    if isinstance(value, str) and value.strip():
+        canonical = _canonical(mode, value)
+        response.headers["Content-Location"] = cdn.url_for(mode, canonical, key)
+    return response
+
+
+@api_bp.after_request
+def log_prompt(response: Response) -> Response:
+    if not LOG_PROMPTS or response.status_code != 200:
+        return response
+    endpoint = request.endpoint or ""
+    if endpoint in CACHEABLE_GETS:
+        # Signed GET queries are canonical already
+        log.bind(mode=CACHEABLE_GETS[endpoint], prompt=request.args.get("q"))
+    elif endpoint in CACHEABLE_POSTS:
+        mode, field = CACHEABLE_POSTS[endpoint]
+        value = (request.get_json(silent=True) or {}).get(field)
+        if isinstance(value, str) and value.strip():
+            log.bind(mode=mode, prompt=_canonical(mode, value))
+    return response
+
+
+def _job_json(job: Dict[str, Any]) -> Dict[str, Any]:
+    result = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "placeholder": job["placeholder"],
+        "status_url": f"/api/images/jobs/{job['id']}",
+    }
+    if events_supported():
+        result["events_url"] = f"/api/images/jobs/{job['id']}/events"
+    if job["status"] == DONE:
+        result["image_url"] = f"/api/images/{job['id']}"
+    elif job["status"] == FAILED:
+        result["error"] = job.get("error", "Image generation failed")
+    return result
+
+
+def _find_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return image_jobs.get(job_id) if _JOB_ID.match(job_id) else None
+
+
+@api_bp.route("/api/images/jobs/<job_id>", methods=["GET"])
+def image_job_status(job_id: str) -> Union[Response, Tuple[Response, int]]:
+    job = _find_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    response = jsonify(_job_json(job))
+    if job["status"] == PENDING:
+        response.headers["Retry-After"] = "1"
+    elif job["status"] == DONE and request.args.get("redirect") != "0":
+        # Pollers that follow redirects land on the finished image
+        response.status_code = 303
+        response.headers["Location"] = f"/api/images/{job_id}"
+    return response
+
+
+@api_bp.route("/api/images/jobs/<job_id>/events", methods=["GET"])
+def image_job_events(job_id: str) -> Union[Response, Tuple[Response, int]]:
+    if not events_supported():
+        return (
+            jsonify({"error": "Event streams need gevent workers; poll status_url"}),
+            404,
+        )
+    if _find_job(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        give_up = time.monotonic() + EVENTS_WINDOW
+        last_status, last_sent = None, time.monotonic()
+        yield "retry: 1000\n\n"
+        while time.monotonic() < give_up:
+            job = image_jobs.get(job_id)
+            if job is None:
+                return
+            if job["status"] != last_status:
+                last_status, last_sent = job["status"], time.monotonic()
+                yield f"event: {job['status']}\ndata: {json.dumps(_job_json(job))}\n\n"
+                if job["status"] != PENDING:
+                    return
+            elif time.monotonic() - last_sent > 15:
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+            time.sleep(0.5)
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@api_bp.route("/api/images/<job_id>", methods=["GET"])
+def image_job_result(job_id: str) -> Union[Response, Tuple[Response, int]]:
+    job = _find_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] == PENDING:
+        return jsonify(_job_json(job)), 202, {"Retry-After": "1"}
+    if job["status"] != DONE:
+        return jsonify({"error": "Image generation failed"}), 500
+    image = image_jobs.image(job_id)
+    if image is None:
+        return jsonify({"error": "Image no longer available"}), 404
+    response = Response(image, mimetype=job.get("mimetype", "image/png"))
+    # A job's image never changes
+    response.headers["Cache-Control"] = (
+        f"public, max-age={image_jobs.store.ttl}, immutable"
+    )
+    return response
+
+
 @api_bp.route("/api/process-text-go", methods=["POST"])
 def process_text_go() -> Union[Response, Tuple[Response, int]]:
     try:
@@ -204,7 +484,7 @@ def process_text_go() -> Union[Response, Tuple[Response, int]]:
         return jsonify({"processed_text": processed_text})
 
     except Exception as e:
-        logging.error(f"Error in process_text_go: {e}")
+        logger.error("Error in process_text_go: %s", e)
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -234,6 +514,88 @@ def research_topic() -> Union[Response, Tuple[Response, int]]:
             return jsonify({"error": "Request timed out"}), 408
         else:
             return jsonify({"error": "Bad request"}), 400
+    except DeadlineExceeded:
+        return jsonify({"error": "Request timed out"}), 504
+    except Exception as e:
+        logger.error("Error in research_topic: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@api_bp.route("/api/research/search", methods=["GET"])
+def search_research() -> Union[Response, Tuple[Response, int]]:
+    try:
+        query = request.args.get("q", "").strip()
+
+        if not query:
+            return jsonify({"error": "No query provided"}), 400
+
+        if len(query) > 500:
+            return jsonify({"error": "Query too long (max 500 chars)"}), 400
+
+        try:
+            limit = min(max(int(request.args.get("limit", 10)), 1), 50)
+        except ValueError:
+            return jsonify({"error": "Invalid limit"}), 400
+
+        results = ai.search_research(query, limit)
+        return jsonify({"results": results})
+
     except Exception as e:
-        logging.error(f"Error in research_topic: {e}")
+        logger.error("Error in search_research: %s", e)
         return jsonify({"error": "Internal server error"}), 500
+
+
+@api_bp.route("/api/sessions", methods=["POST"])
+def create_session() -> Union[Response, Tuple[Response, int]]:
+    try:
+        data = cast(Dict[str, Any], request.get_json(silent=True) or {})
+        system_instruction = (data.get("system_instruction") or "").strip()
+
+        if len(system_instruction) > 5000:
+            return (
+                jsonify({"error": "System instruction too long (max 5000 chars)"}),
+                400,
+            )
+
+        session_id = ai.create_session(system_instruction or None)
+        return jsonify({"session_id": session_id}), 201
+
+    except Exception as e:
+        logger.error("Error in create_session: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@api_bp.route("/api/sessions/<session_id>/messages", methods=["POST"])
+def send_session_message(session_id: str) -> Union[Response, Tuple[Response, int]]:
+    try:
+        data = cast(Dict[str, Any], request.get_json() or {})
+        message = data.get("message", "").strip()
+
+        if not message:
+            return jsonify({"error": "No message provided"}), 400
+
+        if len(message) > 5000:
+            return jsonify({"error": "Message too long (max 5000 chars)"}), 400
+
+        response = ai.send_message(session_id, message)
+        return jsonify({"response": response})
+
+    except SessionNotFound:
+        return jsonify({"error": "Session not found"}), 404
+    except DeadlineExceeded:
+        return jsonify({"error": "Request timed out"}), 504
+    except Exception as e:
+        logger.error("Error in send_session_message: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@api_bp.route("/api/metrics", methods=["GET"])
+def get_metrics() -> Union[Response, Tuple[Response, int]]:
+    # Key suffixes and Redis details are not public: off unless a token is set
+    token = os.environ.get("METRICS_TOKEN")
+    if not token:
+        return jsonify({"error": "Not found"}), 404
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(supplied, token):
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(metrics.snapshot())
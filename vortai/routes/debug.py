@@ -0,0 +1,109 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+#
+# This module defines the admin-only debug routes: a statistical stack
+# sampler, tracemalloc snapshots and diffs, and per-request cProfile results.
+# It is only registered when DEBUG_TOKEN is set.
+
+import hmac
+import os
+import uuid
+from typing import Optional, Tuple, Union
+
+from flask import Blueprint, Flask, Response, g, jsonify, request
+
+from .. import log
+from ..profiling import MemoryTracer, RequestProfiles, StackSampler
+
+debug_bp = Blueprint("debug", __name__, url_prefix="/debug")
+
+sampler = StackSampler()
+tracer = MemoryTracer()
+profiles = RequestProfiles()
+
+
+def _authorized(supplied: str) -> bool:
+    token = os.environ.get("DEBUG_TOKEN")
+    return bool(token) and hmac.compare_digest(supplied, token)
+
+
+@debug_bp.before_request
+def require_token() -> Optional[Tuple[Response, int]]:
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not _authorized(supplied):
+        return jsonify({"error": "Unauthorized"}), 401
+    return None
+
+
+@debug_bp.route("/profile", methods=["GET"])
+def sample_stacks() -> Union[Response, Tuple[Response, int]]:
+    """Sample all threads and return collapsed stacks for a flamegraph."""
+    seconds = request.args.get("seconds", 5.0, type=float)
+    interval = request.args.get("interval", 0.005, type=float)
+    stacks = sampler.sample(seconds, interval)
+    if stacks is None:
+        return jsonify({"error": "Profiler already running"}), 409
+    return Response(stacks, mimetype="text/plain")
+
+
+@debug_bp.route("/tracemalloc/start", methods=["POST"])
+def start_tracemalloc() -> Response:
+    tracer.start(request.args.get("frames", 10, type=int))
+    return jsonify({"tracing": True})
+
+
+@debug_bp.route("/tracemalloc/stop", methods=["POST"])
+def stop_tracemalloc() -> Response:
+    tracer.stop()
+    return jsonify({"tracing": False})
+
+
+@debug_bp.route("/tracemalloc/snapshot", methods=["POST"])
+def take_snapshot() -> Union[Response, Tuple[Response, int]]:
+    try:
+        stats = tracer.snapshot(request.args.get("limit", 25, type=int))
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({"top": stats})
+
+
+@debug_bp.route("/tracemalloc/diff", methods=["GET"])
+def snapshot_diff() -> Union[Response, Tuple[Response, int]]:
+    try:
+        stats = tracer.diff(request.args.get("limit", 25, type=int))
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({"diff": stats})
+
+
+@debug_bp.route("/profiles", methods=["GET"])
+def list_profiles() -> Response:
+    return jsonify({"profiles": profiles.keys()})
+
+
+@debug_bp.route("/profiles/<profile_id>", methods=["GET"])
+def get_profile(profile_id: str) -> Union[Response, Tuple[Response, int]]:
+    result = profiles.get(profile_id)
+    if result is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return Response(result, mimetype="text/plain")
+
+
+def init_request_profiling(app: Flask) -> None:
+    """Profile any request sent with ``X-Debug-Profile: <DEBUG_TOKEN>``."""
+
+    @app.before_request
+    def start_profile() -> None:
+        supplied = request.headers.get("X-Debug-Profile")
+        if supplied and _authorized(supplied):
+            g.debug_profiler = profiles.start()
+
+    @app.after_request
+    def finish_profile(response: Response) -> Response:
+        profiler = g.pop("debug_profiler", None)
+        if profiler is not None:
+            # Streamed bodies are produced after this point and not included
+            profile_id = log.current_request_id() or uuid.uuid4().hex
+            profiles.finish(profile_id, profiler)
+            response.headers["X-Debug-Profile-Id"] = profile_id
+        return response
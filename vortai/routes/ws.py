@@ -0,0 +1,198 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+#
+# This module defines the /ws/chat WebSocket endpoint. One connection carries
+# many concurrent generations, multiplexed by client-chosen message IDs,
+# with replies streamed as they arrive and cancellable mid-flight.
+#
+# Client -> server:
+#   {"id": "1", "type": "generate", "prompt": "..."}
+#   {"id": "2", "type": "message", "session_id": "...", "message": "..."}
+#   {"id": "1", "type": "cancel"}
+# Server -> client:
+#   {"id": "1", "type": "chunk", "text": "..."}
+#   {"id": "1", "type": "done"} | {"id": "1", "type": "cancelled"}
+#   {"id": "1", "type": "error", "error": "..."}
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from flask import Flask, request
+
+from ..resilience import DeadlineExceeded, deadline
+from ..sessions import SessionNotFound
+from .api import REQUEST_TIMEOUT
+
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
+
+logger = logging.getLogger(__name__)
+
+# Rate limit costs, charged per message like the matching HTTP endpoints
+MESSAGE_ENDPOINTS = {
+    "generate": "api.generate_response",
+    "message": "api.send_session_message",
+}
+
+
+class ChatChannel:
+    """Multiplexes streamed generations over one WebSocket connection.
+
+    Each request runs on its own thread so a slow answer never blocks the
+    others. ``send`` is serialized, and cancelling (or closing the channel)
+    stops the upstream stream at the next chunk.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], None],
+        ai: Any,
+        limiter: Any = None,
+        client: str = "unknown",
+        max_in_flight: int = 4,
+        timeout: float = REQUEST_TIMEOUT,
+    ):
+        self._send = send
+        self.ai = ai
+        self.limiter = limiter
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self._in_flight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+
+    def send(self, message_id: Optional[str], kind: str, **fields: Any) -> None:
+        payload = json.dumps({"id": message_id, "type": kind, **fields})
+        with self._send_lock:
+            self._send(payload)
+
+    def handle(self, raw: str) -> None:
+        """Dispatch one message received from the client."""
+        try:
+            data = json.loads(raw)
+        except (TypeError, ValueError):
+            self.send(None, "error", error="Invalid JSON")
+            return
+        if not isinstance(data, dict):
+            self.send(None, "error", error="Invalid message")
+            return
+        message_id = data.get("id")
+        kind = data.get("type")
+        if not isinstance(message_id, str) or not message_id:
+            self.send(None, "error", error="Message id is required")
+            return
+        if kind == "cancel":
+            self.cancel(message_id)
+            return
+        if kind not in MESSAGE_ENDPOINTS:
+            self.send(message_id, "error", error="Unknown message type")
+            return
+        if self.limiter is not None:
+            cost = self.limiter.cost_for(MESSAGE_ENDPOINTS[kind])
+            if not self.limiter.hit(self.client, cost)[0]:
+                self.send(message_id, "error", error="Rate limit exceeded")
+                return
+        cancel = threading.Event()
+        with self._lock:
+            if message_id in self._in_flight:
+                error = "Duplicate message id"
+            elif len(self._in_flight) >= self.max_in_flight:
+                error = "Too many requests in flight"
+            else:
+                error = None
+                self._in_flight[message_id] = cancel
+        if error:
+            self.send(message_id, "error", error=error)
+            return
+        threading.Thread(
+            target=self._run,
+            args=(message_id, kind, data, cancel),
+            name=f"vortai-ws-{message_id}",
+            daemon=True,
+        ).start()
+
+    def cancel(self, message_id: str) -> None:
+        with self._lock:
+            cancel = self._in_flight.get(message_id)
+        if cancel is not None:
+            cancel.set()
+
+    def close(self) -> None:
+        """Cancel everything still running, e.g. when the client disconnects."""
+        with self._lock:
+            pending = list(self._in_flight.values())
+        for cancel in pending:
+            cancel.set()
+
+    def _stream(self, kind: str, data: Dict[str, Any], cancel) -> Iterator[str]:
+        if kind == "generate":
+            return self.ai.stream_text(data.get("prompt", ""), cancel)
+        return self.ai.stream_message(
+            data.get("session_id", ""), data.get("message", ""), cancel
+        )
+
+    def _run(self, message_id: str, kind: str, data: Dict[str, Any], cancel) -> None:
+        stream = None
+        error = None
+        try:
+            with deadline(self.timeout):
+                stream = self._stream(kind, data, cancel)
+                for text in stream:
+                    if cancel.is_set():
+                        break
+                    self.send(message_id, "chunk", text=text)
+            self.send(message_id, "cancelled" if cancel.is_set() else "done")
+        except SessionNotFound:
+            error = "Session not found"
+        except ValueError as e:
+            error = str(e)
+        except DeadlineExceeded:
+            error = "Request timed out"
+        except Exception as e:
+            if not cancel.is_set():
+                logger.error("Error in websocket chat: %s", e)
+                error = "Internal server error"
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+            with self._lock:
+                self._in_flight.pop(message_id, None)
+        if error and not cancel.is_set():
+            try:
+                self.send(message_id, "error", error=error)
+            except Exception as e:
+                # The client has gone away
+                logger.debug("Could not send websocket error: %s", e)
+
+
+def init_websocket(app: Flask, ai: Any) -> bool:
+    """Register /ws/chat if flask-sock is installed; returns whether it was."""
+    if Sock is None:
+        return False
+    sock = Sock(app)
+
+    @sock.route("/ws/chat")
+    def chat(ws) -> None:
+        channel = ChatChannel(
+            ws.send,
+            ai,
+            limiter=app.extensions.get("vortai_limiter"),
+            client=request.remote_addr or "unknown",
+            max_in_flight=int(os.environ.get("WS_MAX_IN_FLIGHT", "4")),
+        )
+        try:
+            while True:
+                raw = ws.receive()
+                if raw is None:
+                    break
+                channel.handle(raw)
+        finally:
+            channel.close()
+
+    return True
@@ -0,0 +1,184 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Latency- and health-aware model routing.
+Tracks rolling p95 latency and error rates per capability and model and
+sends each capability's traffic to the first candidate within its SLO.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Collection, Deque, Dict, Mapping, Optional, Sequence, Set, Tuple
+
+from google.genai import errors
+
+from . import models
+from .metrics import metrics
+from .resilience import DeadlineExceeded, is_retryable
+
+
+def counts_against_model(exc: BaseException, pooled_key: bool = False) -> bool:
+    """Whether a failure says something about the model's health.
+
+    A 429 on a key from the key pool is that key's quota, not the model's.
+    """
+    if pooled_key and isinstance(exc, errors.APIError) and exc.code == 429:
+        return False
+    return isinstance(exc, DeadlineExceeded) or is_retryable(exc)
+
+
+class ModelRouter:
+    """Choose the healthiest candidate model for each capability.
+
+    Outcomes are kept per (capability, model), since one model can be the
+    primary for one capability and the fallback for a slower one, and
+    outcomes older than ``window`` seconds are forgotten. A model with
+    fewer than ``min_samples`` recent outcomes counts as healthy, unless
+    it was failed over: then it stays out until a trial call succeeds.
+    ``trial_share`` of the traffic that skips an unhealthy candidate is
+    sent to it as such a trial, which is how it fails back.
+    """
+
+    def __init__(
+        self,
+        candidates: Optional[Mapping[str, Sequence[str]]] = None,
+        slos: Optional[Mapping[str, Mapping[str, float]]] = None,
+        window: float = 60.0,
+        min_samples: int = 10,
+        max_samples: int = 1000,
+        trial_share: float = 0.05,
+    ):
+        self.candidates = {
+            capability: tuple(names)
+            for capability, names in (candidates or models.MODEL_CANDIDATES).items()
+        }
+        self.slos = dict(slos or models.MODEL_SLOS)
+        self.window = window
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.trial_share = trial_share
+        # Per (capability, model): (timestamp, latency or None, succeeded)
+        self._outcomes: Dict[
+            Tuple[str, str], Deque[Tuple[float, Optional[float], bool]]
+        ] = {}
+        # Failed over and waiting for a successful trial
+        self._down: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        candidates = {}
+        for capability, names in models.MODEL_CANDIDATES.items():
+            override = os.environ.get(f"MODEL_CANDIDATES_{capability.upper()}")
+            if override:
+                names = tuple(n.strip() for n in override.split(",") if n.strip())
+            candidates[capability] = names
+        return cls(
+            candidates,
+            window=float(os.environ.get("MODEL_HEALTH_WINDOW", "60")),
+            trial_share=float(os.environ.get("MODEL_TRIAL_SHARE", "0.05")),
+        )
+
+    def record(
+        self, capability: str, model: str, seconds: Optional[float], ok: bool
+    ) -> None:
+        """Record one upstream call; ``seconds`` may be None if not timed."""
+        now = time.monotonic()
+        key = (capability, model)
+        with self._lock:
+            outcomes = self._outcomes.get(key)
+            if outcomes is None:
+                outcomes = self._outcomes[key] = deque(maxlen=self.max_samples)
+            outcomes.append((now, seconds, ok))
+            if ok:
+                self._down.discard(key)
+
+    def stats(self, capability: str, model: str) -> Dict[str, Optional[float]]:
+        """Recent sample count, error rate and p95 latency for ``model``."""
+        oldest = time.monotonic() - self.window
+        with self._lock:
+            outcomes = self._outcomes.get((capability, model))
+            if outcomes is None:
+                return {"samples": 0, "error_rate": None, "p95": None}
+            while outcomes and outcomes[0][0] < oldest:
+                outcomes.popleft()
+            recent = list(outcomes)
+        if not recent:
+            return {"samples": 0, "error_rate": None, "p95": None}
+        errors = sum(1 for _, _, ok in recent if not ok)
+        latencies = sorted(s for _, s, ok in recent if ok and s is not None)
+        p95 = None
+        if latencies:
+            p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        return {"samples": len(recent), "error_rate": errors / len(recent), "p95": p95}
+
+    def _score(self, capability: str, model: str) -> float:
+        """How far the model is from its SLO; at most 1.0 means within it."""
+        stats = self.stats(capability, model)
+        if stats["samples"] < self.min_samples:
+            return 0.0
+        slo = self.slos.get(capability, {})
+        score = 0.0
+        if stats["error_rate"] is not None and slo.get("error_rate"):
+            score = max(score, stats["error_rate"] / slo["error_rate"])
+        if stats["p95"] is not None and slo.get("p95"):
+            score = max(score, stats["p95"] / slo["p95"])
+        return score
+
+    def _healthy(self, capability: str, model: str) -> Tuple[bool, float]:
+        """Whether ``model`` may take the capability's traffic, and its score."""
+        score = self._score(capability, model)
+        key = (capability, model)
+        with self._lock:
+            if score > 1.0:
+                self._down.add(key)
+            return key not in self._down, score
+
+    def choose(self, capability: str, exclude: Collection[str] = ()) -> str:
+        """The first candidate within its SLO, else the one closest to it.
+
+        Models in ``exclude`` (say, ones that just failed this request) are
+        skipped unless nothing else is left.
+        """
+        candidates = [
+            m for m in self.candidates[capability] if m not in exclude
+        ] or list(self.candidates[capability])
+        best, best_score = candidates[0], float("inf")
+        for model in candidates:
+            healthy, score = self._healthy(capability, model)
+            if healthy:
+                best = model
+                break
+            if random.random() < self.trial_share:
+                metrics.inc("model.trials", capability=capability, model=model)
+                best = model
+                break
+            if score < best_score:
+                best, best_score = model, score
+        metrics.inc("model.routed", capability=capability, model=best)
+        return best
+
+    def gauges(self) -> Dict[str, float]:
+        """Per-model health for the metrics snapshot."""
+        gauges: Dict[str, float] = {}
+        for capability, candidates in self.candidates.items():
+            for model in candidates:
+                stats = self.stats(capability, model)
+                labels = f"{{capability={capability},model={model}}}"
+                gauges[f"model.healthy{labels}"] = float(
+                    self._healthy(capability, model)[0]
+                )
+                if stats["error_rate"] is not None:
+                    gauges[f"model.error_rate{labels}"] = stats["error_rate"]
+                if stats["p95"] is not None:
+                    gauges[f"model.p95{labels}"] = stats["p95"]
+        return gauges
+
+
+# Shared by every GeminiAI instance in the process
+ROUTER = ModelRouter.from_env()
+metrics.register_collector(ROUTER.gauges)
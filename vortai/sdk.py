@@ -6,81 +6,283 @@ Gemini AI SDK - Simple interface for Google's Gemini AI models.
 """
 
 import os
-import uuid
-import tempfile
 import requests
 import logging
 import time
-from typing import Optional, Dict, Any
+import sqlite3
+import threading
+from contextlib import closing
+from typing import Optional, Callable, Dict, Any, Iterator, List, Tuple
 from gtts import gTTS
-from google import genai as google_genai
-from google.genai import types
-from . import models
+from google.genai import errors, types
+from . import (
+    keypool,
+    log,
+    models,
+    prompts,
+    redis_pool,
+    routing,
+    sessions,
+    spool,
+    tracing,
+    transport,
+)
 from .image_providers import ImageGenerationService
-
-try:
-    import redis
-except ImportError:
-    redis = None
+from .extensions import semantic_cache as semantic
+from .extensions.research_store import ResearchStore
+from .extensions.response_cache import ResponseCache
+from .resilience import (
+    DeadlineExceeded,
+    UpstreamCaller,
+    http_options,
+    remaining,
+    time_left,
+)
 
 
 class GeminiAI:
     """SDK for interacting with Gemini AI models."""
 
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize with API key."""
-        self.api_key = api_key or os.environ.get("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY is required")
-        self.client = google_genai.Client(api_key=self.api_key)
-        self.cache = None
-        redis_url = os.environ.get("REDIS_URL")
-        if redis and redis_url:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        semantic_cache: Optional[semantic.SemanticCache] = None,
+        api_keys: Optional[List[str]] = None,
+    ):
+        """Initialize with API key(s) and an optional semantic cache.
+
+        With several keys (``api_keys`` or GEMINI_API_KEYS), generation calls
+        are spread across them; ``api_key`` stays the primary key used for
+        research, cached content and image generation.
+        """
+        redis_client = redis_pool.get_client()
+        try:
+            self.keys = keypool.KeyPool.from_env(
+                api_key or os.environ.get("GEMINI_API_KEY"), api_keys, redis_client
+            )
+        except ValueError:
+            raise ValueError("GEMINI_API_KEY is required") from None
+        self.api_key = api_key or os.environ.get("GEMINI_API_KEY") or self.keys.keys[0]
+        self.client = transport.get_client(self.api_key)
+        self.upstream = UpstreamCaller.from_env()
+        self.router = routing.ROUTER
+        self.canonicalizer = prompts.Canonicalizer.from_env()
+        self.cache = ResponseCache.from_env(redis_client)
+        self.sessions = sessions.SessionStore(redis_client)
+        self.semantic_cache = semantic_cache or semantic.from_env(self.client)
+        self.research_store = ResearchStore.from_env()
+        self.image_service = ImageGenerationService(self.api_key)
+
+    def _pick_client(self, config=None) -> Tuple[Any, Optional[str]]:
+        """Client for one call, from the key pool unless it needs the primary key."""
+        if len(self.keys) == 1 or (config and config.get("cached_content")):
+            # Cached content belongs to the project of the key that created it
+            return self.client, None
+        key = self.keys.acquire()
+        return self.keys.client(key), key
+
+    def _generate_content(
+        self, capability: str, contents: Any, config=None, model: Optional[str] = None
+    ):
+        """Call generate_content within the request deadline, with retries.
+
+        The router picks the model for ``capability``, and a retry goes to
+        another candidate than the one that just failed. Passing ``model``
+        pins it instead.
+        """
+        failed: List[str] = []
+        used = [model or self.router.choose(capability)]
+
+        def attempt(timeout: float):
+            current = used[-1]
+            if failed and model is None:
+                current = self.router.choose(capability, exclude=failed)
+                used.append(current)
+            request_config = dict(config or {})
+            request_config["http_options"] = {"timeout": max(1, int(timeout * 1000))}
+            client, key = self._pick_client(config)
+            started = time.monotonic()
             try:
-                self.cache = redis.from_url(redis_url)
-            except redis.exceptions.RedisError as e:
-                logging.warning(
-                    f"Could not connect to Redis: {e}. Falling back to in-memory cache."
+                response = client.models.generate_content(
+                    model=current, contents=contents, config=request_config
                 )
-        if self.cache is None:
-            self.cache = {}  # In-memory cache
-        self.image_service = ImageGenerationService(self.api_key)
+            except Exception as e:
+                if key is not None:
+                    self.keys.report(key, e)
+                if routing.counts_against_model(e, pooled_key=key is not None):
+                    self.router.record(capability, current, None, ok=False)
+                    failed.append(current)
+                raise
+            if key is not None:
+                self.keys.report(key)
+            self.router.record(capability, current, time.monotonic() - started, True)
+            return response
+
+        start = time.monotonic()
+        try:
+            with tracing.span("genai.generate_content", client=True, model=used[0]):
+                return self.upstream.call(attempt, used[0])
+        finally:
+            log.bind(
+                model=used[-1], upstream_ms=round((time.monotonic() - start) * 1000, 2)
+            )
+
+    def _stream_content(
+        self, capability: str, contents: Any, config=None, model: Optional[str] = None
+    ) -> Iterator[Any]:
+        """Start a streamed generation and return an iterator over its chunks.
+
+        The first chunk is fetched eagerly so request errors surface here.
+        Streams are not retried, since chunks may already have been used.
+        """
+        model = model or self.router.choose(capability)
+        request_config = dict(config or {})
+        request_config["http_options"] = http_options()
+        client, key = self._pick_client(config)
+        try:
+            with tracing.span("genai.stream_content", client=True, model=model):
+                stream = client.models.generate_content_stream(
+                    model=model, contents=contents, config=request_config
+                )
+                first = next(stream, None)
+        except Exception as e:
+            if key is not None:
+                self.keys.report(key, e)
+            if routing.counts_against_model(e, pooled_key=key is not None):
+                self.router.record(capability, model, None, ok=False)
+            raise
+        if key is not None:
+            self.keys.report(key)
+        # Only time to first chunk is known here, so no latency sample
+        self.router.record(capability, model, None, ok=True)
+        log.bind(model=model)
 
+        def chunks() -> Iterator[Any]:
+            try:
+                if first is not None:
+                    yield first
+                yield from stream
+            finally:
+                # Closing the stream drops the connection and stops generation
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+
+        return chunks()
+
+    def _cached_text(
+        self, canonical: str, refresh: Optional[Callable[[], str]] = None
+    ) -> Tuple[Optional[str], Any]:
+        """Look up a canonical prompt; returns (cached reply, semantic vector).
+
+        ``refresh`` regenerates the reply when the cached one is stale.
+        """
+        with tracing.span("cache.lookup"):
+            cached, state = self.cache.get(
+                prompts.cache_key(canonical, "text"), refresh
+            )
+            if cached is not None:
+                log.bind(cache=state)
+                tracing.set_attributes(cache=state)
+                return cached, None
+            vector = None
+            if self.semantic_cache is not None:
+                try:
+                    similar, vector = self.semantic_cache.lookup_many([canonical])[0]
+                except Exception as e:
+                    logging.warning("Semantic cache lookup failed: %s", e)
+                else:
+                    if similar is not None:
+                        log.bind(cache="semantic_hit")
+                        tracing.set_attributes(cache="semantic_hit")
+                        return similar, None
+            log.bind(cache="miss")
+            tracing.set_attributes(cache="miss")
+            return None, vector
+
+    def _store_text(self, canonical: str, result: str, vector: Any = None) -> None:
+        self.cache.set(prompts.cache_key(canonical, "text"), result)
+        if vector is not None:
+            self.semantic_cache.set(canonical, result, vector)
+
+    def _text_loader(self, prompt: str, canonical: str) -> Callable[[], str]:
+        """Return a call that generates a fresh reply for the prompt."""
+        contents = self.canonicalizer.upstream(prompt, canonical)
+
+        def load() -> str:
+            return self._generate_content("text", contents).text
+
+        return load
+
+    @tracing.traced("GeminiAI.generate_text")
     def generate_text(self, prompt: str) -> str:
         """Generate text response from prompt."""
         if not prompt or len(prompt) > 5000:
             raise ValueError("Invalid prompt")
-        cache_key = str(hash(prompt))
-        if isinstance(self.cache, dict):
-            if cache_key in self.cache:
-                return self.cache[cache_key]
-        else:
-            cached = self.cache.get(cache_key)
-            if cached:
-                return cached.decode("utf-8") if isinstance(cached, bytes) else cached
+        canonical = self.canonicalizer(prompt)
+        load = self._text_loader(prompt, canonical)
+        cached, vector = self._cached_text(canonical, load)
+        if cached is not None:
+            return cached
         try:
-            response = self.client.models.generate_content(
-                model=models.TEXT_MODEL, contents=prompt
-            )
-            result = response.text
+            result = load()
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise ValueError(f"Failed to generate text: {e}") from e
-        if isinstance(self.cache, dict):
-            self.cache[cache_key] = result
-        else:
-            self.cache.set(cache_key, result)
+        self._store_text(canonical, result, vector)
         return result
 
+    def stream_text(
+        self, prompt: str, cancel: Optional[threading.Event] = None
+    ) -> Iterator[str]:
+        """Generate a text response, yielding text as it arrives.
+
+        Setting ``cancel`` stops the upstream generation. Only complete
+        replies are cached.
+        """
+        if not prompt or len(prompt) > 5000:
+            raise ValueError("Invalid prompt")
+        canonical = self.canonicalizer(prompt)
+        cached, vector = self._cached_text(
+            canonical, self._text_loader(prompt, canonical)
+        )
+        if cached is not None:
+            yield cached
+            return
+        try:
+            stream = self._stream_content(
+                "text",
+                self.canonicalizer.upstream(prompt, canonical),
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise ValueError(f"Failed to generate text: {e}") from e
+        parts = []
+        with closing(stream):
+            for chunk in stream:
+                if cancel is not None and cancel.is_set():
+                    return
+                text = getattr(chunk, "text", None)
+                if text:
+                    parts.append(text)
+                    yield text
+        self._store_text(canonical, "".join(parts), vector)
+
+    @tracing.traced("GeminiAI.generate_text_with_thinking")
     def generate_text_with_thinking(self, prompt: str) -> Dict[str, Any]:
         """Generate text with thinking summary."""
         if not prompt or len(prompt) > 5000:
             raise ValueError("Invalid prompt")
         try:
-            response = self.client.models.generate_content(
-                model=models.THINKING_MODEL,
-                contents=prompt,
+            response = self._generate_content(
+                "thinking",
+                prompt,
                 config={"thinking_config": {"include_thoughts": True}},
             )
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise ValueError(f"Failed to generate text with thinking: {e}") from e
         main_response = response.text if hasattr(response, "text") else ""
@@ -95,35 +297,42 @@ class GeminiAI:
                         )
         return {"response": main_response, "thinking_summary": thinking_summary}
 
+    @tracing.traced("GeminiAI.generate_text_with_url_context")
     def generate_text_with_url_context(self, prompt: str) -> str:
         """Generate text with URL context."""
         if not prompt or len(prompt) > 5000:
             raise ValueError("Invalid prompt")
         try:
             url_context_tool = types.Tool(url_context=types.UrlContext())
-            response = self.client.models.generate_content(
-                model=models.URL_CONTEXT_MODEL,
-                contents=prompt,
+            response = self._generate_content(
+                "url_context",
+                prompt,
                 config={"tools": [url_context_tool]},
             )
             return response.text
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise ValueError(f"Failed to generate text with URL context: {e}") from e
 
+    @tracing.traced("GeminiAI.text_to_speech")
     def text_to_speech(self, text: str) -> str:
         """Convert text to speech and return file path."""
         if not text or len(text) > 1000:
             raise ValueError("Invalid text")
+        # Speech depends only on the words, so recent audio is reused
+        audio = spool.audio()
+        stem = self._speech_stem(text)
+        cached = audio.lookup(stem)
+        if cached is not None:
+            return cached
         try:
-            filename = f"{uuid.uuid4()}.mp3"
-            filepath = os.path.join(tempfile.gettempdir(), "gemini_tts", filename)
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
             tts = gTTS(text=text, lang="en", slow=False)
-            tts.save(filepath)
-            return filepath
+            return audio.write(".mp3", tts.save, stem)
         except Exception as e:
             raise ValueError(f"Failed to generate speech: {e}") from e
 
+    @tracing.traced("GeminiAI.process_text_go")
     def process_text_go(self, text: str) -> str:
         """Process text using Go service for normalization."""
         if not text:
@@ -134,33 +343,85 @@ class GeminiAI:
             go_service_url = os.environ.get(
                 "GO_SERVICE_URL", "http://localhost:8080/process"
             )
-            response = requests.post(go_service_url, data={"text": text}, timeout=5)
-            response.raise_for_status()
+            with tracing.span("go.process_text", client=True, url=go_service_url):
+                response = requests.post(
+                    go_service_url,
+                    data={"text": text},
+                    headers=tracing.inject({}),
+                    timeout=min(5, time_left()),
+                )
+                response.raise_for_status()
             return response.text.strip()
         except requests.exceptions.RequestException as e:
             # Fallback to Python implementation if Go service is not available
-            logging.info(f"Go service unavailable ({e}), using Python fallback")
+            logging.info("Go service unavailable (%s), using Python fallback", e)
             return self._process_text_python(text)
 
     def _process_text_python(self, text: str) -> str:
         """Python fallback for text processing."""
-        import re
-
         # Simple text normalization: trim and normalize spaces
-        return re.sub(r"\s+", " ", text.strip())
+        return prompts.collapse_whitespace(text)
 
+    @tracing.traced("GeminiAI.generate_image")
     def generate_image(self, prompt: str) -> str:
         """Generate image and return file path."""
         if not prompt or len(prompt) > 5000:
             raise ValueError("Invalid prompt")
 
-        model = models.IMAGE_MODEL
-        return self.image_service.generate_image(prompt, model)
+        stem = self._image_stem(prompt)
+        cached = spool.images().lookup(stem)
+        if cached is not None:
+            return cached
+        return self.image_service.generate_image(prompt, models.IMAGE_MODEL, stem)
+
+    @staticmethod
+    def _speech_stem(text: str) -> str:
+        return spool.key("tts", prompts.collapse_whitespace(text))
+
+    def _image_stem(self, prompt: str) -> str:
+        return spool.key("image", models.IMAGE_MODEL, self.canonicalizer(prompt))
+
+    def cached(self, mode: str, texts: List[str]) -> List[bool]:
+        """Which of ``texts`` have a fresh cached result for ``mode``.
 
+        ``mode`` is "text" (the response cache, one MGET with Redis), or
+        "tts" or "image" (this host's spools, checked without marking the
+        files as used).
+        """
+        if mode == "text":
+            keys = [prompts.cache_key(self.canonicalizer(t), "text") for t in texts]
+            return [state == "hit" for _, state in self.cache.get_many(keys)]
+        if mode == "tts":
+            return [spool.audio().exists(self._speech_stem(t)) for t in texts]
+        if mode == "image":
+            return [spool.images().exists(self._image_stem(t)) for t in texts]
+        raise ValueError(f"Unknown cache mode: {mode}")
+
+    def precompute(self, mode: str, text: str) -> None:
+        """Generate and cache the result for ``text``, replacing a stale one."""
+        if mode == "text":
+            canonical = self.canonicalizer(text)
+            self._store_text(canonical, self._text_loader(text, canonical)())
+        elif mode == "tts":
+            self.text_to_speech(text)
+        elif mode == "image":
+            self.generate_image(text)
+        else:
+            raise ValueError(f"Unknown cache mode: {mode}")
+
+    @tracing.traced("GeminiAI.research_topic")
     def research_topic(self, topic: str) -> Dict[str, Any]:
         """Perform multi-step research using Deep Research agent."""
         if not topic or len(topic) > 5000:
             raise ValueError("Invalid research topic")
+        if self.research_store is not None:
+            try:
+                stored = self.research_store.find_fresh(topic)
+            except sqlite3.Error as e:
+                logging.warning("Research store lookup failed: %s", e)
+            else:
+                if stored is not None:
+                    return stored
         try:
             interaction = self.client.interactions.create(
                 agent=models.DEEP_RESEARCH_MODEL, input=topic, background=True
@@ -169,18 +430,30 @@ class GeminiAI:
             POLLING_INTERVAL = 5  # seconds
             polling_attempts = 60  # 5 minutes (60 attempts * 5s interval)
             for _ in range(polling_attempts):
+                left = remaining()
+                if left is not None and left <= 0:
+                    raise DeadlineExceeded("Research deadline exceeded")
                 status = self.client.interactions.get(interaction.name)
                 if status.state.name == "COMPLETED":
-                    return {
+                    result = {
                         "report": status.output,
                         "citations": getattr(status, "citations", []),
                     }
+                    if self.research_store is not None:
+                        self.research_store.add(
+                            topic, result["report"], result["citations"]
+                        )
+                    return result
                 elif status.state.name == "FAILED":
                     raise ValueError(
                         f"Research failed: {getattr(status, 'error', 'Unknown error')}"
                     )
-                time.sleep(POLLING_INTERVAL)
+                time.sleep(
+                    POLLING_INTERVAL if left is None else min(POLLING_INTERVAL, left)
+                )
             raise ValueError("Research task timed out after 5 minutes.")
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             error_msg = str(e)
             if "429" in error_msg or "quota" in error_msg.lower():
@@ -188,3 +461,141 @@ class GeminiAI:
                     "Research failed: Insufficient quota or access to Deep Research agent. Please check your API key permissions."
                 ) from e
             raise ValueError(f"Failed to perform research: {e}") from e
+
+    @tracing.traced("GeminiAI.search_research")
+    def search_research(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Full-text search over previously completed research reports."""
+        if not query or len(query) > 500:
+            raise ValueError("Invalid search query")
+        if self.research_store is None:
+            return []
+        return self.research_store.search(query, limit)
+
+    @tracing.traced("GeminiAI.create_session")
+    def create_session(self, system_instruction: Optional[str] = None) -> str:
+        """Start a multi-turn chat session and return its ID."""
+        if system_instruction is not None and len(system_instruction) > 5000:
+            raise ValueError("Invalid system instruction")
+        return self.sessions.create(system_instruction).id
+
+    @tracing.traced("GeminiAI.send_message")
+    def send_message(self, session_id: str, message: str) -> str:
+        """Send a message in a chat session and return the reply."""
+        if not message or len(message) > 5000:
+            raise ValueError("Invalid message")
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise sessions.SessionNotFound(session_id)
+        with session.lock:
+            turns = session.history + [{"role": "user", "text": message}]
+            try:
+                result = self._send_turns(session, turns).text
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                raise ValueError(f"Failed to send message: {e}") from e
+            session.history = turns + [{"role": "model", "text": result}]
+            self._cache_session_prefix(session)
+            self.sessions.save(session)
+        return result
+
+    def stream_message(
+        self,
+        session_id: str,
+        message: str,
+        cancel: Optional[threading.Event] = None,
+    ) -> Iterator[str]:
+        """Send a session message, yielding the reply as it arrives.
+
+        A cancelled reply is not added to the session history.
+        """
+        if not message or len(message) > 5000:
+            raise ValueError("Invalid message")
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise sessions.SessionNotFound(session_id)
+        with session.lock:
+            turns = session.history + [{"role": "user", "text": message}]
+            try:
+                stream = self._send_turns(session, turns, self._stream_content)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                raise ValueError(f"Failed to send message: {e}") from e
+            parts = []
+            with closing(stream):
+                for chunk in stream:
+                    if cancel is not None and cancel.is_set():
+                        return
+                    text = getattr(chunk, "text", None)
+                    if text:
+                        parts.append(text)
+                        yield text
+            session.history = turns + [{"role": "model", "text": "".join(parts)}]
+            self._cache_session_prefix(session)
+            self.sessions.save(session)
+
+    def _send_turns(self, session: sessions.Session, turns, generate=None):
+        """Send only the turns not already held in the session's cached content."""
+        generate = generate or self._generate_content
+        if session.cached_content:
+            try:
+                return generate(
+                    "text",
+                    sessions.to_contents(turns[session.cached_turns :]),
+                    config={"cached_content": session.cached_content},
+                    # Cached content only works with the model that made it
+                    model=models.TEXT_MODEL,
+                )
+            except errors.APIError as e:
+                if e.code not in (400, 403, 404):
+                    raise
+                # The cached content expired or was deleted, resend everything
+                logging.info("Session cache unavailable (%s), resending history", e)
+                session.cached_content = None
+                session.cached_turns = 0
+        config = {}
+        if session.system_instruction:
+            config["system_instruction"] = session.system_instruction
+        return generate("text", sessions.to_contents(turns), config=config)
+
+    def _cache_session_prefix(self, session: sessions.Session) -> None:
+        """Move the conversation into Gemini cached content once it is long enough.
+
+        Cached content cannot be appended to, so each refresh uploads the
+        whole history. It only happens once the uncached tail is half the
+        size of the cached prefix, which keeps the total uploaded linear
+        in the length of the conversation.
+        """
+        if sessions.trim_history(session) and session.cached_content:
+            # The cache holds the dropped turns; start again from the rest
+            self._delete_session_cache(session.cached_content)
+            session.cached_content = None
+            session.cached_turns = 0
+        cached = sessions.history_chars(session.history[: session.cached_turns])
+        uncached = sessions.history_chars(session.history[session.cached_turns :])
+        if uncached < max(sessions.CACHE_MIN_CHARS, cached // 2):
+            return
+        try:
+            cache = self.client.caches.create(
+                model=models.TEXT_MODEL,
+                config=types.CreateCachedContentConfig(
+                    contents=sessions.to_contents(session.history),
+                    system_instruction=session.system_instruction,
+                    ttl=f"{sessions.CACHE_TTL}s",
+                ),
+            )
+        except Exception as e:
+            logging.warning("Could not cache session history: %s", e)
+            return
+        previous = session.cached_content
+        session.cached_content = cache.name
+        session.cached_turns = len(session.history)
+        if previous:
+            self._delete_session_cache(previous)
+
+    def _delete_session_cache(self, name: str) -> None:
+        try:
+            self.client.caches.delete(name=name)
+        except Exception as e:
+            logging.info("Could not delete old session cache: %s", e)
@@ -0,0 +1,171 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Multi-turn chat sessions for Gemini AI SDK.
+History is kept server-side, in Redis when configured, with recent
+sessions also cached in memory.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from google.genai import types
+
+# Cache the shared prefix once this much uncached history has built up.
+# Gemini needs a few thousand tokens before explicit caching is allowed.
+CACHE_MIN_CHARS = 16000
+CACHE_TTL = 3600  # seconds
+# Oldest turns are dropped once a session's history passes this size
+MAX_HISTORY_CHARS = 200000
+
+
+class SessionNotFound(KeyError):
+    """Raised when a session ID is unknown or has expired."""
+
+
+class Session:
+    """Conversation state for one chat session."""
+
+    def __init__(
+        self,
+        session_id: Optional[str] = None,
+        system_instruction: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        cached_content: Optional[str] = None,
+        cached_turns: int = 0,
+        updated_at: Optional[float] = None,
+    ):
+        self.id = session_id or uuid.uuid4().hex
+        self.system_instruction = system_instruction
+        self.history = history or []  # [{"role": "user"|"model", "text": ...}]
+        # Name of the Gemini cached content holding history[:cached_turns]
+        self.cached_content = cached_content
+        self.cached_turns = cached_turns
+        self.updated_at = updated_at or time.time()
+        self.lock = threading.Lock()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "system_instruction": self.system_instruction,
+            "history": self.history,
+            "cached_content": self.cached_content,
+            "cached_turns": self.cached_turns,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Session":
+        return cls(
+            session_id=data["id"],
+            system_instruction=data.get("system_instruction"),
+            history=data.get("history", []),
+            cached_content=data.get("cached_content"),
+            cached_turns=data.get("cached_turns", 0),
+            updated_at=data.get("updated_at"),
+        )
+
+
+def history_chars(turns: List[Dict[str, str]]) -> int:
+    return sum(len(turn["text"]) for turn in turns)
+
+
+def trim_history(session: Session) -> bool:
+    """Drop the oldest exchanges once the history passes MAX_HISTORY_CHARS.
+
+    The history is cut to half the cap, so a long conversation is trimmed
+    (and its cached content rebuilt) once in a while rather than every
+    turn. Returns whether anything was dropped.
+    """
+    total = history_chars(session.history)
+    if total <= MAX_HISTORY_CHARS:
+        return False
+    drop = 0
+    # Drop whole user/model exchanges, always keeping the latest one
+    while total > MAX_HISTORY_CHARS // 2 and drop + 2 < len(session.history):
+        total -= history_chars(session.history[drop : drop + 2])
+        drop += 2
+    if not drop:
+        return False
+    session.history = session.history[drop:]
+    return True
+
+
+def to_contents(turns: List[Dict[str, str]]) -> List[types.Content]:
+    """Convert stored turns into Gemini contents."""
+    return [
+        types.Content(
+            role=turn["role"], parts=[types.Part.from_text(text=turn["text"])]
+        )
+        for turn in turns
+    ]
+
+
+class SessionStore:
+    """Keeps sessions in Redis, or in memory without it.
+
+    With Redis every save is written through, so any worker can continue
+    a session; the in-memory copies only save deserializing and are
+    replaced whenever Redis holds a newer version.
+    """
+
+    def __init__(self, redis_client=None, max_sessions: int = 1000, ttl: int = 86400):
+        self.redis = redis_client
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _redis_key(self, session_id: str) -> str:
+        return f"vortai:session:{session_id}"
+
+    def create(self, system_instruction: Optional[str] = None) -> Session:
+        session = Session(system_instruction=system_instruction)
+        self.save(session)
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+        if self.redis is None:
+            return session
+        try:
+            raw = self.redis.get(self._redis_key(session_id))
+        except Exception as e:
+            logging.warning("Could not load session from Redis: %s", e)
+            return session
+        if not raw:
+            return None  # Expired
+        data = json.loads(raw)
+        if session is not None and session.updated_at >= data.get("updated_at", 0):
+            return session
+        # Another worker has moved the conversation on
+        session = Session.from_dict(data)
+        self._remember(session)
+        return session
+
+    def save(self, session: Session) -> None:
+        session.updated_at = time.time()
+        self._remember(session)
+        if self.redis is None:
+            return
+        try:
+            self.redis.setex(
+                self._redis_key(session.id), self.ttl, json.dumps(session.to_dict())
+            )
+        except Exception as e:
+            logging.warning("Could not save session to Redis: %s", e)
+
+    def _remember(self, session: Session) -> None:
+        with self._lock:
+            self._sessions[session.id] = session
+            self._sessions.move_to_end(session.id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
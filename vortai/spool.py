@@ -0,0 +1,230 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Bounded on-disk spools for generated images and audio.
+Files are written atomically, kept briefly so repeats can be served from
+disk, and evicted by age and by a byte quota.
+"""
+
+import glob
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from typing import Callable, Dict, Optional
+
+from .metrics import metrics
+
+_TMP_PREFIX = "tmp-"
+# A half-written file this old belongs to a writer that died
+_ORPHAN_AGE = 300.0
+# Never evict a file younger than this: it may be about to be sent
+_MIN_AGE = 60.0
+
+
+def key(*parts: str) -> str:
+    """File stem identifying a result, e.g. ``key("tts", text)``."""
+    digest = hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+    return digest[:32]
+
+
+class Spool:
+    """A directory of generated files bounded by ``max_bytes`` and ``max_age``.
+
+    :meth:`write` saves through a temporary name and renames, so readers
+    never see partial files. Files younger than ``max_age`` are returned
+    by :meth:`lookup`; older ones, half-written leftovers and (least
+    recently used first) anything over the quota are removed by
+    :meth:`sweep`, which runs at startup, after every ``sweep_interval``
+    seconds of writes, and whenever a write pushes past the quota. Several
+    processes may share a directory.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_age: float = 600.0,
+        sweep_interval: float = 60.0,
+    ):
+        self.directory = directory
+        self.name = os.path.basename(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self._bytes = 0
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.sweep()
+        _spools.add(self)
+
+    @classmethod
+    def from_env(cls, directory: str) -> "Spool":
+        """Build from SPOOL_MAX_BYTES and SPOOL_MAX_AGE (applied per directory)."""
+        return cls(
+            directory,
+            max_bytes=int(os.environ.get("SPOOL_MAX_BYTES", str(256 * 1024 * 1024))),
+            max_age=float(os.environ.get("SPOOL_MAX_AGE", "600")),
+        )
+
+    def lookup(self, stem: str) -> Optional[str]:
+        """Path of a fresh file named ``stem`` (any extension), or None."""
+        now = time.time()
+        for path in glob.glob(os.path.join(self.directory, stem + ".*")):
+            try:
+                st = os.stat(path)
+                if now - st.st_mtime >= self.max_age:
+                    continue
+                # Record the use for LRU eviction; mtime keeps the age
+                os.utime(path, (now, st.st_mtime))
+            except OSError:
+                continue  # Evicted meanwhile
+            metrics.inc("spool.hits", spool=self.name)
+            return path
+        metrics.inc("spool.misses", spool=self.name)
+        return None
+
+    def exists(self, stem: str) -> bool:
+        """Like :meth:`lookup`, but without recording a use, a hit or a miss."""
+        now = time.time()
+        for path in glob.glob(os.path.join(self.directory, stem + ".*")):
+            try:
+                if now - os.path.getmtime(path) < self.max_age:
+                    return True
+            except OSError:
+                continue
+        return False
+
+    def write(
+        self, suffix: str, save: Callable[[str], None], stem: Optional[str] = None
+    ) -> str:
+        """Call ``save(path)`` on a temporary path, then publish the file.
+
+        The file is named ``stem + suffix`` (a random stem if None), and a
+        file already published under that name is replaced.
+        """
+        final = os.path.join(self.directory, (stem or uuid.uuid4().hex) + suffix)
+        tmp = os.path.join(self.directory, f"{_TMP_PREFIX}{uuid.uuid4().hex}{suffix}")
+        try:
+            save(tmp)
+            size = os.path.getsize(tmp)
+            try:
+                size -= os.path.getsize(final)  # Already counted
+            except OSError:
+                pass
+            os.replace(tmp, final)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self._bytes += size
+            due = (
+                self._bytes > self.max_bytes
+                or time.monotonic() - self._last_sweep >= self.sweep_interval
+            )
+        if due:
+            self.sweep()
+        return final
+
+    def sweep(self) -> int:
+        """Remove expired, orphaned and over-quota files; returns how many."""
+        now = time.time()
+        removed = 0
+        files = []
+        total = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError as e:
+            logging.warning("Could not sweep %s: %s", self.directory, e)
+            return 0
+        for entry in entries:
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            age = now - st.st_mtime
+            if entry.name.startswith(_TMP_PREFIX):
+                expired = age >= _ORPHAN_AGE
+            else:
+                expired = age >= max(self.max_age, _MIN_AGE)
+            if expired:
+                removed += _remove(entry.path)
+                continue
+            if not entry.name.startswith(_TMP_PREFIX) and age >= _MIN_AGE:
+                files.append((st.st_atime, st.st_size, entry.path))
+            total += st.st_size
+        # Least recently used first; new files may be over the quota briefly
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            if _remove(path):
+                removed += 1
+                total -= size
+        with self._lock:
+            self._bytes = total
+            self._last_sweep = time.monotonic()
+        if removed:
+            metrics.inc("spool.evicted", removed, spool=self.name)
+        return removed
+
+    def gauges(self) -> Dict[str, float]:
+        return {f"spool.bytes{{spool={self.name}}}": self._bytes}
+
+
+def _remove(path: str) -> int:
+    try:
+        os.unlink(path)
+        return 1
+    except OSError:
+        return 0
+
+
+_lock = threading.Lock()
+_shared: Dict[str, Spool] = {}
+
+
+def get(name: str) -> Spool:
+    """The process-wide spool for ``name`` under the system temp directory."""
+    with _lock:
+        spool = _shared.get(name)
+        if spool is None:
+            spool = _shared[name] = Spool.from_env(
+                os.path.join(tempfile.gettempdir(), name)
+            )
+            metrics.register_collector(spool.gauges)
+        return spool
+
+
+def images() -> Spool:
+    return get("vortai_images")
+
+
+def audio() -> Spool:
+    return get("gemini_tts")
+
+
+# Every spool, so children do not inherit a lock held across fork
+_spools: "weakref.WeakSet[Spool]" = weakref.WeakSet()
+
+
+def _reset_after_fork() -> None:
+    global _lock
+    _lock = threading.Lock()
+    for spool in list(_spools):
+        spool._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
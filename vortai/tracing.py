@@ -0,0 +1,196 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Distributed tracing for the Vortai server.
+Thin wrapper over OpenTelemetry that is a no-op unless tracing is
+configured and the opentelemetry packages are installed.
+"""
+
+import functools
+import os
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, MutableMapping, Optional, TypeVar
+
+from flask import Flask, g, request
+
+from . import log
+
+try:
+    from opentelemetry import context as otel_context
+    from opentelemetry import propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        ConsoleSpanExporter,
+    )
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+try:
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+        OTLPSpanExporter,
+    )
+except ImportError:
+    OTLPSpanExporter = None
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Returned by span() while tracing is off; nullcontext is reusable
+_NOOP = nullcontext()
+
+_tracer = None
+
+
+def configure_tracing(
+    exporter: Optional[str] = None, sample_ratio: Optional[float] = None
+) -> bool:
+    """Enable tracing from TRACING (otlp or console) and TRACE_SAMPLE_RATIO.
+
+    Returns whether tracing is on. The OTLP exporter reads the standard
+    OTEL_EXPORTER_OTLP_* settings. Sampling follows the caller's decision
+    when a traceparent header is present.
+    """
+    global _tracer
+    if _tracer is not None:
+        return True
+    exporter = (exporter or os.environ.get("TRACING", "")).lower()
+    if not exporter or exporter == "none" or not OTEL_AVAILABLE:
+        return False
+    if exporter == "otlp":
+        if OTLPSpanExporter is None:
+            raise ValueError(
+                "TRACING=otlp requires opentelemetry-exporter-otlp-proto-http"
+            )
+        span_exporter = OTLPSpanExporter()
+    elif exporter == "console":
+        span_exporter = ConsoleSpanExporter()
+    else:
+        raise ValueError(f"Unknown TRACING exporter: {exporter}")
+    if sample_ratio is None:
+        sample_ratio = float(os.environ.get("TRACE_SAMPLE_RATIO", "1.0"))
+    provider = TracerProvider(
+        resource=Resource.create(
+            {"service.name": os.environ.get("OTEL_SERVICE_NAME", "vortai")}
+        ),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("vortai")
+    return True
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, client: bool = False, **attributes: Any):
+    """Context manager timing a block as a child of the current span."""
+    if _tracer is None:
+        return _NOOP
+    return _tracer.start_as_current_span(
+        name,
+        kind=trace.SpanKind.CLIENT if client else trace.SpanKind.INTERNAL,
+        attributes={k: v for k, v in attributes.items() if v is not None},
+    )
+
+
+def set_attributes(**attributes: Any) -> None:
+    """Add attributes (cache result, model...) to the current span."""
+    if _tracer is None:
+        return
+    current = trace.get_current_span()
+    for key, value in attributes.items():
+        if value is not None:
+            current.set_attribute(key, value)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator form of :func:`span`."""
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.start_as_current_span(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def inject(headers: MutableMapping[str, str]) -> MutableMapping[str, str]:
+    """Add W3C trace context (traceparent) for an outgoing HTTP call."""
+    if _tracer is not None:
+        propagate.inject(headers)
+    return headers
+
+
+def init_request_tracing(app: Flask) -> None:
+    """Open a server span per request, continuing any incoming traceparent.
+
+    Register right after request logging so the span covers the rate
+    limiter; it ends when the response body has been sent, so time in
+    ``send_file`` is included.
+    """
+    if _tracer is None:
+        return
+
+    @app.before_request
+    def start_request_span() -> None:
+        # The default getter matches header names case-sensitively
+        parent = propagate.extract({k.lower(): v for k, v in request.headers.items()})
+        server_span = _tracer.start_span(
+            f"{request.method} {request.url_rule or request.path}",
+            context=parent,
+            kind=trace.SpanKind.SERVER,
+            attributes={
+                "http.request.method": request.method,
+                "url.path": request.path,
+                "flask.endpoint": request.endpoint or "",
+            },
+        )
+        g.trace_span = server_span
+        g.trace_token = otel_context.attach(trace.set_span_in_context(server_span))
+        span_context = server_span.get_span_context()
+        if span_context.trace_flags.sampled:
+            log.bind(trace_id=f"{span_context.trace_id:032x}")
+
+    @app.after_request
+    def finish_request_span(response):
+        server_span = g.pop("trace_span", None)
+        if server_span is None:
+            return response
+        server_span.set_attribute("http.response.status_code", response.status_code)
+        if response.status_code >= 500:
+            server_span.set_status(trace.Status(trace.StatusCode.ERROR))
+        started = time.monotonic()
+
+        def end_span() -> None:
+            server_span.set_attribute(
+                "vortai.body_send_ms", round((time.monotonic() - started) * 1000, 2)
+            )
+            server_span.end()
+
+        response.call_on_close(end_span)
+        return response
+
+    @app.teardown_request
+    def detach_request_context(exc: Optional[BaseException]) -> None:
+        token = g.pop("trace_token", None)
+        if token is not None:
+            otel_context.detach(token)
+        server_span = g.pop("trace_span", None)
+        if server_span is not None:
+            # after_request did not run (unhandled error)
+            if exc is not None:
+                server_span.record_exception(exc)
+            server_span.end()
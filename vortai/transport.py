@@ -0,0 +1,180 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Shared HTTP transport for google-genai clients.
+One tuned, instrumented connection pool per process, reused by the SDK
+and every image provider.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from google import genai as google_genai
+from google.genai import types
+
+from .metrics import metrics
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """HTTP transport that tracks in-flight requests and pool usage.
+
+    Wraps an ``httpx.HTTPTransport`` built from ``kwargs``, which
+    :meth:`reset` replaces, so clients holding this transport keep
+    working with a fresh pool.
+    """
+
+    def __init__(self, max_connections: int, **kwargs: Any):
+        self.max_connections = max_connections
+        self._kwargs = kwargs
+        self._inner = httpx.HTTPTransport(**kwargs)
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        start = time.monotonic()
+        try:
+            return self._inner.handle_request(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            metrics.inc("genai.http.requests")
+            metrics.observe("genai.http.latency", time.monotonic() - start)
+
+    def close(self) -> None:
+        self._inner.close()
+
+    def reset(self) -> None:
+        """Start over with an empty pool, leaving the old one's sockets open.
+
+        After fork the pooled connections belong to the parent; closing
+        them here would shut down the parent's TLS sessions.
+        """
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self._inner = httpx.HTTPTransport(**self._kwargs)
+
+    def pool_stats(self) -> Dict[str, float]:
+        with self._lock:
+            in_flight, peak, self.peak = self.in_flight, self.peak, self.in_flight
+        return {
+            "genai.pool.in_flight": in_flight,
+            # Highest concurrency since the last snapshot
+            "genai.pool.peak": peak,
+            "genai.pool.utilization": in_flight / self.max_connections,
+        }
+
+
+def _int_env(name: str, default: int) -> int:
+    return int(os.environ.get(name, str(default)))
+
+
+def make_transport() -> InstrumentedTransport:
+    """Build a transport from GENAI_* pool settings."""
+    max_connections = _int_env("GENAI_MAX_CONNECTIONS", 100)
+    http2 = HTTP2_AVAILABLE and os.environ.get("GENAI_HTTP2", "1").lower() in (
+        "1",
+        "true",
+    )
+    return InstrumentedTransport(
+        max_connections=max_connections,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=_int_env("GENAI_MAX_KEEPALIVE", 20),
+            keepalive_expiry=float(os.environ.get("GENAI_KEEPALIVE_EXPIRY", "30")),
+        ),
+        http2=http2,
+    )
+
+
+API_URL = "https://generativelanguage.googleapis.com/"
+
+_lock = threading.RLock()
+_transport: Optional[InstrumentedTransport] = None
+_http_client: Optional[httpx.Client] = None
+_clients: Dict[str, google_genai.Client] = {}
+
+
+def http_client() -> httpx.Client:
+    """The process-wide httpx client shared by every google-genai client."""
+    global _http_client, _transport
+    with _lock:
+        if _http_client is None:
+            _transport = make_transport()
+            # Timeouts come from each request's http_options
+            _http_client = httpx.Client(transport=_transport, timeout=None)
+        return _http_client
+
+
+def get_client(api_key: str) -> google_genai.Client:
+    """Return the shared google-genai client for ``api_key``."""
+    with _lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = google_genai.Client(
+                api_key=api_key,
+                http_options=types.HttpOptions(httpx_client=http_client()),
+            )
+            _clients[api_key] = client
+        return client
+
+
+def prewarm(url: str = API_URL, connections: int = 1, timeout: float = 10.0) -> int:
+    """Open up to ``connections`` pooled connections to ``url`` ahead of use.
+
+    Concurrent HEAD requests make the pool keep several TLS sessions
+    alive (one suffices over HTTP/2). Returns how many succeeded.
+    """
+    client = http_client()
+
+    def head() -> bool:
+        try:
+            client.head(url, timeout=timeout)
+            return True
+        except httpx.HTTPError:
+            return False
+
+    threads = []
+    results = []
+    for _ in range(max(1, connections)):
+        thread = threading.Thread(target=lambda: results.append(head()))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return sum(results)
+
+
+def pool_stats() -> Dict[str, float]:
+    with _lock:
+        transport = _transport
+    return transport.pool_stats() if transport is not None else {}
+
+
+def _reinit_after_fork() -> None:
+    # The google-genai clients keep their httpx client, so swap the pool
+    # underneath it rather than building a new client
+    global _lock
+    _lock = threading.RLock()
+    if _transport is not None:
+        _transport.reset()
+
+
+metrics.register_collector(pool_stats)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
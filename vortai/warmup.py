@@ -0,0 +1,225 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 Niladri Das <bniladridas>
+# SPDX-License-Identifier: MIT
+
+"""
+Startup warm-up and readiness for the Vortai server.
+Pays one-time costs (connections, model loads, cache priming) before
+``/readyz`` lets a load balancer send traffic to the instance.
+"""
+
+import logging
+import mimetypes
+import os
+import threading
+import time
+import weakref
+from typing import Any, Callable, Collection, Dict, List, Optional, Sequence, Tuple
+
+from flask import Flask, jsonify
+from gtts import gTTS
+
+from . import models, prompts, transport
+from .metrics import metrics
+from .resilience import deadline, remaining
+
+logger = logging.getLogger(__name__)
+
+Step = Tuple[str, Callable[[], Any]]
+
+# Steps a forked worker repeats: sockets and the snapshot loader do not
+# survive fork, but loaded models and primed caches are inherited
+FORK_STEPS = ("connections", "redis", "response_cache")
+
+
+def read_prompts(path: str, limit: int) -> List[str]:
+    """Up to ``limit`` prompts from a file with one prompt per line."""
+    found: List[str] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                found.append(line)
+                if len(found) >= limit:
+                    break
+    return found
+
+
+def default_steps(ai, redis_clients: Sequence[Any] = ()) -> List[Step]:
+    """The warm-up steps for ``ai``, configured from WARMUP_* settings."""
+
+    def connections() -> int:
+        return transport.prewarm(
+            connections=int(os.environ.get("WARMUP_CONNECTIONS", "4"))
+        )
+
+    def redis_ping() -> int:
+        # The limiter and caches usually share one pooled client
+        clients = list({id(c): c for c in redis_clients if c is not None}.values())
+        for client in clients:
+            client.ping()
+        return len(clients)
+
+    def image_models() -> List[str]:
+        names = os.environ.get("WARMUP_IMAGE_MODELS", models.IMAGE_MODEL)
+        loaded = [n.strip() for n in names.split(",") if n.strip()]
+        for name in loaded:
+            ai.image_service.preload(name)
+        return loaded
+
+    def text_processing() -> None:
+        # Regexes, the mimetypes table and gTTS's tokenizer all load lazily
+        prompts.collapse_whitespace(" warm  up ")
+        ai.canonicalizer("Warm up")
+        mimetypes.init()
+        gTTS(text="Warm up.", lang="en").get_bodies()
+
+    def response_cache() -> bool:
+        left = remaining()
+        return ai.cache.wait_for_snapshot(left)
+
+    def popular_prompts() -> int:
+        path = os.environ.get("WARMUP_PROMPTS")
+        if not path:
+            return 0
+        limit = int(os.environ.get("WARMUP_MAX_PROMPTS", "50"))
+        primed = 0
+        for prompt in read_prompts(path, limit):
+            left = remaining()
+            if left is not None and left <= 0:
+                break
+            try:
+                ai.generate_text(prompt)
+                primed += 1
+            except (ValueError, TimeoutError) as e:
+                logger.warning("Could not prime prompt: %s", e)
+        return primed
+
+    return [
+        ("connections", connections),
+        ("redis", redis_ping),
+        ("image_models", image_models),
+        ("text_processing", text_processing),
+        ("response_cache", response_cache),
+        ("popular_prompts", popular_prompts),
+    ]
+
+
+_started: "weakref.WeakSet[Warmup]" = weakref.WeakSet()
+
+
+class Warmup:
+    """Run warm-up steps in the background and serve ``/readyz``.
+
+    ``/readyz`` answers 503 until every step has finished, or until
+    ``timeout`` seconds have passed so that a hung step cannot keep the
+    instance out of rotation for good. A failed step is logged and
+    reported but does not block readiness: the instance still works,
+    just without that head start. When disabled, ``/readyz`` is ready
+    at once. A process forked after warm-up started only repeats the
+    ``after_fork`` steps.
+    """
+
+    def __init__(
+        self,
+        steps: Sequence[Step] = (),
+        enabled: bool = True,
+        timeout: float = 120.0,
+        after_fork: Collection[str] = FORK_STEPS,
+    ):
+        self.steps = list(steps)
+        self.enabled = enabled
+        self.timeout = timeout
+        self.after_fork = after_fork
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._done = threading.Event()
+        self._give_up_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, ai, redis_clients: Sequence[Any] = ()) -> "Warmup":
+        """Build from WARMUP (on/off) and WARMUP_TIMEOUT settings."""
+        return cls(
+            default_steps(ai, redis_clients),
+            enabled=os.environ.get("WARMUP", "").lower() in ("1", "true", "yes"),
+            timeout=float(os.environ.get("WARMUP_TIMEOUT", "120")),
+        )
+
+    def init_app(self, app: Flask) -> None:
+        app.extensions["vortai_warmup"] = self
+        app.add_url_rule("/readyz", "readyz", self._readyz)
+        self.start()
+
+    def start(self, only: Optional[Collection[str]] = None) -> None:
+        """Run the steps (those named in ``only``, if given) in the background."""
+        if not self.enabled:
+            self._done.set()
+            return
+        steps = [s for s in self.steps if only is None or s[0] in only]
+        with self._lock:
+            self._done.clear()
+            for name, _ in self.steps:
+                if only is None or name in only:
+                    self._results[name] = {"status": "pending"}
+                elif self._results.get(name, {}).get("status") == "pending":
+                    self._results[name] = {"status": "skipped"}
+            self._give_up_at = time.monotonic() + self.timeout
+        _started.add(self)
+        threading.Thread(
+            target=self.run, args=(steps,), name="vortai-warmup", daemon=True
+        ).start()
+
+    def run(self, steps: Optional[Sequence[Step]] = None) -> None:
+        started = time.monotonic()
+        with deadline(self.timeout):
+            for name, step in self.steps if steps is None else steps:
+                step_started = time.monotonic()
+                try:
+                    detail = step()
+                    status = "ok"
+                except Exception as e:
+                    detail, status = str(e), "failed"
+                    logger.warning("Warm-up step %s failed: %s", name, e)
+                seconds = time.monotonic() - step_started
+                metrics.observe("warmup.step_seconds", seconds, step=name)
+                with self._lock:
+                    self._results[name] = {
+                        "status": status,
+                        "seconds": round(seconds, 3),
+                        "detail": detail,
+                    }
+        total = time.monotonic() - started
+        metrics.set_gauge("warmup.seconds", total)
+        logger.info("Warm-up finished in %.2fs", total)
+        self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set() or time.monotonic() >= self._give_up_at
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = {name: dict(result) for name, result in self._results.items()}
+        return {
+            "status": "ready" if self.ready else "warming",
+            "timed_out": not self._done.is_set() and self.ready,
+            "steps": steps,
+        }
+
+    def _readyz(self):
+        status = self.status()
+        return jsonify(status), (200 if status["status"] == "ready" else 503)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+
+def _restart_after_fork() -> None:
+    # Pooled connections and the warm-up thread belong to the parent; the
+    # rest (prompt priming above all) is not worth paying once per worker
+    for warmup in list(_started):
+        warmup._lock = threading.Lock()
+        warmup.start(warmup.after_fork)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)